@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+import re
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STATISTIQUES_DEFAUT = ('moyenne', 'ecart_type', 'mediane', 'p10', 'p90', 'n')
+_RE_PERCENTILE = re.compile(r'^p(\d{1,2}(\.\d+)?|100)$')
+
+
+class AgregateurTemporel:
+    """
+    Agrégation des spectres calibrés par capteur et par intervalle de temps
+    (pas fixe, ex. une minute) ou par rafale (spectres consécutifs d'un capteur
+    séparés de moins de rafale_s secondes) : moyenne, écart-type, médiane,
+    percentiles, min, max et nombre de valeurs, pixel par pixel (NaN ignorés).
+
+    Les lots sont ajoutés au fil de l'eau (ajouter) : les spectres sont triés par
+    (capteur, date) puis toutes les statistiques sont calculées pour tous les
+    groupes du lot en quelques opérations NumPy, sans boucle sur les groupes.
+    Un groupe reste ouvert tant que les lots suivants contenant son capteur y
+    ajoutent des spectres ; il est émis dès qu'un lot contenant son capteur ne
+    le prolonge pas (exact pour des spectres ordonnés dans le temps par capteur,
+    dans un sens ou dans l'autre), et les groupes restants à la fin (terminer).
+    """
+
+    def __init__(self, pas_s=60, rafale_s=None, statistiques=STATISTIQUES_DEFAUT):
+        """
+        - pas_s        : durée (s) des intervalles de temps (ignorée si rafale_s est donné)
+        - rafale_s     : écart max (s) entre deux spectres consécutifs d'une même rafale
+        - statistiques : parmi 'moyenne', 'ecart_type', 'mediane', 'min', 'max', 'n'
+                         et les percentiles 'pNN' (ex. 'p10', 'p90', 'p2.5')
+        """
+        if rafale_s is None and (pas_s is None or int(pas_s) < 1):
+            raise ValueError("Pas d'agrégation invalide")
+        for stat in statistiques:
+            if stat not in ('moyenne', 'ecart_type', 'mediane', 'min', 'max', 'n') and not _RE_PERCENTILE.match(stat):
+                raise ValueError(f"Statistique inconnue : {stat}")
+        self.pas_s = pas_s
+        self.rafale_s = rafale_s
+        self.statistiques = tuple(statistiques)
+        self._attente = None  # Spectres des groupes encore ouverts (même format que les lots)
+
+    def ajouter(self, table, new_lam, data, capteurs):
+        """
+        Ajoute un lot de spectres interpolés (même signature que les exporteurs).
+        Retourne les groupes terminés (format de agreger) ou None.
+        """
+        lot = {
+            'device': np.char.upper(np.asarray(table['IDDevice']).astype(str)),
+            'secondes': np.asarray(table['DateTime']).astype('datetime64[s]').astype(np.int64),
+            'integration_time': (np.asarray(table['IntegrationTime']) if 'IntegrationTime' in table
+                                 else np.full(len(data), -1)),
+            'qc_flags': np.asarray(table['QCFlags']) if 'QCFlags' in table else np.zeros(len(data), dtype=np.uint16),
+            'capteurs': np.array(list(capteurs) + [None], dtype=object)[:-1],
+            'data': np.asarray(data, dtype=float),
+            'lambda': np.asarray(new_lam),
+            'nouveau': np.ones(len(data), dtype=bool),
+        }
+        if self._attente is not None:
+            if not np.array_equal(self._attente['lambda'], lot['lambda']):
+                raise ValueError("Grilles de longueurs d'onde différentes entre lots")
+            lot = {cle: lot[cle] if cle == 'lambda' else np.concatenate([self._attente[cle], lot[cle]])
+                   for cle in lot}
+        if len(lot['data']) == 0:
+            return None
+
+        ordre, debuts, groupe = self._groupes(lot)
+        lot = {cle: valeur if cle == 'lambda' else valeur[ordre] for cle, valeur in lot.items()}
+        # Un groupe est terminé si son capteur figure dans le nouveau lot sans le prolonger
+        capteurs_lot = np.unique(lot['device'][lot['nouveau']])
+        prolonge = np.logical_or.reduceat(lot['nouveau'], debuts)
+        termine = np.isin(lot['device'][debuts], capteurs_lot) & ~prolonge
+        garder = ~termine[groupe]
+        lot['nouveau'][:] = False
+        self._attente = {cle: valeur if cle == 'lambda' else valeur[garder] for cle, valeur in lot.items()}
+        if not termine.any():
+            return None
+        termines = {cle: valeur if cle == 'lambda' else valeur[~garder] for cle, valeur in lot.items()}
+        return self.agreger(termines)
+
+    def terminer(self):
+        """
+        Émet tous les groupes encore ouverts (fin du flux). Retourne le format de agreger ou None.
+        """
+        attente, self._attente = self._attente, None
+        if attente is None or len(attente['data']) == 0:
+            return None
+        ordre, _, _ = self._groupes(attente)
+        return self.agreger({cle: valeur if cle == 'lambda' else valeur[ordre] for cle, valeur in attente.items()})
+
+    def _groupes(self, lot):
+        """
+        Tri par (capteur, date) et découpage en groupes.
+        Retourne (ordre de tri, indices (triés) des débuts de groupe, groupe de chaque spectre trié).
+        """
+        ordre = np.lexsort((lot['secondes'], lot['device']))
+        device = lot['device'][ordre]
+        secondes = lot['secondes'][ordre]
+        debut = np.ones(len(ordre), dtype=bool)
+        debut[1:] = device[1:] != device[:-1]
+        if self.rafale_s is not None:
+            debut[1:] |= np.diff(secondes) > self.rafale_s
+        else:
+            intervalle = np.floor_divide(secondes, int(self.pas_s))
+            debut[1:] |= intervalle[1:] != intervalle[:-1]
+        debuts = np.flatnonzero(debut)
+        return ordre, debuts, np.cumsum(debut) - 1
+
+    def agreger(self, lot):
+        """
+        Statistiques de chaque groupe d'un lot trié par (capteur, date).
+        Retourne (table, new_lam, {statistique: matrice (G, L)}, capteurs) : table
+        d'entête des G groupes (IDDevice, DateTime = début de l'intervalle ou de la
+        rafale, IDData, IntegrationTime, QCFlags = union des drapeaux, NSpectres).
+        """
+        _, debuts, groupe = self._groupes(lot)
+        n_groupes = len(debuts)
+        effectifs = np.diff(np.append(debuts, len(groupe)))
+        device = lot['device'][debuts]
+        if self.rafale_s is not None:
+            secondes = lot['secondes'][debuts]
+        else:
+            secondes = np.floor_divide(lot['secondes'][debuts], int(self.pas_s)) * int(self.pas_s)
+        dates = secondes.astype('datetime64[s]')
+        table = {
+            'IDDevice': device,
+            'DateTime': dates,
+            'IDData': np.char.add(np.char.add(device, '_'), dates.astype(str)),
+            'IntegrationTime': lot['integration_time'][debuts],
+            'QCFlags': np.bitwise_or.reduceat(lot['qc_flags'], debuts),
+            'NSpectres': effectifs,
+        }
+        cubes = {stat: np.empty((n_groupes, lot['data'].shape[1])) for stat in self.statistiques}
+        # Groupes d'effectifs voisins (même puissance de 2) traités ensemble : le cube
+        # (groupes, effectif max, L) complété reste au plus deux fois plus grand que les données
+        classes = np.ceil(np.log2(effectifs)).astype(int)
+        for classe in np.unique(classes):
+            groupes = np.flatnonzero(classes == classe)
+            lignes = np.flatnonzero(np.isin(groupe, groupes))
+            rang = np.searchsorted(groupes, groupe[lignes])
+            self._statistiques(lot['data'][lignes], rang, lignes - debuts[groupe[lignes]],
+                               len(groupes), int(effectifs[groupes].max()), groupes, cubes)
+        return table, lot['lambda'], cubes, lot['capteurs'][debuts]
+
+    def _statistiques(self, data, rang, position, n_groupes, effectif_max, groupes, cubes):
+        """
+        Remplit les lignes groupes de cubes à partir d'un cube (n_groupes, effectif_max, L)
+        trié le long de l'axe des spectres (valeurs manquantes et NaN rejetés en fin de tri).
+        """
+        cube = np.full((n_groupes, effectif_max, data.shape[1]), np.inf)
+        cube[rang, position] = np.where(np.isnan(data), np.inf, data)
+        cube.sort(axis=1)
+        valides = np.isfinite(cube)
+        n = valides.sum(axis=1)
+        vides = n == 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            moyenne = np.where(valides, cube, 0.0).sum(axis=1) / n
+            for stat in self.statistiques:
+                if stat == 'moyenne':
+                    valeurs = moyenne
+                elif stat == 'ecart_type':
+                    ecarts = np.where(valides, cube - moyenne[:, None, :], 0.0)
+                    valeurs = np.sqrt((ecarts ** 2).sum(axis=1) / (n - 1))
+                    valeurs[n < 2] = np.nan
+                elif stat == 'n':
+                    valeurs = n.astype(float)
+                elif stat == 'min':
+                    valeurs = np.where(vides, np.nan, cube[:, 0, :])
+                elif stat == 'max':
+                    valeurs = _quantile(cube, n, 1.0)
+                else:
+                    valeurs = _quantile(cube, n, 0.5 if stat == 'mediane' else float(stat[1:]) / 100)
+                cubes[stat][groupes] = valeurs
+
+
+def _quantile(cube, n, q):
+    """
+    Quantile q (interpolation linéaire, comme np.percentile) le long de l'axe 1
+    d'un cube trié dont les n premières valeurs de chaque colonne sont valides.
+    """
+    position = q * (n - 1)
+    bas = np.clip(np.floor(position).astype(np.int64), 0, None)
+    haut = np.minimum(bas + 1, np.maximum(n - 1, 0))
+    v_bas = np.take_along_axis(cube, bas[:, None, :], axis=1)[:, 0, :]
+    v_haut = np.take_along_axis(cube, haut[:, None, :], axis=1)[:, 0, :]
+    fraction = position - bas
+    with np.errstate(invalid='ignore'):
+        valeurs = v_bas + (v_haut - v_bas) * fraction
+    valeurs[fraction == 0] = v_bas[fraction == 0]
+    valeurs[n == 0] = np.nan
+    return valeurs
+
+
+class ExportAgrege:
+    """
+    Exporteur des spectres agrégés (AgregateurTemporel) : reçoit les lots calibrés
+    comme les autres exporteurs et écrit chaque statistique avec l'exporteur du
+    format choisi, dans un sous-dossier par statistique (ex. output/netcdf/moyenne/).
+    La table d'entête de chaque spectre agrégé contient NSpectres (spectres du groupe),
+    écrit dans la variable n_spectres de l'export NetCDF.
+    """
+
+    def __init__(self, agregateur, creer_exporteur):
+        """
+        - agregateur      : AgregateurTemporel
+        - creer_exporteur : fonction statistique -> exporteur (voir ExportManager.creer)
+        """
+        self.agregateur = agregateur
+        self.exporteurs = {stat: creer_exporteur(stat) for stat in agregateur.statistiques}
+
+    def ecrire_lot(self, table, new_lam, data, capteurs):
+        self._ecrire(self.agregateur.ajouter(table, new_lam, data, capteurs))
+
+    def _ecrire(self, resultat):
+        if resultat is None:
+            return
+        table, new_lam, cubes, capteurs = resultat
+        for stat, exporteur in self.exporteurs.items():
+            exporteur.ecrire_lot(table, new_lam, cubes[stat], capteurs)
+
+    def flush(self):
+        """
+        Force l'écriture des groupes déjà terminés (les groupes ouverts restent en mémoire).
+        """
+        for exporteur in self.exporteurs.values():
+            exporteur.flush()
+
+    def close(self):
+        if self.exporteurs:
+            self._ecrire(self.agregateur.terminer())
+            for exporteur in self.exporteurs.values():
+                exporteur.close()
+            self.exporteurs = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+import os
+import csv
+import contextlib
+import json
+import hashlib
+import logging
+import tempfile
+import numpy as np
+from core.calibration_cache import DOSSIER_CACHE
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE = 1
+EXTENSIONS_SRF = ('.csv', '.txt', '.tsv')
+COUVERTURE_MIN = 0.95  # Part minimale de la réponse d'une bande couverte par des pixels valides
+
+
+class SimulateurBandes:
+    """
+    Simulation des bandes satellites (Sentinel-2 MSI, Sentinel-3 OLCI, Landsat OLI...)
+    à partir de spectres hyperspectraux calibrés ou Rrs : chaque bande est la moyenne
+    du spectre pondérée par la réponse spectrale (SRF) de la bande.
+
+    Les SRF sont lues dans srf_dir, une table par mission ({mission}.csv) : première
+    colonne la longueur d'onde (nm, ou µm si toutes les valeurs sont < 100), puis
+    une colonne par bande, avec une ligne d'entête donnant les noms des bandes
+    (séparateur ',', ';' ou tabulation).
+
+    Pour chaque couple (grille de longueurs d'onde, mission), la matrice des poids
+    normalisés (N_bandes, L) est calculée une fois, gardée en mémoire et mise en
+    cache disque (.npz, invalidé si la table SRF change) ; un lot entier de
+    spectres (N, L) est ensuite convolué par un produit matriciel.
+    """
+
+    def __init__(self, srf_dir, cache_dir=None, use_cache=True, couverture_min=COUVERTURE_MIN):
+        """
+        - srf_dir        : dossier des tables SRF (une par mission)
+        - cache_dir      : dossier du cache des matrices (défaut : DOSSIER_CACHE/srf)
+        - use_cache      : False pour toujours recalculer les matrices
+        - couverture_min : part minimale de la réponse d'une bande couverte par la
+                           grille et par des pixels non NaN (sinon la bande vaut NaN)
+        """
+        self.srf_dir = srf_dir
+        self.cache_dir = cache_dir or os.path.join(DOSSIER_CACHE, 'srf')
+        self.use_cache = use_cache
+        self.couverture_min = couverture_min
+        self._matrices = {}  # Cache {(mission, grille (octets)): (noms, poids, couverture)}
+
+    def missions(self):
+        """
+        Missions disponibles (noms des tables SRF de srf_dir, sans extension).
+        """
+        return sorted(os.path.splitext(f)[0] for f in os.listdir(self.srf_dir)
+                      if f.lower().endswith(EXTENSIONS_SRF) and not f.startswith('.'))
+
+    def chemin_srf(self, mission):
+        for ext in EXTENSIONS_SRF:
+            path = os.path.join(self.srf_dir, mission + ext)
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"Table SRF introuvable pour {mission} dans {self.srf_dir}")
+
+    def lire_srf(self, mission):
+        """
+        Lit la table SRF d'une mission.
+        Retourne (lambda (M,) en nm, noms des bandes, réponses (M, N_bandes)).
+        """
+        path = self.chemin_srf(mission)
+        with open(path, 'r', encoding='utf-8-sig', newline='') as fi:
+            lignes = [ligne for ligne in fi if ligne.strip() and not ligne.startswith('#')]
+        dialecte = csv.Sniffer().sniff(lignes[0], delimiters=',;\t')
+        lignes = list(csv.reader(lignes, dialecte))
+        noms = [nom.strip() for nom in lignes[0][1:]]
+        valeurs = np.array([[float(v) if v.strip() else np.nan for v in ligne[:len(noms) + 1]]
+                            for ligne in lignes[1:]])
+        ordre = np.argsort(valeurs[:, 0], kind='stable')
+        lam = valeurs[ordre, 0]
+        if lam.max() < 100:
+            lam = lam * 1000.0  # Table en µm
+        reponses = np.nan_to_num(valeurs[ordre, 1:], nan=0.0)
+        return lam, noms, np.clip(reponses, 0.0, None)
+
+    def matrice(self, mission, cal_lambda):
+        """
+        Poids normalisés des bandes d'une mission sur la grille cal_lambda.
+        Retourne (noms des bandes, poids (N_bandes, L) de somme 1 par bande,
+        couverture (N_bandes,) : part de la réponse de chaque bande sur la grille).
+        """
+        cal_lambda = np.asarray(cal_lambda, dtype=float)
+        cle = (mission, cal_lambda.tobytes())
+        if cle not in self._matrices:
+            signature = self.signature(mission, cal_lambda)
+            resultat = self._lire(mission, signature) if self.use_cache else None
+            if resultat is None:
+                resultat = self._calculer(mission, cal_lambda)
+                if self.use_cache:
+                    self._ecrire(mission, signature, resultat)
+            self._matrices[cle] = resultat
+        return self._matrices[cle]
+
+    def _calculer(self, mission, cal_lambda):
+        """
+        Réponse de chaque bande interpolée sur la grille, pondérée par la largeur
+        de chaque pixel (règle des trapèzes), puis normalisée.
+        """
+        lam, noms, reponses = self.lire_srf(mission)
+        largeurs = np.gradient(cal_lambda) if cal_lambda.size > 1 else np.ones(1)
+        poids = np.empty((len(noms), cal_lambda.size))
+        for k in range(len(noms)):
+            poids[k] = np.interp(cal_lambda, lam, reponses[:, k], left=0.0, right=0.0) * largeurs
+        total = poids.sum(axis=1)
+        integrale = (np.diff(lam)[:, None] * (reponses[1:] + reponses[:-1]) / 2).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            couverture = np.where(integrale > 0, np.minimum(total / integrale, 1.0), 0.0)
+            poids = np.where(total[:, None] > 0, poids / total[:, None], 0.0)
+        hors_grille = [nom for nom, c in zip(noms, couverture) if c < self.couverture_min]
+        if hors_grille:
+            logger.info("%s : bandes hors de la grille (valeurs NaN) : %s", mission, ', '.join(hors_grille))
+        return noms, poids, couverture
+
+    def signature(self, mission, cal_lambda):
+        """
+        Signature de la table SRF (chemin, taille, mtime) et de la grille.
+        """
+        path = self.chemin_srf(mission)
+        st = os.stat(path)
+        return json.dumps({'version': VERSION_CACHE, 'fichier': [os.path.abspath(path), st.st_size, st.st_mtime_ns],
+                           'grille': hashlib.sha1(cal_lambda.tobytes()).hexdigest()})
+
+    def chemin_cache(self, mission, signature):
+        return os.path.join(self.cache_dir, f"{mission}_{hashlib.sha1(signature.encode()).hexdigest()[:16]}.npz")
+
+    def _lire(self, mission, signature):
+        path = self.chemin_cache(mission, signature)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                if str(npz['signature']) != signature:
+                    return None
+                return npz['noms'].tolist(), npz['poids'], npz['couverture']
+        except (OSError, ValueError, KeyError):
+            return None  # Cache illisible : il sera régénéré
+
+    def _ecrire(self, mission, signature, resultat):
+        """
+        Écrit le .npz de façon atomique (fichier temporaire puis renommage).
+        Un dossier de cache non accessible en écriture n'empêche pas le calcul.
+        """
+        noms, poids, couverture = resultat
+        tmp = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix='.npz', dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as fo:
+                np.savez(fo, signature=np.array(signature), noms=np.array(noms, dtype=str),
+                         poids=poids, couverture=couverture)
+            os.replace(tmp, self.chemin_cache(mission, signature))
+            tmp = None
+        except OSError as e:
+            logger.warning("Cache SRF non écrit pour %s : %s", mission, e)
+        finally:
+            if tmp is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp)  # Fichier temporaire d'une écriture interrompue
+
+    def convoluer(self, mission, cal_lambda, data):
+        """
+        Valeurs équivalentes aux bandes d'une mission pour une matrice de spectres (N, L).
+        Les pixels NaN sont ignorés et les poids restants renormalisés ; une bande
+        dont moins de couverture_min de la réponse est couverte par des pixels
+        valides vaut NaN.
+        Retourne (noms des bandes, matrice (N, N_bandes)).
+        """
+        noms, poids, couverture = self.matrice(mission, cal_lambda)
+        data = np.atleast_2d(data)
+        bandes = data @ poids.T
+        part = np.repeat(couverture[None, :], len(data), axis=0)
+        # Seuls les spectres contenant des NaN sont recalculés, avec les poids renormalisés
+        lignes = np.flatnonzero(np.isnan(bandes).any(axis=1))
+        if len(lignes):
+            valides = np.isfinite(data[lignes])
+            somme_poids = valides @ poids.T
+            with np.errstate(divide='ignore', invalid='ignore'):
+                bandes[lignes] = np.where(valides, data[lignes], 0.0) @ poids.T / somme_poids
+            part[lignes] = somme_poids * couverture
+        return noms, np.where(part >= self.couverture_min, bandes, np.nan)
+
+    def run(self, lots, missions, output_dir, nom_run):
+        """
+        Convolue des lots de spectres et écrit, pour chaque mission,
+        output_dir/{nom_run}_{mission}.txt : une ligne par spectre (métadonnées
+        puis une colonne par bande).
+        - lots     : itérable de dicts {'lambda', <clé des spectres>, métadonnées...} ;
+                     la matrice des spectres est lot['rrs'] ou lot['data']
+        - missions : noms des missions (tables SRF)
+        Retourne le nombre de spectres traités.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        fichiers = {mission: open(os.path.join(output_dir, f"{nom_run}_{mission}.txt"), 'w', encoding='utf-8')
+                    for mission in missions}
+        n_spectres = 0
+        entetes = set()  # Missions dont la ligne d'entête est écrite
+        try:
+            for lot in lots:
+                spectres = lot['rrs'] if 'rrs' in lot else lot['data']
+                meta = [cle for cle in lot if cle not in ('lambda', 'rrs', 'data')]
+                for mission, fo in fichiers.items():
+                    noms, bandes = self.convoluer(mission, lot['lambda'], spectres)
+                    if mission not in entetes:
+                        fo.write("\t".join(meta + noms) + "\n")
+                        entetes.add(mission)
+                    colonnes = [lot[cle] for cle in meta]
+                    for k in range(len(bandes)):
+                        fo.write("\t".join([str(c[k]) for c in colonnes] + list(map(repr, bandes[k].tolist()))) + "\n")
+                n_spectres += len(spectres)
+        finally:
+            for fo in fichiers.values():
+                fo.close()
+        logger.info("Bandes satellites : %d spectres convolués (%s) dans %s",
+                    n_spectres, ', '.join(missions), output_dir)
+        return n_spectres
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import os
+import contextlib
+import logging
+import json
+import hashlib
+import tempfile
+import numpy as np
+from core.capteur import CapteurTRIOS
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE = 1
+# Dossier par défaut des caches disque (calibrations compilées, matrices SRF)
+DOSSIER_CACHE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'output', 'cache'))
+
+
+class CalibrationCache:
+    """
+    Cache disque des calibrations compilées : un fichier .npz par capteur
+    (coefficients, B0, B1, cal), indexé par chemin, taille et date de
+    modification des fichiers sources. Le cache est invalidé automatiquement
+    dès qu'un fichier .ini, Back_*.dat ou Cal_*.dat change.
+    """
+
+    def __init__(self, path_calib_dir, cache_dir=None):
+        """
+        - path_calib_dir : dossier des fichiers de calibration
+        - cache_dir      : dossier du cache (défaut : un sous-dossier par dossier de
+                           calibration dans DOSSIER_CACHE/calibration)
+        """
+        self.path_calib_dir = path_calib_dir
+        self.cache_dir = cache_dir or self.dossier_defaut(path_calib_dir)
+
+    @staticmethod
+    def dossier_defaut(path_calib_dir):
+        """
+        DOSSIER_CACHE/calibration/{nom du dossier}_{empreinte de son chemin absolu} :
+        deux dossiers de même nom ne partagent pas leur cache.
+        """
+        chemin = os.path.abspath(path_calib_dir)
+        nom = os.path.basename(os.path.normpath(chemin))
+        return os.path.join(DOSSIER_CACHE, 'calibration', f"{nom}_{hashlib.sha1(chemin.encode()).hexdigest()[:8]}")
+
+    def chemin_cache(self, nom_capteur):
+        return os.path.join(self.cache_dir, f"{nom_capteur}.npz")
+
+    def chemins(self, nom_capteur, chemins=None):
+        return chemins or CapteurTRIOS.calibration_paths(self.path_calib_dir, nom_capteur)
+
+    def signature(self, nom_capteur, chemins=None):
+        """
+        Signature des fichiers sources : [(chemin, taille, mtime_ns), ...].
+        - chemins : (.ini, Back_*.dat, Cal_*.dat) déjà résolus (défaut : noms standard dans path_calib_dir)
+        """
+        sig = []
+        for path in self.chemins(nom_capteur, chemins):
+            st = os.stat(path)
+            sig.append([os.path.abspath(path), st.st_size, st.st_mtime_ns])
+        return json.dumps({'version': VERSION_CACHE, 'fichiers': sig})
+
+    def charger(self, nom_capteur, chemins=None):
+        """
+        Retourne la calibration brute du capteur (format CapteurTRIOS.get_calibration),
+        depuis le cache si elle est à jour, sinon depuis les fichiers texte
+        (le cache est alors régénéré).
+        """
+        signature = self.signature(nom_capteur, chemins)
+        calibration = self._lire(nom_capteur, signature, chemins)
+        if calibration is None:
+            capteur = CapteurTRIOS(nom_capteur, None, self.path_calib_dir, chemins)
+            capteur.load_calibration_files()
+            calibration = capteur.get_calibration()
+            self._ecrire(nom_capteur, signature, calibration)
+        return calibration
+
+    def _lire(self, nom_capteur, signature, chemins=None):
+        path = self.chemin_cache(nom_capteur)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                if str(npz['signature']) != signature:
+                    return None
+                coeff_c = {}
+                for cle, valeur in zip(npz['coeff_noms'].tolist(), npz['coeff_valeurs'].tolist()):
+                    coeff_c[cle] = int(valeur) if cle.startswith('DarkPixel') else valeur
+                return {
+                    'coeff_c': coeff_c,
+                    'B0': npz['B0'],
+                    'B1': npz['B1'],
+                    'cal': npz['cal'],
+                    'fichier_Cal': self.chemins(nom_capteur, chemins)[2],
+                }
+        except (OSError, ValueError, KeyError):
+            return None  # Cache illisible : il sera régénéré
+
+    def _ecrire(self, nom_capteur, signature, calibration):
+        """
+        Écrit le .npz de façon atomique (fichier temporaire puis renommage).
+        Un dossier de cache non accessible en écriture n'empêche pas le calcul.
+        """
+        coeff_c = calibration['coeff_c']
+        tmp = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix='.npz', dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as fo:
+                np.savez(fo,
+                         signature=np.array(signature),
+                         coeff_noms=np.array(list(coeff_c.keys()), dtype=str),
+                         coeff_valeurs=np.array(list(coeff_c.values()), dtype=float),
+                         B0=calibration['B0'],
+                         B1=calibration['B1'],
+                         cal=calibration['cal'])
+            os.replace(tmp, self.chemin_cache(nom_capteur))
+            tmp = None
+        except OSError as e:
+            logger.warning("Cache de calibration non écrit pour %s : %s", nom_capteur, e)
+        finally:
+            if tmp is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp)  # Fichier temporaire d'une écriture interrompue
@@ -1,63 +1,632 @@
+import os
+import time
+import queue
+import logging
+import threading
+import traceback
+from types import SimpleNamespace
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 from core.capteur import CapteurTRIOS  # adapte l'import selon ton organisation
+from core.calibration_cache import CalibrationCache
+from core.calibration_registry import RegistreCalibrations
 from core.data_manager import DataManager
+from core.export_manager import ExportManager
+from core.run_manifest import RunManifest
+from core.instrumentation import Instrumentation
+from core.qc import ControleQualite
+
+logger = logging.getLogger(__name__)
+
+N_CALCUL = 2  # Threads de calibration du pipeline (voir run_full_calibration_pipeline)
+TAILLE_PLAGE = 64 * 1024 * 1024  # Taille visée (octets) des plages de run_sharded_pipeline
 
 class CalibrationManager:
     """
     Orchestrateur du pipeline de calibration multi-capteurs TRIOS.
     """
 
-    def __init__(self, path_calib_dir):
+    def __init__(self, path_calib_dir, cache_dir=None, use_cache=True, qc=None, traitement=None):
+        """
+        path_calib_dir : dossier où se trouvent tous les fichiers calibration pour chaque capteur,
+                         liste de dossiers (un jeu par période, ex. ALL_2023, ALL_2024) ou
+                         RegistreCalibrations ; la calibration de chaque spectre est choisie
+                         selon son capteur (casse ignorée) et sa date
+        cache_dir      : dossier du cache disque des calibrations compilées, un sous-dossier
+                         par jeu (défaut : voir CalibrationCache.dossier_defaut)
+        use_cache      : False pour toujours relire les fichiers texte
+        qc             : ControleQualite appliqué à chaque lot avant calibration
+                         (défaut : drapeaux exportés, aucun spectre rejeté)
+        traitement     : ProcessingManager appliqué aux spectres interpolés avant l'export
+                         (défaut : aucun filtre)
+        """
+        self.registre = (path_calib_dir if isinstance(path_calib_dir, RegistreCalibrations)
+                         else RegistreCalibrations(path_calib_dir))
+        self.capteurs = {}  # Cache {(nom normalisé, numéro de calibration, temps d'intégration): CapteurTRIOS}
+        self.calibrations = {}  # Cache {(nom normalisé, numéro de calibration): calibration brute}
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self._caches = {}  # {dossier d'un jeu: CalibrationCache}
+        self.instrumentation = Instrumentation()  # Chronométrage par étape (voir rapport())
+        self.qc = qc if qc is not None else ControleQualite()
+        self.traitement = traitement
+        self.n_rejetes_qc = 0  # Spectres écartés par le contrôle qualité
+        self._verrou = threading.Lock()  # Création des capteurs depuis les threads de calcul
+
+    def set_instrumentation(self, instrumentation):
         """
-        path_calib_dir : dossier où se trouvent tous les fichiers calibration pour chaque capteur
+        Remplace l'instrumentation du manager et de tous ses capteurs.
         """
-        self.path_calib_dir = path_calib_dir
-        self.capteurs = {}  # Cache {nom_capteur: CapteurTRIOS}
+        self.instrumentation = instrumentation
+        for capteur in self.capteurs.values():
+            capteur.instrumentation = instrumentation
+
+    def get_calibration(self, nom_capteur, numero=0):
+        """
+        Calibration brute numero (ordre chronologique, voir RegistreCalibrations) d'un
+        capteur : mémoire, puis cache disque, puis fichiers texte.
+        """
+        epoque = self.registre.epoque(nom_capteur, numero)
+        key = (epoque.nom_capteur, numero)
+        if key not in self.calibrations:
+            if self.use_cache:
+                self.calibrations[key] = self._cache(epoque.dossier).charger(epoque.nom_capteur, epoque.chemins)
+            else:
+                capteur = CapteurTRIOS(epoque.nom_capteur, None, epoque.dossier, epoque.chemins)
+                capteur.load_calibration_files()
+                self.calibrations[key] = capteur.get_calibration()
+        return self.calibrations[key]
+
+    def _cache(self, dossier):
+        if dossier not in self._caches:
+            cache_dir = None
+            if self.cache_dir is not None:
+                cache_dir = os.path.join(self.cache_dir, os.path.basename(os.path.normpath(dossier)))
+            self._caches[dossier] = CalibrationCache(dossier, cache_dir)
+        return self._caches[dossier]
 
-    def get_or_create_capteur(self, nom_capteur, integtime):
+    def get_or_create_capteur(self, nom_capteur, integtime, numero=0):
         """
         Récupère un objet CapteurTRIOS déjà chargé, ou le crée et initialise si besoin.
+        Les fichiers de calibration ne sont lus qu'une fois par calibration, quels que
+        soient la casse du nom dans l'entête et le nombre de temps d'intégration rencontrés.
+        - numero : calibration du capteur à utiliser (voir RegistreCalibrations.numeros)
+        """
+        nom = self.registre.normaliser(nom_capteur)
+        key = (nom, numero, integtime)
+        with self._verrou:
+            if key in self.capteurs:
+                return self.capteurs[key]
+            epoque = self.registre.epoque(nom, numero)
+            capteur = CapteurTRIOS(nom, integtime, epoque.dossier, epoque.chemins)
+            capteur.set_calibration(self.get_calibration(nom, numero))
+            capteur.calcul_bruit_de_fond()
+            capteur.instrumentation = self.instrumentation
+            self.capteurs[key] = capteur
+            return capteur
+
+    def preload_calibrations(self, noms_capteurs=None):
+        """
+        Charge d'avance toutes les calibrations brutes des capteurs (par défaut : tous
+        ceux du registre). Les capteurs inconnus ou dont les fichiers sont illisibles
+        sont ignorés.
+        """
+        if noms_capteurs is None:
+            noms_capteurs = self.registre.capteurs()
+        for nom_capteur in noms_capteurs:
+            try:
+                for numero in range(max(self.registre.n_epoques(nom_capteur), 1)):
+                    self.get_calibration(nom_capteur, numero)
+            except (OSError, EOFError) as e:
+                logger.warning("Calibration ignorée pour %s : %s", nom_capteur, e)
+        return self.calibrations
+
+    def run_multi_files(self, sources, output_dir, interpolation_mode='UV_Vis', max_workers=None,
+                        taille_lot=1024, format_export='txt', incremental=False, decouper=False, **options_export):
+        """
+        Calibre plusieurs fichiers .dat en parallèle (un fichier par tâche) sur un
+        ProcessPoolExecutor. Les calibrations brutes sont chargées une seule fois ici
+        puis transmises à chaque processus à son démarrage.
+        - sources     : fichier, dossier, motif glob ou liste de ceux-ci (.dat, .dat.gz,
+                        .dat.zst ou archive .zip de .dat, lus sans décompression sur disque)
+        - max_workers : nombre de processus (défaut : nombre de cœurs ; 1 = en série)
+        - incremental : True pour ne traiter que les nouveaux spectres (run_incremental_pipeline)
+        - decouper    : True pour traiter les fichiers l'un après l'autre, chacun découpé
+                        en plages réparties sur tous les processus (run_sharded_pipeline) ;
+                        adapté à quelques très gros fichiers
+        Retourne le résumé du run (durées et erreurs par fichier).
+        """
+        if decouper and incremental:
+            raise ValueError("Les modes incrémental et découpé ne sont pas compatibles")
+        fichiers = DataManager.list_dat_files(sources)
+        self.preload_calibrations()
+        args = (output_dir, interpolation_mode, taille_lot, format_export, incremental, options_export)
+        t0 = time.perf_counter()
+        resultats = []
+        if decouper:
+            for path_data in fichiers:
+                resultats.append(self._calibrer_fichier_decoupe(path_data, output_dir, interpolation_mode,
+                                                                max_workers, taille_lot, format_export,
+                                                                options_export))
+        elif max_workers == 1 or len(fichiers) <= 1:
+            _init_worker(self.registre, self.calibrations, self.qc, self.traitement)
+            for path_data in fichiers:
+                resultats.append(_calibrer_fichier(path_data, *args))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(self.registre, self.calibrations, self.qc, self.traitement)) as pool:
+                futures = [pool.submit(_calibrer_fichier, path_data, *args) for path_data in fichiers]
+                for future in as_completed(futures):
+                    resultats.append(future.result())
+        duree = time.perf_counter() - t0
+        for r in resultats:
+            instrumentation = r.pop('instrumentation', None)
+            if instrumentation is not None:
+                r['rapport'] = instrumentation.rapport()
+                self.instrumentation.fusionner(instrumentation)
+
+        ordre = {path_data: i for i, path_data in enumerate(fichiers)}
+        resultats.sort(key=lambda r: ordre[r['fichier']])
+        n_spectres = sum(r['n_spectres'] for r in resultats)
+        resume = {
+            'n_fichiers': len(fichiers),
+            'n_echecs': sum(1 for r in resultats if r['erreur'] is not None),
+            'n_spectres': n_spectres,
+            'duree': duree,
+            'spectres_par_seconde': n_spectres / duree if duree > 0 else 0.0,
+            'rapport': self.instrumentation.rapport(),
+            'fichiers': resultats,
+        }
+        logger.info("Run terminé : %d fichiers, %d spectres, %d échecs en %.2f s",
+                    resume['n_fichiers'], n_spectres, resume['n_echecs'], duree)
+        return resume
+
+    def _calibrer_fichier_decoupe(self, path_data, output_dir, interpolation_mode, max_workers, taille_lot,
+                                  format_export, options_export):
         """
-        key = (nom_capteur, integtime)
-        if key in self.capteurs:
-            return self.capteurs[key]
-        capteur = CapteurTRIOS(nom_capteur, integtime, self.path_calib_dir)
-        capteur.load_calibration_files()
-        capteur.calcul_bruit_de_fond()
-        self.capteurs[key] = capteur
-        return capteur
+        Calibre un fichier avec run_sharded_pipeline et retourne son résumé (voir _calibrer_fichier).
+        """
+        t0 = time.perf_counter()
+        resultat = {'fichier': path_data, 'n_spectres': 0, 'duree': 0.0, 'erreur': None}
+        instrumentation, self.instrumentation = self.instrumentation, Instrumentation()
+        try:
+            resultat['n_spectres'] = self.run_sharded_pipeline(
+                path_data, output_dir, interpolation_mode, max_workers, taille_lot, format_export, **options_export)
+        except Exception as e:
+            resultat['erreur'] = f"{type(e).__name__}: {e}"
+            resultat['traceback'] = traceback.format_exc()
+        finally:
+            resultat['instrumentation'], self.instrumentation = self.instrumentation, instrumentation
+        resultat['duree'] = time.perf_counter() - t0
+        return resultat
 
-    def run_full_calibration_pipeline(self, path_data, output_dir, interpolation_mode='UV_Vis'):
+    def run_full_calibration_pipeline(self, path_data, output_dir, interpolation_mode='UV_Vis', taille_lot=1024,
+                                      format_export='txt', stop_event=None, callback=None, n_calcul=N_CALCUL,
+                                      profondeur=None, **options_export):
         """
         Pipeline complet : calibration et export pour tous les spectres d'un .dat multi-capteurs.
-        - path_data    : chemin du .dat à traiter
-        - output_dir   : dossier output/calibrated/
+        Le fichier est lu en flux, par lots de taille_lot spectres : la mémoire reste
+        bornée quelle que soit la taille du fichier. Les fichiers .dat.gz, .dat.zst et
+        les membres d'archives zip sont décompressés à la volée, en arrière-plan
+        (voir DataManager.iter_dat_batches), avec les mêmes sorties que le .dat.
+        Les étapes se recouvrent : un thread lit les lots, n_calcul threads les
+        calibrent et les interpolent (NumPy libère le GIL), et le thread appelant
+        exporte les lots dans l'ordre du fichier pendant que les suivants sont lus
+        et calculés. Les étapes sont reliées par des files bornées : au plus
+        profondeur lots sont en mémoire à un instant donné.
+        - path_data    : chemin du .dat à traiter (ou .dat.gz, .dat.zst, "archive.zip::membre.dat")
+        - output_dir   : dossier output/calibrated/ (ou output/netcdf/)
         - interpolation_mode : 'UV_Vis' ou 'UV'
+        - taille_lot   : nombre de spectres traités par lot
+        - format_export : 'txt' (un fichier par spectre), 'netcdf' (un fichier par run)
+                          ou 'store' (store memmap par run, voir SpectrumStoreWriter)
+        - stop_event   : threading.Event ; le run s'interrompt proprement après le lot en cours
+        - callback     : fonction appelée après chaque lot avec la progression
+                         {n_spectres, offset, taille, duree}
+        - n_calcul     : nombre de threads de calibration
+        - profondeur   : nombre max de lots en cours (défaut : 2 * n_calcul + 1)
+        - options_export : options de l'exporteur (ex. par_capteur=True pour NetCDF,
+                           n_threads pour l'export txt)
+        Retourne le nombre de spectres traités.
+        """
+        nom_run = DataManager.nom_source(path_data)
+        taille = DataManager.taille_source(path_data)
+        n_calcul = max(1, int(n_calcul))
+        profondeur = profondeur or 2 * n_calcul + 1
+        arret = threading.Event()  # Levé à la sortie (fin, erreur ou interruption) : les threads s'arrêtent
+        en_cours = threading.BoundedSemaphore(profondeur)  # Lots lus et pas encore exportés
+        file_lots = queue.Queue(maxsize=profondeur)  # Lecture -> calcul : (numéro, lot), None en fin
+        file_resultats = queue.Queue(maxsize=profondeur)  # Calcul -> export : (numéro, fin, résultat)
+
+        def lire():
+            try:
+                lots = self.instrumentation.iterer('parse', DataManager.iter_dat_batches(path_data, taille_lot=taille_lot))
+                numero = 0
+                while _acquerir(en_cours, arret) and not (stop_event is not None and stop_event.is_set()):
+                    lot = next(lots, None)
+                    if lot is None or not _deposer(file_lots, (numero, lot), arret):
+                        break
+                    numero += 1
+            except Exception as e:
+                _deposer(file_resultats, e, arret)
+            finally:
+                for _ in range(n_calcul):
+                    _deposer(file_lots, None, arret)
+
+        def calculer():
+            try:
+                while not arret.is_set():
+                    try:
+                        element = file_lots.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if element is None:
+                        break
+                    numero, lot = element
+                    resultat = self.calibrer_lot(lot, interpolation_mode)
+                    _deposer(file_resultats, (numero, lot['fin'], resultat), arret)
+            except Exception as e:
+                _deposer(file_resultats, e, arret)
+            finally:
+                _deposer(file_resultats, None, arret)
+
+        threads = [threading.Thread(target=lire, name='pipeline-lecture', daemon=True)]
+        threads += [threading.Thread(target=calculer, name=f'pipeline-calcul-{i}', daemon=True)
+                    for i in range(n_calcul)]
+        n_spectres = 0
+        t0 = time.perf_counter()
+        try:
+            with ExportManager.creer(format_export, output_dir, nom_run, **options_export) as writer:
+                for thread in threads:
+                    thread.start()
+                en_attente = {}  # {numéro: (fin, résultat)} des lots calculés avant leur tour
+                suivant = 0
+                n_termines = 0
+                while n_termines < n_calcul:
+                    element = file_resultats.get()
+                    if element is None:
+                        n_termines += 1
+                        continue
+                    if isinstance(element, Exception):
+                        raise element
+                    numero, fin, resultat = element
+                    en_attente[numero] = (fin, resultat)
+                    while suivant in en_attente:
+                        fin, resultat = en_attente.pop(suivant)
+                        suivant += 1
+                        n_spectres += self.exporter_lot(resultat, writer)
+                        en_cours.release()
+                        if callback is not None:
+                            callback({'n_spectres': n_spectres, 'offset': fin, 'taille': taille,
+                                      'duree': time.perf_counter() - t0})
+                        if stop_event is not None and stop_event.is_set():
+                            logger.warning("Pipeline interrompu après %d spectres", n_spectres)
+                            return n_spectres
+        finally:
+            arret.set()
+            for thread in threads:
+                thread.join()
+
+        logger.info("Pipeline terminé : %d spectres calibrés et exportés dans %s", n_spectres, output_dir)
+        return n_spectres
+
+    def run_sharded_pipeline(self, path_data, output_dir, interpolation_mode='UV_Vis', max_workers=None,
+                             taille_lot=1024, format_export='txt', taille_plage=TAILLE_PLAGE,
+                             stop_event=None, callback=None, **options_export):
+        """
+        Pipeline d'un seul gros fichier .dat réparti sur plusieurs cœurs : le fichier
+        est découpé en plages d'octets alignées sur les balises [Spectrum]
+        (DataManager.decouper_plages), chaque plage est lue, contrôlée, calibrée et
+        interpolée dans un processus du pool, puis les lots sont exportés ici, dans
+        l'ordre du fichier, par un seul exporteur : mêmes sorties que
+        run_full_calibration_pipeline (aux arrondis près du produit matriciel
+        d'interpolation, qui dépendent de la taille des lots). Au plus
+        2 * max_workers plages sont en cours à un instant donné : la mémoire reste bornée.
+        - max_workers  : nombre de processus (défaut : nombre de cœurs ; 1 = en série)
+        - taille_plage : taille visée (octets) de chaque plage (au moins une plage par processus)
+        - stop_event, callback, options_export : voir run_full_calibration_pipeline
+        Un fichier compressé, qui ne peut être lu que d'un bout à l'autre, est traité
+        par run_full_calibration_pipeline.
+        Retourne le nombre de spectres traités.
+        """
+        if DataManager.est_compresse(path_data):
+            logger.info("%s : fichier compressé, lu en flux sans découpage", path_data)
+            return self.run_full_calibration_pipeline(path_data, output_dir, interpolation_mode, taille_lot,
+                                                      format_export, stop_event=stop_event, callback=callback,
+                                                      **options_export)
+        nom_run = DataManager.nom_source(path_data)
+        taille = DataManager.taille_source(path_data)
+        n_workers = max_workers or os.cpu_count() or 1
+        plages = DataManager.decouper_plages(path_data, max(n_workers, -(-taille // taille_plage)))
+        logger.info("%s : %d plages sur %d processus", path_data, len(plages), n_workers)
+        if not self.calibrations:
+            self.preload_calibrations()
+        args = (path_data, interpolation_mode, taille_lot)
+
+        n_spectres = 0
+        t0 = time.perf_counter()
+        with ExportManager.creer(format_export, output_dir, nom_run, **options_export) as writer:
+            if n_workers == 1 or len(plages) <= 1:
+                _init_worker(self.registre, self.calibrations, self.qc, self.traitement)
+                resultats = (_calibrer_plage(*args, debut, fin) for debut, fin in plages)
+                pool = None
+            else:
+                pool = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                           initargs=(self.registre, self.calibrations, self.qc, self.traitement))
+                resultats = _resultats_dans_ordre(pool, _calibrer_plage, args, plages, 2 * n_workers)
+            try:
+                for resultat in resultats:
+                    self.instrumentation.fusionner(resultat['instrumentation'])
+                    self.n_rejetes_qc += resultat['n_rejetes_qc']
+                    for lot in resultat['lots']:
+                        n_spectres += self.exporter_lot(lot, writer)
+                    if callback is not None:
+                        callback({'n_spectres': n_spectres, 'offset': resultat['fin'], 'taille': taille,
+                                  'duree': time.perf_counter() - t0})
+                    if stop_event is not None and stop_event.is_set():
+                        logger.warning("Pipeline interrompu après %d spectres", n_spectres)
+                        return n_spectres
+            finally:
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+
+        logger.info("Pipeline terminé : %d spectres calibrés et exportés dans %s (%d plages)",
+                    n_spectres, output_dir, len(plages))
+        return n_spectres
+
+    def run_incremental_pipeline(self, path_data, output_dir, interpolation_mode='UV_Vis', taille_lot=1024,
+                                 format_export='txt', path_manifest=None, **options_export):
         """
-        # 1. Charger tous les spectres bruts (.dat)
-        spectres = DataManager.parse_dat_file(path_data)
+        Traitement incrémental d'un export qui grossit : seuls les spectres ajoutés
+        depuis le dernier run sont calibrés puis ajoutés aux sorties existantes.
+        Un manifeste (offset atteint, IDData traités, lignes de chaque fichier de sortie)
+        est validé après chaque lot : après un arrêt brutal, le run suivant ramène les
+        sorties NetCDF / store à leurs lignes validées et reprend au dernier lot validé.
+        - path_manifest : chemin du manifeste (défaut : output_dir/<nom_run>.manifest.json)
+        L'agrégation temporelle n'est pas disponible : un intervalle encore ouvert à la
+        fin d'un run serait émis incomplet, puis une seconde fois par le run suivant.
+        Retourne le nombre de nouveaux spectres traités.
+        """
+        if DataManager.est_compresse(path_data):
+            raise ValueError(f"Le mode incrémental nécessite un fichier non compressé : {path_data}")
+        if options_export.get('agregation') is not None:
+            raise ValueError("L'agrégation temporelle n'est pas disponible en mode incrémental.")
+        nom_run = DataManager.nom_source(path_data)
+        if path_manifest is None:
+            path_manifest = os.path.join(output_dir, f"{nom_run}.manifest.json")
+        manifest = RunManifest.charger(path_manifest, path_data)
+        if format_export in ('netcdf', 'store'):
+            options_export.setdefault('mode', 'a')
+            options_export.setdefault('lignes_validees', manifest.sorties)
 
-        for spectre in spectres:
-            entete = spectre['entete']
-            nom_capteur = entete['device']
-            integtime = int(entete['integration_time'])
+        n_spectres = 0
+        with ExportManager.creer(format_export, output_dir, nom_run, **options_export) as writer, \
+                open(path_data, 'rb') as f:
+            f.seek(manifest.offset)
+            lots = DataManager.iter_lots_flux(f, taille_lot, offset=manifest.offset)
+            for lot in self.instrumentation.iterer('parse', lots):
+                ids = lot['entete']['IDData']
+                nouveaux = np.fromiter((i not in manifest.ids for i in ids.tolist()), dtype=bool, count=len(ids))
+                if nouveaux.any():
+                    n_spectres += self.process_batch(DataManager.select_lot(lot, nouveaux), writer,
+                                                     interpolation_mode)
+                    writer.flush()
+                manifest.commit(lot['fin'], ids[nouveaux].tolist(), writer.lignes())
 
-            # 2. Obtenir ou créer l'objet CapteurTRIOS approprié
-            capteur = self.get_or_create_capteur(nom_capteur, integtime)
+        logger.info("Run incrémental terminé : %d nouveaux spectres (offset %d octets) exportés dans %s",
+                    n_spectres, manifest.offset, output_dir)
+        return n_spectres
 
-            # 3. Calibration du spectre
-            raw_data = np.array(spectre['data'])
-            raw_lamda = np.array(spectre['lambda'])
-            capteur.calibrate_spectre(raw_data, raw_lamda)
-            capteur.interpolate_spectre(mode=interpolation_mode)
+    def run_follow_pipeline(self, path_data, output_dir, interpolation_mode='UV_Vis', format_export='txt',
+                            intervalle=0.2, offset=0, stop_event=None, inactivite_max=None, callback=None,
+                            **options_export):
+        """
+        Mode suivi : calibre et exporte les spectres d'un .dat au fur et à mesure
+        de son écriture par le logiciel d'acquisition (voir DataManager.follow_dat_batches).
+        Les sorties sont vidées sur disque après chaque lot.
+        - callback : fonction appelée après chaque lot avec les statistiques courantes
+        L'agrégation temporelle n'est pas disponible (intervalles ouverts perdus à l'arrêt).
+        Retourne les statistiques du suivi, dont la latence écriture -> sortie calibrée (s).
+        """
+        if DataManager.est_compresse(path_data):
+            raise ValueError(f"Le mode suivi nécessite un fichier non compressé : {path_data}")
+        if options_export.get('agregation') is not None:
+            raise ValueError("L'agrégation temporelle n'est pas disponible en mode suivi.")
+        nom_run = DataManager.nom_source(path_data)
+        stats = {'n_lots': 0, 'n_spectres': 0, 'offset': offset,
+                 'latence_derniere': None, 'latence_moyenne': None, 'latence_max': None}
+        somme_latences = 0.0
+        with ExportManager.creer(format_export, output_dir, nom_run, **options_export) as writer:
+            for lot in DataManager.follow_dat_batches(path_data, intervalle=intervalle, offset=offset,
+                                                      stop_event=stop_event, inactivite_max=inactivite_max):
+                n = self.process_batch(lot, writer, interpolation_mode)
+                writer.flush()
+                latence = max(time.time() - lot['mtime'], 0.0)
+                somme_latences += latence
+                stats['n_lots'] += 1
+                stats['n_spectres'] += n
+                stats['offset'] = lot['fin']
+                stats['latence_derniere'] = latence
+                stats['latence_moyenne'] = somme_latences / stats['n_lots']
+                stats['latence_max'] = max(stats['latence_max'] or 0.0, latence)
+                logger.info("Suivi : %d spectres calibrés (latence %.0f ms)", n, latence * 1000)
+                if callback is not None:
+                    callback(dict(stats))
 
-            # 4. Exporter le spectre calibré via DataManager
-            DataManager.save_calibrated_spectre_txt(
-                spectre=spectre,
-                sensor=capteur,
-                base_dir=output_dir  # base_dir ou project_root selon ta méthode d'export
-            )
+        logger.info("Suivi terminé : %d spectres exportés dans %s", stats['n_spectres'], output_dir)
+        return stats
 
-        print(f"[INFO] Pipeline terminé : {len(spectres)} spectres calibrés et exportés dans {output_dir}")
+    def process_batch(self, lot, writer, interpolation_mode='UV_Vis'):
+        """
+        Contrôle qualité, calibration, interpolation et export d'un lot de spectres
+        (format parse_dat_arrays).
+        - writer : exporteur (voir ExportManager.creer)
+        Retourne le nombre de spectres exportés.
+        """
+        return self.exporter_lot(self.calibrer_lot(lot, interpolation_mode), writer)
 
-    # ... tu peux ajouter des méthodes utilitaires/logs si besoin
+    def calibrer_lot(self, lot, interpolation_mode='UV_Vis'):
+        """
+        Contrôle qualité, calibration, interpolation et filtres (traitement) d'un lot
+        de spectres (format parse_dat_arrays), sans export. Peut être appelé depuis plusieurs threads.
+        Retourne (table, new_lam, data, capteurs) pour exporter_lot, ou None si le lot est vide.
+        """
+        if len(lot['data']) == 0:
+            return None
+        with self.instrumentation.mesure('qc', len(lot['data'])):
+            lot, n_rejetes = self.qc.appliquer(lot)
+        if n_rejetes:
+            with self._verrou:
+                self.n_rejetes_qc += n_rejetes
+            logger.info("Contrôle qualité : %d spectres rejetés", n_rejetes)
+        table = lot['entete']
+        n_spectres = len(lot['data'])
+        if n_spectres == 0:
+            return None
+
+        # 1. Regrouper les spectres par (capteur, calibration valable à leur date, temps d'intégration)
+        devices = np.char.upper(np.char.strip(np.asarray(table['IDDevice']).astype(str)))
+        numeros = np.zeros(n_spectres, dtype=np.int64)
+        for nom_capteur in np.unique(devices).tolist():
+            if self.registre.n_epoques(nom_capteur) > 1:
+                rows = np.flatnonzero(devices == nom_capteur)
+                numeros[rows] = self.registre.numeros(nom_capteur, table['DateTime'][rows])
+        groupes = {}
+        for i, key in enumerate(zip(devices.tolist(), numeros.tolist(), table['IntegrationTime'].tolist())):
+            groupes.setdefault(key, []).append(i)
+
+        # 2. Calibration et interpolation vectorisées : une passe NumPy par groupe
+        data = None
+        capteurs = [None] * n_spectres
+        for (nom_capteur, numero, integtime), indices in groupes.items():
+            capteur = self.get_or_create_capteur(nom_capteur, int(integtime), numero)
+            lambda_calib, data_calib = capteur.calibrate_batch(lot['data'][indices], lot['lambda'])
+            new_lam, new_data = capteur.interpolate_batch(lambda_calib, data_calib, mode=interpolation_mode)
+            if data is None:
+                data = np.empty((n_spectres, new_lam.size))
+            data[indices] = new_data
+            for i in indices:
+                capteurs[i] = capteur
+
+        # 3. Chaîne de filtres optionnelle (lissage, dérivées, normalisation...), en place
+        if self.traitement is not None:
+            with self.instrumentation.mesure('traitement', n_spectres):
+                data = self.traitement.appliquer(new_lam, data)
+
+        return table, new_lam, data, capteurs
+
+    def exporter_lot(self, resultat, writer):
+        """
+        Exporte un lot calibré par calibrer_lot, dans l'ordre du fichier.
+        Retourne le nombre de spectres exportés.
+        """
+        if resultat is None:
+            return 0
+        table, new_lam, data, capteurs = resultat
+        with self.instrumentation.mesure('export', len(data)):
+            writer.ecrire_lot(table, new_lam, data, capteurs)
+        return len(data)
+
+
+def _acquerir(semaphore, arret):
+    """
+    Acquiert semaphore, sauf si arret est levé entre-temps. Retourne True si acquis.
+    """
+    while not arret.is_set():
+        if semaphore.acquire(timeout=0.1):
+            return True
+    return False
+
+
+def _deposer(file, element, arret):
+    """
+    Dépose element dans une file bornée, sauf si arret est levé entre-temps
+    (un étage ne reste jamais bloqué après l'arrêt du pipeline). Retourne True si déposé.
+    """
+    while not arret.is_set():
+        try:
+            file.put(element, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+# --- Exécution dans les processus du pool (run_multi_files) ---
+
+_manager_worker = None  # CalibrationManager propre à chaque processus
+
+
+def _init_worker(registre, calibrations, qc=None, traitement=None):
+    """
+    Initialise le CalibrationManager du processus avec le registre et les calibrations
+    déjà chargés (les dossiers de calibration ne sont pas reparcourus).
+    """
+    global _manager_worker
+    _manager_worker = CalibrationManager(registre, qc=qc, traitement=traitement)
+    _manager_worker.calibrations = dict(calibrations)
+
+
+def _calibrer_plage(path_data, interpolation_mode, taille_lot, debut, fin):
+    """
+    Lit et calibre une plage d'octets d'un fichier dans le processus courant.
+    Retourne {'fin', 'lots' (résultats de calibrer_lot), 'n_rejetes_qc', 'instrumentation'} ;
+    les capteurs des lots sont réduits à ce dont les exporteurs ont besoin.
+    """
+    manager = _manager_worker
+    manager.set_instrumentation(Instrumentation())
+    manager.n_rejetes_qc = 0
+    legers = {}  # {id(CapteurTRIOS): capteur allégé}
+    lots = []
+    plage = DataManager.iter_dat_batches(path_data, taille_lot=taille_lot, debut=debut, fin=fin)
+    for lot in manager.instrumentation.iterer('parse', plage):
+        resultat = manager.calibrer_lot(lot, interpolation_mode)
+        if resultat is None:
+            continue
+        table, new_lam, data, capteurs = resultat
+        for c in capteurs:
+            if id(c) not in legers:
+                legers[id(c)] = SimpleNamespace(nom_capteur=c.nom_capteur, fichier_Cal=getattr(c, 'fichier_Cal', 'NC'))
+        lots.append((table, new_lam, data, [legers[id(c)] for c in capteurs]))
+    return {'fin': fin, 'lots': lots, 'n_rejetes_qc': manager.n_rejetes_qc, 'instrumentation': manager.instrumentation}
+
+
+def _resultats_dans_ordre(pool, fonction, args, plages, fenetre):
+    """
+    Soumet fonction(*args, début, fin) pour chaque plage au pool et produit les
+    résultats dans l'ordre des plages, avec au plus fenetre tâches en cours.
+    """
+    en_cours = deque()
+    plages = iter(plages)
+    for debut, fin in plages:
+        en_cours.append(pool.submit(fonction, *args, debut, fin))
+        if len(en_cours) >= fenetre:
+            break
+    while en_cours:
+        resultat = en_cours.popleft().result()
+        for debut, fin in plages:
+            en_cours.append(pool.submit(fonction, *args, debut, fin))
+            break
+        yield resultat
+
+
+def _calibrer_fichier(path_data, output_dir, interpolation_mode, taille_lot, format_export, incremental,
+                      options_export):
+    """
+    Calibre un fichier dans le processus courant et retourne son résumé.
+    """
+    t0 = time.perf_counter()
+    resultat = {'fichier': path_data, 'n_spectres': 0, 'duree': 0.0, 'erreur': None}
+    _manager_worker.set_instrumentation(Instrumentation())
+    pipeline = (_manager_worker.run_incremental_pipeline if incremental
+                else _manager_worker.run_full_calibration_pipeline)
+    try:
+        resultat['n_spectres'] = pipeline(
+            path_data, output_dir, interpolation_mode, taille_lot, format_export, **options_export)
+    except Exception as e:
+        resultat['erreur'] = f"{type(e).__name__}: {e}"
+        resultat['traceback'] = traceback.format_exc()
+    resultat['duree'] = time.perf_counter() - t0
+    resultat['instrumentation'] = _manager_worker.instrumentation
+    return resultat
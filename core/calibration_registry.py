@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import logging
+import numpy as np
+from core.data_manager import DataManager
+
+logger = logging.getLogger(__name__)
+
+# Fichiers d'un jeu de calibration : {capteur}.ini, Back_{capteur}.dat, Cal_{capteur}.dat
+_RE_FICHIER = re.compile(r'^(?:(back|cal)_)?([^.]+)\.(ini|dat)$', re.IGNORECASE)
+DEBUT_INCONNU = np.datetime64('1970-01-01T00:00:00', 's')  # Calibration sans DateTime
+
+
+class EpoqueCalibration:
+    """
+    Une calibration d'un capteur : chemins des trois fichiers et début de validité.
+    La calibration est valable jusqu'au début de la suivante du même capteur.
+    """
+
+    def __init__(self, nom_capteur, dossier, chemins, debut):
+        self.nom_capteur = nom_capteur  # Nom normalisé (majuscules)
+        self.dossier = dossier          # Dossier du jeu de calibration
+        self.chemins = chemins          # (.ini, Back_*.dat, Cal_*.dat)
+        self.debut = debut              # datetime64[s]
+
+    def __repr__(self):
+        return f"EpoqueCalibration({self.nom_capteur}, {self.debut}, {self.dossier})"
+
+
+class RegistreCalibrations:
+    """
+    Index des calibrations disponibles sous une ou plusieurs racines, construit
+    en un seul parcours des dossiers : capteur (nom normalisé en majuscules,
+    SAM_85ae = SAM_85AE) x intervalle de validité -> fichiers de calibration.
+
+    Chaque dossier contenant des fichiers Cal_*.dat est un jeu de calibration
+    (ex. data/calibration/ALL_2023) ; une racine peut être un jeu ou un dossier
+    de jeux (ex. data/calibration/). La casse des noms de fichiers est ignorée
+    (SAM_839e.ini est associé à Cal_SAM_839E.dat).
+
+    Le début de validité d'une calibration est la date DateTime de son fichier
+    Cal_*.dat (date de l'étalonnage), ou celle donnée pour son jeu dans debuts ;
+    elle reste valable jusqu'à la calibration suivante du même capteur. Les
+    spectres antérieurs à la première calibration d'un capteur utilisent celle-ci.
+    Deux jeux contenant la même calibration (même début) n'en forment qu'une :
+    la première racine listée l'emporte.
+    """
+
+    def __init__(self, racines, debuts=None):
+        """
+        - racines : dossier ou liste de dossiers de calibration
+        - debuts  : {nom ou chemin d'un jeu: date ISO 8601} pour imposer le début
+                    de validité de toutes les calibrations d'un jeu
+        """
+        self.racines = [racines] if isinstance(racines, (str, os.PathLike)) else list(racines)
+        self.debuts = {cle: np.datetime64(valeur, 's') for cle, valeur in (debuts or {}).items()}
+        self.epoques = {}  # {nom normalisé: [EpoqueCalibration, ...] triées par début}
+        self._debuts = {}  # {nom normalisé: array datetime64[s] des débuts}
+        self.scanner()
+
+    @staticmethod
+    def normaliser(nom_capteur):
+        return str(nom_capteur).strip().upper()
+
+    def scanner(self):
+        """
+        Parcourt les racines et reconstruit l'index.
+        """
+        epoques = {}
+        for racine in self.racines:
+            if not os.path.isdir(racine):
+                raise FileNotFoundError(f"Dossier de calibration introuvable : {racine}")
+            for dossier, sous_dossiers, fichiers in os.walk(racine):
+                sous_dossiers[:] = sorted(d for d in sous_dossiers if not d.startswith('.'))
+                for epoque in self._scanner_jeu(dossier, fichiers):
+                    connues = epoques.setdefault(epoque.nom_capteur, {})
+                    if epoque.debut in connues:
+                        logger.debug("%s : calibration du %s déjà lue dans %s, ignorée dans %s", epoque.nom_capteur,
+                                     epoque.debut, connues[epoque.debut].dossier, dossier)
+                        continue
+                    connues[epoque.debut] = epoque
+        self.epoques = {nom: [connues[debut] for debut in sorted(connues)] for nom, connues in epoques.items()}
+        self._debuts = {nom: np.array([e.debut for e in liste], dtype='datetime64[s]')
+                        for nom, liste in self.epoques.items()}
+        logger.info("Registre de calibration : %d capteurs, %d calibrations (%s)", len(self.epoques),
+                    sum(len(liste) for liste in self.epoques.values()), ', '.join(map(str, self.racines)))
+
+    def _scanner_jeu(self, dossier, fichiers):
+        """
+        Calibrations complètes (.ini, Back_*.dat et Cal_*.dat) d'un dossier.
+        """
+        trouves = {}  # {nom normalisé: {'ini' | 'back' | 'cal': chemin}}
+        for fichier in sorted(fichiers):
+            m = _RE_FICHIER.match(fichier)
+            if m is None:
+                continue
+            prefixe, nom, extension = m.group(1), m.group(2), m.group(3).lower()
+            genre = prefixe.lower() if prefixe else 'ini'
+            if (genre == 'ini') != (extension == 'ini'):
+                continue
+            trouves.setdefault(self.normaliser(nom), {})[genre] = os.path.join(dossier, fichier)
+        debut_jeu = self.debuts.get(dossier, self.debuts.get(os.path.basename(os.path.normpath(dossier))))
+        for nom, chemins in sorted(trouves.items()):
+            if 'cal' not in chemins:
+                continue
+            manquants = [genre for genre in ('ini', 'back') if genre not in chemins]
+            if manquants:
+                logger.warning("Calibration ignorée pour %s dans %s : fichier(s) %s manquant(s)",
+                               nom, dossier, ', '.join(manquants))
+                continue
+            debut = debut_jeu
+            if debut is None:
+                debut = DataManager.read_cal_datetime(chemins['cal'])
+            yield EpoqueCalibration(nom, dossier, (chemins['ini'], chemins['back'], chemins['cal']),
+                                    DEBUT_INCONNU if debut is None else np.datetime64(debut, 's'))
+
+    def capteurs(self):
+        """
+        Noms normalisés des capteurs calibrés.
+        """
+        return sorted(self.epoques)
+
+    def n_epoques(self, nom_capteur):
+        return len(self.epoques.get(self.normaliser(nom_capteur), ()))
+
+    def epoque(self, nom_capteur, numero=0):
+        """
+        Calibration numero (dans l'ordre chronologique) d'un capteur.
+        """
+        nom = self.normaliser(nom_capteur)
+        if nom not in self.epoques:
+            raise FileNotFoundError(f"Aucune calibration pour {nom_capteur} dans {', '.join(map(str, self.racines))}")
+        return self.epoques[nom][numero]
+
+    def numeros(self, nom_capteur, dates):
+        """
+        Numéro de la calibration valable pour chaque date (datetime64) : recherche
+        dichotomique dans les débuts de validité du capteur.
+        """
+        debuts = self._debuts.get(self.normaliser(nom_capteur))
+        if debuts is None:
+            raise FileNotFoundError(f"Aucune calibration pour {nom_capteur} dans {', '.join(map(str, self.racines))}")
+        dates = np.asarray(dates).astype('datetime64[s]')
+        return np.maximum(np.searchsorted(debuts, dates, side='right') - 1, 0)
@@ -7,19 +7,58 @@ Created on Wed May 21 10:42:46 2025
 """
 
 import os
+import logging
+import threading
+from collections import OrderedDict
 import numpy as np
 from scipy.interpolate import interp1d
 from core.data_manager import DataManager
+from core.instrumentation import mesurer
+
+logger = logging.getLogger(__name__)
+
+# Grilles d'interpolation prédéfinies : mode -> (début, fin exclue, pas) en nm
+GRILLES_INTERPOLATION = {
+    'UV_Vis': (310, 951, 1),
+    'UV': (280, 501, 1),
+}
+
+# Nombre maximal d'opérateurs d'interpolation gardés en mémoire par capteur (LRU)
+TAILLE_CACHE_OPERATEURS = 64
+
+
+def grille_interpolation(mode='UV_Vis'):
+    """
+    Retourne la grille de longueurs d'onde cible d'un mode d'interpolation.
+    - mode : nom prédéfini ('UV_Vis', 'UV'), tuple (début, fin exclue, pas)
+             ou tableau de longueurs d'onde
+    """
+    if isinstance(mode, str):
+        if mode not in GRILLES_INTERPOLATION:
+            raise ValueError("Mode d'interpolation inconnu.")
+        return np.arange(*GRILLES_INTERPOLATION[mode])
+    if isinstance(mode, tuple) and len(mode) == 3:
+        return np.arange(*mode)
+    grille = np.asarray(mode)
+    if grille.ndim != 1 or grille.size == 0:
+        raise ValueError("Mode d'interpolation inconnu.")
+    return grille
 
 
 class CapteurTRIOS:
     """
     Gère toute la calibration et le traitement métier d'UN capteur TRIOS.
     """
-    def __init__(self, nom_capteur, integtime, path_calib_dir):
+    def __init__(self, nom_capteur, integtime, path_calib_dir, chemins=None):
+        """
+        - chemins : (.ini, Back_*.dat, Cal_*.dat) déjà résolus (voir RegistreCalibrations) ;
+                    défaut : {nom_capteur}.ini, Back_{nom_capteur}.dat et Cal_{nom_capteur}.dat
+                    dans path_calib_dir
+        """
         self.nom_capteur = nom_capteur
         self.integtime = integtime
         self.path_calib_dir = path_calib_dir
+        self.chemins = chemins
 
         # Attributs calibration à charger depuis les fichiers
         self.coeff_c = None        # dict des coefficients polynomiaux calibration lambda (c0s, c1s, c2s, c3s)
@@ -30,11 +69,23 @@ class CapteurTRIOS:
         self.dark_pixels = None    # Indices des pixels sombres
         self.cal_lambda = None     # Lambda calibrées (après calcul/interpolation)
         self.cal_data = None       # Données calibrées (après calcul/interpolation)
+        self._lambda_cache = {}    # Cache {axe pixels brut: lambda calibrées} (calcul une seule fois)
+        self._operateurs = OrderedDict()  # Cache LRU {(grille, lambda, masque): matrice d'interpolation}
+        self._verrou_operateurs = threading.Lock()  # Cache LRU partagé par les threads de calcul
+        self.instrumentation = None  # Instrumentation optionnelle (chronométrage par étape)
+
+    @staticmethod
+    def calibration_paths(path_calib_dir, nom_capteur):
+        """
+        Chemins des fichiers de calibration d'un capteur : (.ini, Back_*.dat, Cal_*.dat).
+        """
+        path_ini = os.path.join(path_calib_dir, f"{nom_capteur}.ini")
+        path_back = os.path.join(path_calib_dir, f"Back_{nom_capteur}.dat")
+        path_cal = os.path.join(path_calib_dir, f"Cal_{nom_capteur}.dat")
+        return path_ini, path_back, path_cal
 
     def load_calibration_files(self):
-        path_ini = os.path.join(self.path_calib_dir, f"{self.nom_capteur}.ini")
-        path_back = os.path.join(self.path_calib_dir, f"Back_{self.nom_capteur}.dat")
-        path_cal = os.path.join(self.path_calib_dir, f"Cal_{self.nom_capteur}.dat")
+        path_ini, path_back, path_cal = self.chemins or self.calibration_paths(self.path_calib_dir, self.nom_capteur)
 
         # Utilisation des méthodes statiques de DataManager
         self.coeff_c = DataManager.read_ini_file(path_ini)
@@ -46,7 +97,41 @@ class CapteurTRIOS:
 
         self.cal_lambda = None
         self.cal_data = None
-        print(f"[INFO] Calibration chargée pour {self.nom_capteur}")
+        self._lambda_cache = {}
+        self._operateurs = OrderedDict()
+        logger.info("Calibration chargée pour %s", self.nom_capteur)
+
+    def get_calibration(self):
+        """
+        Retourne les données de calibration brutes du capteur (indépendantes du
+        temps d'intégration), pour les partager avec d'autres objets ou processus.
+        """
+        return {
+            'coeff_c': self.coeff_c,
+            'B0': self.B0,
+            'B1': self.B1,
+            'cal': self.cal,
+            'fichier_Cal': self.fichier_Cal,
+        }
+
+    def set_calibration(self, calibration):
+        """
+        Initialise le capteur depuis des données de calibration déjà chargées
+        (voir get_calibration), sans relire les fichiers.
+        """
+        self.coeff_c = calibration['coeff_c']
+        self.dark_pixels = None
+        if 'DarkPixelStart' in self.coeff_c and 'DarkPixelStop' in self.coeff_c:
+            self.dark_pixels = (self.coeff_c['DarkPixelStart'], self.coeff_c['DarkPixelStop'])
+        self.B0 = calibration['B0']
+        self.B1 = calibration['B1']
+        self.cal = calibration['cal']
+        self.fichier_Cal = calibration['fichier_Cal']
+
+        self.cal_lambda = None
+        self.cal_data = None
+        self._lambda_cache = {}
+        self._operateurs = OrderedDict()
 
 
     def calcul_bruit_de_fond(self):
@@ -56,7 +141,7 @@ class CapteurTRIOS:
         if self.integtime is None:
             raise ValueError("Le temps d'intégration n'est pas défini.")
         self.B = self.B0 + (float(self.integtime) / t0) * self.B1
-        print(f"[INFO] Bruit de fond B calculé pour {self.nom_capteur} (taille : {len(self.B)})")
+        logger.debug("Bruit de fond B calculé pour %s (taille : %d)", self.nom_capteur, len(self.B))
 
     def calibrate_wavelengths(self, raw_lamda):
         if self.coeff_c is None:
@@ -67,7 +152,7 @@ class CapteurTRIOS:
         c3 = self.coeff_c['c3s']
         lam_mod = raw_lamda + 1
         lambda_calib = c0 + c1 * lam_mod + c2 * (lam_mod ** 2) + c3 * (lam_mod ** 3)
-        print(f"[INFO] Longueurs d'onde calibrées min/max : {lambda_calib.min()} / {lambda_calib.max()}")
+        logger.debug("Longueurs d'onde calibrées min/max : %s / %s", lambda_calib.min(), lambda_calib.max())
         return lambda_calib
 
     def calibrate_spectre(self, raw_data, raw_lamda):
@@ -91,27 +176,125 @@ class CapteurTRIOS:
         np.divide(e, self.cal, out=f, where=(self.cal != 0))
         f[self.cal == 0] = np.nan
         self.cal_data = f
-        print(f"[INFO] Calibration terminée pour un spectre du capteur {self.nom_capteur}.")
+        logger.debug("Calibration terminée pour un spectre du capteur %s.", self.nom_capteur)
+
+    def get_calibrated_wavelengths(self, raw_lamda):
+        """
+        Retourne les longueurs d'onde calibrées pour un axe pixels donné.
+        Le polynôme n'est évalué qu'une fois par capteur et par axe pixels,
+        puis réutilisé pour tous les spectres (tableau en lecture seule).
+        """
+        raw_lamda = np.asarray(raw_lamda)
+        key = (raw_lamda.dtype.str, raw_lamda.tobytes())
+        lambda_calib = self._lambda_cache.get(key)
+        if lambda_calib is None:
+            lambda_calib = self.calibrate_wavelengths(raw_lamda)
+            lambda_calib.flags.writeable = False
+            self._lambda_cache[key] = lambda_calib
+        return lambda_calib
+
+    def calibrate_batch(self, raw_counts, raw_lamda):
+        """
+        Calibre en une seule passe NumPy tous les spectres d'un même groupe
+        (capteur, temps d'intégration).
+        - raw_counts : matrice (N, 255) des comptes bruts
+        - raw_lamda  : axe pixels commun aux N spectres
+        Retourne (lambda_calib, data_calib) avec data_calib de forme (N, 255).
+        Résultats identiques, bit à bit, à calibrate_spectre appliqué spectre par spectre.
+        Ne modifie pas l'état du capteur : peut être appelée depuis plusieurs threads.
+        """
+        raw_counts = np.atleast_2d(raw_counts)
+        n = raw_counts.shape[0]
+        with mesurer(self.instrumentation, 'calibration_lambda', n):
+            lambda_calib = self.get_calibrated_wavelengths(raw_lamda)
+        t0 = 8192.0
+        with mesurer(self.instrumentation, 'bruit_de_fond', n):
+            M = raw_counts / 65535.0
+            if self.B is None:
+                raise ValueError("Bruit de fond B non calculé.")
+            c = M - self.B
+            if self.dark_pixels is None:
+                raise ValueError("Indices des pixels sombres non définis.")
+            i0 = self.dark_pixels[0] - 1
+            i1 = self.dark_pixels[1]
+            offset = np.mean(c[:, i0:i1], axis=1, keepdims=True)
+            d = c - offset
+        with mesurer(self.instrumentation, 'sensibilite', n):
+            e = d * (t0 / float(self.integtime))
+            if self.cal is None:
+                raise ValueError("Fonction de sensibilité (cal) non chargée.")
+            f = np.empty_like(e)
+            np.divide(e, self.cal, out=f, where=(self.cal != 0))
+            f[:, self.cal == 0] = np.nan
+        return lambda_calib, f
+
+    def get_interpolation_operator(self, lambda_calib, mask, new_lam):
+        """
+        Retourne la matrice W (len(new_lam), mask.sum()) telle que
+        W @ data[mask] soit l'interpolation spline cubique (interp1d 'cubic')
+        de data sur new_lam. Lève ValueError avec moins de 4 points valides (trop peu
+        pour une spline cubique, comme interp1d). Calculée une fois par (grille,
+        lambda, masque) puis mise en cache (TAILLE_CACHE_OPERATEURS derniers utilisés).
+        Peut être appelée depuis plusieurs threads.
+        """
+        key = (new_lam.tobytes(), lambda_calib.tobytes(), mask.tobytes())
+        with self._verrou_operateurs:
+            W = self._operateurs.get(key)
+            if W is not None:
+                self._operateurs.move_to_end(key)
+                return W
+        lam = lambda_calib[mask]
+        if lam.size < 4:
+            raise ValueError("Pas assez de points valides pour interpoler.")
+        # L'interpolation étant linéaire en data, on interpole la matrice identité
+        interp = interp1d(lam, np.eye(lam.size), kind='cubic', axis=0,
+                          bounds_error=False, fill_value=np.nan)
+        W = np.ascontiguousarray(interp(new_lam))
+        W.flags.writeable = False
+        with self._verrou_operateurs:
+            self._operateurs[key] = W
+            self._operateurs.move_to_end(key)
+            while len(self._operateurs) > TAILLE_CACHE_OPERATEURS:
+                self._operateurs.popitem(last=False)
+        return W
+
+    def interpolate_batch(self, lambda_calib, data_calib, mode='UV_Vis'):
+        """
+        Interpole en un seul produit matriciel un lot de spectres calibrés.
+        - lambda_calib : longueurs d'onde calibrées communes au lot
+        - data_calib   : matrice (N, len(lambda_calib))
+        - mode         : 'UV_Vis', 'UV', tuple (début, fin exclue, pas) ou grille explicite
+        Les spectres dont le masque de NaN diffère de celui du capteur utilisent
+        l'opérateur propre à leur masque.
+        Retourne (new_lam, new_data) avec new_data de forme (N, len(new_lam)).
+        """
+        with mesurer(self.instrumentation, 'interpolation', np.atleast_2d(data_calib).shape[0]):
+            return self._interpolate_batch(lambda_calib, data_calib, mode)
+
+    def _interpolate_batch(self, lambda_calib, data_calib, mode):
+        new_lam = grille_interpolation(mode)
+        data_calib = np.atleast_2d(data_calib)
+        masks = (lambda_calib <= new_lam.max()) & np.isfinite(data_calib)
+        new_data = np.empty((data_calib.shape[0], new_lam.size))
+        if data_calib.shape[0] == 0:
+            return new_lam, new_data
+        uniques, inverse = np.unique(masks, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        for k, mask in enumerate(uniques):
+            W = self.get_interpolation_operator(lambda_calib, mask, new_lam)
+            if len(uniques) == 1:
+                new_data[:] = data_calib[:, mask] @ W.T
+            else:
+                rows = np.flatnonzero(inverse == k)
+                new_data[rows] = data_calib[np.ix_(rows, mask)] @ W.T
+        return new_lam, new_data
 
     def interpolate_spectre(self, mode='UV_Vis'):
         if self.cal_lambda is None or self.cal_data is None:
             raise ValueError("Données calibrées absentes.")
-        if mode == 'UV_Vis':
-            new_lam = np.arange(310, 951, 1)
-        elif mode == 'UV':
-            new_lam = np.arange(280, 501, 1)
-        else:
-            raise ValueError("Mode d'interpolation inconnu.")
-        limite_max = new_lam.max()
-        mask = (self.cal_lambda <= limite_max) & np.isfinite(self.cal_data)
-        lam = self.cal_lambda[mask]
-        dat = self.cal_data[mask]
-        if lam.size < 2:
-            raise ValueError("Pas assez de points valides pour interpoler.")
-        interp = interp1d(lam, dat, kind='cubic', bounds_error=False, fill_value=np.nan)
-        new_dat = interp(new_lam)
+        new_lam, new_dat = self.interpolate_batch(self.cal_lambda, self.cal_data, mode=mode)
         self.cal_lambda = new_lam
-        self.cal_data = new_dat
-        print(f"[INFO] Interpolation '{mode}' effectuée ({len(new_lam)} points).")
+        self.cal_data = new_dat[0]
+        logger.debug("Interpolation '%s' effectuée (%d points).", mode, len(new_lam))
 
     # ... et les méthodes utilitaires de lecture read_ini_file, read_back_file, read_cal_file, etc.
@@ -1,7 +1,42 @@
 # -*- coding: utf-8 -*-
 
+import io
 import os
+import re
+import glob
+import gzip
+import mmap
+import time
+import queue
+import struct
+import logging
+import zipfile
+import threading
 import numpy as np
+from core.spectra_index import SpectraIndex
+from core.spectrum_store import SpectrumStore, EXTENSION_STORE
+
+# Motifs de découpage des blocs d'un export TRIOS (.dat multi-spectres)
+_RE_SPECTRUM = re.compile(rb'\[Spectrum\]')
+_RE_CLE_VALEUR = re.compile(rb'\n(\w+)[ \t]*=[ \t]*([^\r\n]*)')
+_BALISES_DATA = (b'\n[DATA]', b'\n[Data]')
+_BALISES_END_DATA = (b'[END] of [DATA]', b'[END] of [Data]')
+_CARACTERES_ENTIERS = b'0123456789 \t\r\n-'
+TAILLE_TAMPON = 8 * 1024 * 1024  # Taille des lectures en mode flux (octets)
+TAILLE_TAMPON_COMPRESSE = 1024 * 1024  # Taille des lectures du fichier compressé (octets)
+TAILLE_LOT_COMPRESSE = 1024  # Spectres par lot lors de la lecture complète d'un fichier compressé
+EXTENSIONS_COMPRESSEES = ('.gz', '.zst')
+SEPARATEUR_MEMBRE = '::'  # Membre d'une archive zip : "archive.zip::dossier/export.dat"
+
+logger = logging.getLogger(__name__)
+
+# Typage des champs d'entête (les autres champs restent des chaînes)
+CHAMPS_FLOAT = ('InclV', 'InclX', 'InclY', 'Pressure', 'Temperature', 'Salinity',
+                'PositionLatitude', 'PositionLongitude', 'CalFactor', 'PathLength')
+CHAMPS_INT = ('Version', 'IntegrationTime', 'RecordType', 'MissionSub', 'InclValid',
+              'PressValid', 'RAWDynamic', 'PathLengthCustomOn', 'P31', 'P31e', 'p999')
+CHAMPS_DATETIME = ('DateTime',)
+
 
 class DataManager:
     """
@@ -11,18 +46,144 @@ class DataManager:
     """
 
 
+    @staticmethod
+    def list_dat_files(sources):
+        """
+        Liste triée des fichiers .dat désignés par sources : chemin de fichier,
+        dossier (tous ses .dat, .dat.gz, .dat.zst et .zip), motif glob, ou liste de ceux-ci.
+        Une archive zip est remplacée par ses membres .dat ("archive.zip::membre.dat"),
+        lisibles directement par toutes les méthodes de lecture.
+        """
+        if isinstance(sources, (str, os.PathLike)):
+            sources = [sources]
+        fichiers = []
+        for source in sources:
+            source = os.fspath(source)
+            if os.path.isdir(source):
+                for motif in ('*.dat', '*.dat.gz', '*.dat.zst', '*.zip'):
+                    for chemin in sorted(glob.glob(os.path.join(source, motif))):
+                        fichiers.extend(DataManager._membres_dat(chemin))
+            elif any(c in source for c in '*?['):
+                for chemin in sorted(glob.glob(source, recursive=True)):
+                    fichiers.extend(DataManager._membres_dat(chemin))
+            elif os.path.isfile(source):
+                fichiers.extend(DataManager._membres_dat(source))
+            elif SEPARATEUR_MEMBRE in source and os.path.isfile(source.split(SEPARATEUR_MEMBRE, 1)[0]):
+                fichiers.append(source)
+            else:
+                raise FileNotFoundError(f"Aucun fichier .dat pour : {source}")
+        return list(dict.fromkeys(fichiers))
+
+    @staticmethod
+    def _membres_dat(chemin):
+        """
+        [chemin], ou les membres .dat d'une archive zip ("archive.zip::membre.dat").
+        """
+        if not chemin.lower().endswith('.zip'):
+            return [chemin]
+        with zipfile.ZipFile(chemin) as zf:
+            membres = sorted(info.filename for info in zf.infolist()
+                             if not info.is_dir() and info.filename.lower().endswith('.dat'))
+        return [f"{chemin}{SEPARATEUR_MEMBRE}{membre}" for membre in membres]
+
+    @staticmethod
+    def decomposer_source(source):
+        """
+        (chemin du fichier, membre de l'archive zip ou None) d'une source.
+        """
+        source = os.fspath(source)
+        if SEPARATEUR_MEMBRE in source:
+            chemin, membre = source.split(SEPARATEUR_MEMBRE, 1)
+            return chemin, membre
+        return source, None
+
+    @staticmethod
+    def est_compresse(source):
+        """
+        True pour un fichier .gz / .zst ou un membre d'archive zip (lecture en flux
+        seulement, sans accès direct aux octets du fichier).
+        """
+        chemin, membre = DataManager.decomposer_source(source)
+        return membre is not None or chemin.lower().endswith(EXTENSIONS_COMPRESSEES)
+
+    @staticmethod
+    def nom_source(source):
+        """
+        Nom du run d'une source : nom du fichier .dat sans extensions
+        (export.dat, export.dat.gz et archive.zip::export.dat donnent "export").
+        """
+        chemin, membre = DataManager.decomposer_source(source)
+        nom = os.path.basename(membre if membre is not None else chemin)
+        for ext in EXTENSIONS_COMPRESSEES:
+            if nom.lower().endswith(ext):
+                nom = nom[:-len(ext)]
+        return os.path.splitext(nom)[0]
+
+    @staticmethod
+    def taille_source(source):
+        """
+        Taille (octets) des données décompressées d'une source, lue sans décompresser
+        (répertoire du zip, champ ISIZE du .gz, entête de la première trame du .zst :
+        exacte pour un .gz ou un .zst d'un seul tenant), ou None si elle est inconnue.
+        """
+        chemin, membre = DataManager.decomposer_source(source)
+        if membre is not None:
+            with zipfile.ZipFile(chemin) as zf:
+                return zf.getinfo(membre).file_size
+        extension = chemin.lower()
+        if extension.endswith('.gz'):
+            with open(chemin, 'rb') as f:
+                f.seek(-4, os.SEEK_END)
+                return struct.unpack('<I', f.read(4))[0]  # Taille modulo 2**32 du dernier membre
+        if extension.endswith('.zst'):
+            zstandard = _importer_zstandard()
+            with open(chemin, 'rb') as f:
+                taille = zstandard.frame_content_size(f.read(18))
+            return taille if taille >= 0 else None
+        return os.path.getsize(chemin)
+
+    @staticmethod
+    def ouvrir_flux(source):
+        """
+        Ouvre une source en lecture binaire : fichier .dat, .dat.gz, .dat.zst ou
+        membre d'archive zip, décompressé à la volée.
+        """
+        chemin, membre = DataManager.decomposer_source(source)
+        if membre is not None:
+            with zipfile.ZipFile(chemin) as zf:
+                return zf.open(membre)  # Le membre garde l'archive ouverte jusqu'à sa fermeture
+        extension = chemin.lower()
+        if extension.endswith('.gz'):
+            return gzip.open(chemin, 'rb')
+        if extension.endswith('.zst'):
+            zstandard = _importer_zstandard()
+            return zstandard.ZstdDecompressor().stream_reader(
+                open(chemin, 'rb'), read_size=TAILLE_TAMPON_COMPRESSE, read_across_frames=True, closefd=True)
+        return open(chemin, 'rb')
+
     @staticmethod
     def parse_dat_file(path_data):
         """
         Parcourt le fichier .dat, lit chaque (entête + bloc data) et retourne
         une liste de spectres (dict {'entete', 'lambda', 'data'}).
         """
-        spectres = []
-        with open(path_data, 'r') as f:
+        return list(DataManager.iter_dat_file(path_data))
+
+    @staticmethod
+    def iter_dat_file(path_data):
+        """
+        Version générateur de parse_dat_file : produit les spectres
+        (dict {'entete', 'lambda', 'data'}) un par un, au fil de la lecture.
+        Les fichiers compressés sont décompressés à la volée (voir ouvrir_flux).
+        """
+        f = (io.TextIOWrapper(DataManager.ouvrir_flux(path_data)) if DataManager.est_compresse(path_data)
+             else open(path_data, 'r'))
+        with f:
+            suivante = None  # Ligne lue d'avance (début du bloc suivant)
             while True:
                 # Lire l'entête
                 entete = {}
-                line = f.readline()
+                line = suivante if suivante is not None else f.readline()
                 # Aller jusqu'à [DATA] ou [Data]
                 while line and line[0:6] not in ['[DATA]', '[Data]']:
                     if line.startswith('IDDevice'):
@@ -62,24 +223,420 @@ class DataManager:
                     else:
                         data.append(int(parts[1]))
 
-                # Stocker le spectre
-                spectres.append({
-                    'entete': entete.copy(),
-                    'lambda': lamda.copy(),
-                    'data': data.copy()
-                })
-                # Chercher si un autre bloc arrive (ou EOF)
-                pos = f.tell()
+                # Produire le spectre
+                yield {'entete': entete, 'lambda': lamda, 'data': data}
+                # Chercher si un autre bloc arrive (ou EOF), sans revenir en arrière dans le flux
                 next_line = f.readline()
                 while next_line and (next_line.strip() == '' or next_line.startswith('[Spectrum]')):
-                    pos = f.tell()
                     next_line = f.readline()
                 if not next_line:
                     break
-                f.seek(pos)
-        return spectres
+                suivante = next_line
+
+
+
+    @staticmethod
+    def parse_dat_arrays(path_data):
+        """
+        Lecture vectorisée d'un fichier .dat multi-spectres.
+        Le fichier est projeté en mémoire (mmap), les blocs [Spectrum] / [DATA]
+        sont localisés par leurs offsets puis chaque section [DATA] est convertie
+        directement depuis le fichier projeté, sans copie de l'ensemble des sections.
+
+        Retourne un dict :
+        - 'entete' : table colonnaire {champ: array de taille N} couvrant tous les
+                     champs d'entête (DateTime en datetime64, champs numériques typés)
+        - 'lambda' : axe pixels (int64, même convention que parse_dat_file)
+        - 'data'   : matrice des comptes (N, 255) en uint16 (int32 si hors plage),
+                     les pixels NaN valant 0
+        - 'erreur', 'statut' : colonnes 3 et 4 de [DATA] (N, 255), si présentes
+        - 'nan'    : masque (N, 255) des comptes NaN, si le fichier en contient
+        Les spectres dont la section [DATA] est incomplète ou mal formée sont ignorés.
+        Un fichier compressé est lu en flux (iter_dat_batches) puis ses lots sont
+        réunis (concatener_lots) : le texte décompressé n'est jamais gardé en entier.
+        """
+        if DataManager.est_compresse(path_data):
+            return DataManager.concatener_lots(
+                DataManager.iter_dat_batches(path_data, taille_lot=TAILLE_LOT_COMPRESSE))
+        with open(path_data, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return DataManager._blocs_vers_arrays([], [])
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                entetes, bornes, _ = DataManager._decouper_blocs(mm, positions=True)
+                return DataManager._blocs_vers_arrays(entetes, bornes, mm)
+
+    @staticmethod
+    def iter_dat_batches(path_data, taille_lot=1024, taille_tampon=TAILLE_TAMPON, debut=0, fin=None):
+        """
+        Lecture en flux d'un fichier .dat : produit des lots d'au plus taille_lot
+        spectres, au même format que parse_dat_arrays, au fur et à mesure de la
+        lecture. La mémoire utilisée reste bornée quelle que soit la taille du fichier.
+        - debut, fin : plage d'octets à lire (voir decouper_plages ; défaut : tout le fichier)
+        Un fichier compressé (ou un membre de zip) est décompressé par un thread en
+        arrière-plan (LectureEnFond) pendant que les lots précédents sont traités ;
+        les lots et leurs offsets 'fin' (en octets décompressés) sont ceux du fichier
+        décompressé.
+        """
+        if DataManager.est_compresse(path_data):
+            if debut or fin is not None:
+                raise ValueError(f"Lecture d'une plage d'octets impossible dans un fichier compressé : {path_data}")
+            with LectureEnFond(DataManager.ouvrir_flux(path_data), taille_tampon) as f:
+                yield from DataManager.iter_lots_flux(f, taille_lot, taille_tampon)
+            return
+        with open(path_data, 'rb') as f:
+            f.seek(debut)
+            taille_max = None if fin is None else fin - debut
+            yield from DataManager.iter_lots_flux(f, taille_lot, taille_tampon, offset=debut, taille_max=taille_max)
+
+    @staticmethod
+    def decouper_plages(path_data, n_plages):
+        """
+        Découpe un fichier .dat en au plus n_plages plages d'octets (début, fin) de
+        tailles voisines, alignées sur les balises [Spectrum] : chaque plage contient
+        des blocs complets et peut être lue indépendamment (iter_dat_batches(debut=, fin=)).
+        """
+        if DataManager.est_compresse(path_data):
+            raise ValueError(f"Découpage en plages impossible pour un fichier compressé : {path_data}")
+        taille = os.path.getsize(path_data)
+        if taille == 0:
+            return []
+        with open(path_data, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            bornes = [0]
+            for k in range(1, max(1, n_plages)):
+                pos = mm.find(b'[Spectrum]', max(bornes[-1] + 1, k * taille // n_plages))
+                if pos < 0:
+                    break
+                if pos > bornes[-1]:
+                    bornes.append(pos)
+        bornes.append(taille)
+        return list(zip(bornes[:-1], bornes[1:]))
+
+    @staticmethod
+    def iter_lots_flux(flux, taille_lot=1024, taille_tampon=TAILLE_TAMPON, offset=0, taille_max=None):
+        """
+        Regroupe en lots de taille_lot spectres les blocs lus depuis un flux binaire.
+        Chaque lot contient en plus 'fin' : l'offset (octets, relatif à offset) de la
+        fin de son dernier bloc, pour reprendre la lecture juste après.
+        - taille_max : nombre max d'octets lus dans le flux (défaut : jusqu'à la fin)
+        """
+        entetes, sections = [], []
+        for entete, section, fin in DataManager._iter_blocs(flux, taille_tampon, offset, taille_max):
+            entetes.append(entete)
+            sections.append(section)
+            if len(sections) >= taille_lot:
+                lot = DataManager._blocs_vers_arrays(entetes, sections)
+                lot['fin'] = fin
+                yield lot
+                entetes, sections = [], []
+        if sections:
+            lot = DataManager._blocs_vers_arrays(entetes, sections)
+            lot['fin'] = fin
+            yield lot
+
+    @staticmethod
+    def follow_dat_batches(path_data, intervalle=0.2, offset=0, stop_event=None, inactivite_max=None,
+                           taille_lot=1024):
+        """
+        Suit un fichier .dat en cours d'écriture (comme tail -f) et produit, dès
+        qu'ils sont complets, les nouveaux blocs [Spectrum]...[END] of [DATA] sous
+        forme de lots (format parse_dat_arrays). Un bloc partiellement écrit reste
+        en attente jusqu'à l'écriture de sa balise de fin.
+        Chaque lot contient en plus :
+        - 'fin'   : offset de fin du dernier bloc du lot
+        - 'mtime' : date de dernière modification du fichier (time.time) lors de la
+                    détection du lot, pour mesurer la latence écriture -> sortie
+        - intervalle     : période de scrutation du fichier (s)
+        - offset         : position de départ (0 = début du fichier)
+        - stop_event     : threading.Event optionnel pour arrêter le suivi
+        - inactivite_max : arrêt après ce nombre de secondes sans nouvelle donnée (None = jamais)
+        """
+        reste = b''
+        derniere_activite = time.monotonic()
+        f = open(path_data, 'rb')
+        try:
+            f.seek(offset)
+            while stop_event is None or not stop_event.is_set():
+                st_chemin = os.stat(path_data)
+                if st_chemin.st_ino != os.fstat(f.fileno()).st_ino or st_chemin.st_size < offset + len(reste):
+                    # Fichier remplacé ou tronqué : on repart du début du nouveau fichier
+                    f.close()
+                    f = open(path_data, 'rb')
+                    offset, reste = 0, b''
+                morceau = f.read()
+                if not morceau:
+                    if inactivite_max is not None and time.monotonic() - derniere_activite > inactivite_max:
+                        break
+                    time.sleep(intervalle)
+                    continue
+                st = os.fstat(f.fileno())
+                derniere_activite = time.monotonic()
+                buf = reste + morceau if reste else morceau
+                entetes, sections, fins = DataManager._decouper_blocs(buf)
+                for i in range(0, len(sections), taille_lot):
+                    lot = DataManager._blocs_vers_arrays(entetes[i:i + taille_lot], sections[i:i + taille_lot])
+                    lot['fin'] = offset + fins[min(i + taille_lot, len(fins)) - 1]
+                    lot['mtime'] = st.st_mtime
+                    yield lot
+                consomme = fins[-1] if fins else 0
+                reste = buf[consomme:]
+                offset += consomme
+        finally:
+            f.close()
+
+    @staticmethod
+    def _iter_blocs(flux, taille_tampon=TAILLE_TAMPON, offset=0, taille_max=None):
+        """
+        Lit un flux binaire par tampons de taille_tampon octets et produit les blocs
+        complets (entête, section [DATA] brute, offset de fin du bloc). Le dernier
+        bloc d'un tampon, peut-être incomplet, est reporté sur la lecture suivante.
+        - offset     : position du flux au début de la lecture (pour des offsets absolus)
+        - taille_max : nombre max d'octets lus (défaut : jusqu'à la fin du flux)
+        """
+        reste = b''
+        restant = taille_max
+        while True:
+            if restant is None:
+                morceau = flux.read(taille_tampon)
+            else:
+                morceau = flux.read(min(taille_tampon, restant))
+                restant -= len(morceau)
+            buf = reste + morceau if reste else morceau
+            if not morceau:
+                limite = len(buf)
+            else:
+                limite = buf.rfind(b'[Spectrum]')
+                if limite <= 0:
+                    reste = buf
+                    continue
+            entetes, sections, fins = DataManager._decouper_blocs(buf, 0, limite)
+            for entete, section, fin in zip(entetes, sections, fins):
+                yield entete, section, offset + fin
+            reste = buf[limite:]
+            offset += limite
+            if not morceau:
+                break
+
+    @staticmethod
+    def _decouper_blocs(buf, debut=0, fin=None, positions=False):
+        """
+        Localise les blocs complets de buf[debut:fin] et retourne trois listes :
+        les entêtes (dict {champ: bytes}), les sections [DATA] brutes (bytes)
+        et les offsets de fin de bloc (juste après la balise [END] of [DATA]).
+        - positions : True pour obtenir les bornes (début, fin) des sections [DATA]
+                      dans buf au lieu de leurs copies
+        """
+        fin = len(buf) if fin is None else fin
+        starts = [m.start() for m in _RE_SPECTRUM.finditer(buf, debut, fin)]
+        bornes = starts[1:] + [fin]
+        entetes, sections, fins = [], [], []
+        for start, stop in zip(starts, bornes):
+            pos_data = DataManager._chercher(buf, _BALISES_DATA, start, stop)
+            if pos_data < 0:
+                continue
+            debut_data = buf.find(b'\n', pos_data + 1, stop) + 1
+            if debut_data == 0:
+                continue
+            fin_data = DataManager._chercher(buf, _BALISES_END_DATA, debut_data, stop)
+            if fin_data < 0:
+                continue  # bloc incomplet (fichier tronqué ou en cours d'écriture)
+            entetes.append(dict(_RE_CLE_VALEUR.findall(buf, start, pos_data)))
+            sections.append((debut_data, fin_data) if positions else buf[debut_data:fin_data])
+            fins.append(fin_data + len(_BALISES_END_DATA[0]))
+        return entetes, sections, fins
+
+    @staticmethod
+    def _chercher(buf, balises, debut, fin):
+        """
+        Position de la première balise trouvée dans buf[debut:fin] (-1 si absente).
+        """
+        for balise in balises:
+            pos = buf.find(balise, debut, fin)
+            if pos >= 0:
+                return pos
+        return -1
+
+    @staticmethod
+    def _blocs_vers_arrays(entetes, sections, buf=None):
+        """
+        Convertit les entêtes et sections [DATA] brutes en table colonnaire,
+        axe pixels et matrice des comptes.
+        - buf : si fourni, sections contient les bornes (début, fin) des sections
+                dans buf (fichier projeté en mémoire), lues une à une
+        Un spectre dont la section [DATA] n'a pas au moins 256 lignes complètes
+        (ou contient des valeurs illisibles) est ignoré avec un avertissement.
+        """
+        n = len(sections)
+        vide = {'entete': {}, 'lambda': np.empty(0, dtype=np.int64),
+                'data': np.empty((0, 255), dtype=np.uint16)}
+        if n == 0:
+            return vide
+
+        # Chaque section est convertie séparément (int32, float64 si elle contient des
+        # NaN) puis copiée dans les matrices finales en uint16 : ni copie de l'ensemble
+        # des sections, ni cube intermédiaire
+        ncol = 0
+        colonnes = None  # Comptes, puis erreur et statut si présents
+        nan = None
+        valides = []
+        for i, section in enumerate(sections):
+            if buf is not None:
+                section = buf[section[0]:section[1]]
+            valeurs = DataManager._lire_section(section)
+            fin_ligne = section.find(b'\n')
+            ncol_section = len(section[:fin_ligne if fin_ligne >= 0 else len(section)].split())
+            if colonnes is None and ncol_section >= 2:
+                ncol = ncol_section
+            if (valeurs is None or ncol < 2 or ncol_section != ncol
+                    or valeurs.size % ncol or valeurs.size < 256 * ncol):
+                continue
+            # Même convention que parse_dat_file : la première ligne de [DATA] est sautée
+            lignes = valeurs.reshape(-1, ncol)[1:256]
+            k = len(valides)
+            if colonnes is None:
+                lamda = lignes[:, 0].astype(np.int64)
+                colonnes = [np.empty((n, 255), dtype=np.uint16) for _ in range(3 if ncol >= 4 else 1)]
+            if lignes.dtype.kind == 'f':
+                nan_section = np.isnan(lignes[:, 1])
+                if nan_section.any():
+                    if nan is None:
+                        nan = np.zeros((n, 255), dtype=bool)
+                    nan[k] = nan_section
+                lignes = np.nan_to_num(lignes, nan=0.0)
+            for j in range(len(colonnes)):
+                DataManager._ecrire_compact(colonnes, j, k, lignes[:, j + 1])
+            valides.append(i)
+        if len(valides) < n:
+            logger.warning("%d spectre(s) sur %d ignoré(s) : section [DATA] incomplète ou mal formée.",
+                           n - len(valides), n)
+            if not valides:
+                return vide
+            entetes = [entetes[i] for i in valides]
+            colonnes = [colonne[:len(valides)] for colonne in colonnes]
+            if nan is not None:
+                nan = nan[:len(valides)]
+
+        lot = {'lambda': lamda}
+        if nan is not None:
+            lot['nan'] = nan
+        lot['data'] = colonnes[0]
+        if len(colonnes) == 3:
+            lot['erreur'], lot['statut'] = colonnes[1], colonnes[2]
+
+        # Table colonnaire typée de tous les champs d'entête
+        champs = {}
+        for entete in entetes:
+            for cle in entete:
+                champs.setdefault(cle, None)
+        table = {}
+        for cle in champs:
+            brut = np.char.strip(np.array([entete.get(cle, b'') for entete in entetes]))
+            table[cle.decode('latin-1')] = DataManager._typer_colonne(cle.decode('latin-1'), brut)
+        lot['entete'] = table
+        return lot
+
+    @staticmethod
+    def _lire_section(section):
+        """
+        Valeurs d'une section [DATA] brute (bytes) en int32, ou en float64 si elle
+        contient autre chose que des entiers (NaN). None si elle est illisible.
+        """
+        dtype = np.float64 if section.translate(None, _CARACTERES_ENTIERS) else np.int32
+        try:
+            return np.fromstring(section, dtype=dtype, sep=' ')
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _ecrire_compact(colonnes, j, k, valeurs):
+        """
+        Écrit les valeurs d'un spectre à la ligne k de la matrice colonnes[j] (uint16),
+        convertie en int32 dès qu'une valeur sort de la plage uint16.
+        """
+        if colonnes[j].dtype == np.uint16 and (valeurs.min() < 0 or valeurs.max() > 65535):
+            colonnes[j] = colonnes[j].astype(np.int32)
+        colonnes[j][k] = valeurs
 
+    @staticmethod
+    def _typer_colonne(cle, brut):
+        """
+        Type une colonne d'entête (array de bytes) selon son nom.
+        Retourne la colonne en chaînes si la conversion échoue.
+        """
+        try:
+            if cle in CHAMPS_DATETIME:
+                return brut.astype('datetime64[s]')
+            if cle in CHAMPS_FLOAT:
+                return np.where(brut == b'', b'nan', brut).astype(np.float64)
+            if cle in CHAMPS_INT:
+                return brut.astype(np.int64)
+        except ValueError:
+            pass
+        return brut.astype(str)
+
+    @staticmethod
+    def select_lot(lot, selection):
+        """
+        Sous-lot (même format que parse_dat_arrays) des spectres désignés par
+        selection (masque booléen ou indices).
+        """
+        sous_lot = dict(lot)
+        sous_lot['entete'] = {cle: col[selection] for cle, col in lot['entete'].items()}
+        for cle in ('data', 'erreur', 'statut', 'nan'):
+            if cle in lot:
+                sous_lot[cle] = lot[cle][selection]
+        return sous_lot
+
+    @staticmethod
+    def concatener_lots(lots):
+        """
+        Réunit des lots (format parse_dat_arrays, dans l'ordre du fichier) en un seul.
+        Un champ d'entête absent d'un lot y est vide (typé comme dans _blocs_vers_arrays) ;
+        une colonne typée différemment d'un lot à l'autre est gardée en chaînes.
+        """
+        lots = [lot for lot in lots if len(lot['data'])]
+        if not lots:
+            return DataManager._blocs_vers_arrays([], [])
+        resultat = {'lambda': lots[0]['lambda']}
+        if any('nan' in lot for lot in lots):
+            resultat['nan'] = np.concatenate([lot['nan'] if 'nan' in lot else np.zeros(lot['data'].shape, dtype=bool)
+                                              for lot in lots])
+        for cle in ('data', 'erreur', 'statut'):
+            if all(cle in lot for lot in lots):
+                resultat[cle] = np.concatenate([lot[cle] for lot in lots])
+        table = {}
+        for cle in dict.fromkeys(cle for lot in lots for cle in lot['entete']):
+            colonnes = [lot['entete'][cle] if cle in lot['entete']
+                        else DataManager._typer_colonne(cle, np.full(len(lot['data']), b''))
+                        for lot in lots]
+            if len({colonne.dtype.kind for colonne in colonnes}) > 1:
+                colonnes = [colonne.astype(str) for colonne in colonnes]
+            table[cle] = np.concatenate(colonnes)
+        resultat['entete'] = table
+        return resultat
 
+    @staticmethod
+    def entete_depuis_table(table, i):
+        """
+        Reconstruit l'entête d'un spectre au format de parse_dat_file
+        ('device', 'date', 'heure', 'integration_time', ...) depuis la table colonnaire.
+        """
+        entete = {}
+        if 'IDDevice' in table:
+            entete['device'] = str(table['IDDevice'][i])
+        if 'DateTime' in table:
+            dt = str(table['DateTime'][i]).split('T')
+            entete['date'] = dt[0]
+            entete['heure'] = dt[1] if len(dt) > 1 else '00:00:00'
+        if 'Comment' in table:
+            entete['comment'] = str(table['Comment'][i])
+        if 'IntegrationTime' in table:
+            entete['integration_time'] = str(table['IntegrationTime'][i])
+        for cle in ('InclX', 'InclY', 'Pressure'):
+            if cle in table:
+                entete[cle] = str(table[cle][i])
+        if 'QCFlags' in table:
+            entete['qc_flags'] = int(table['QCFlags'][i])
+        return entete
 
     @staticmethod
     def read_ini_file(path_ini):
@@ -151,6 +708,24 @@ class DataManager:
                 cal_list.append(elem_cal_str.replace('+NAN', '0'))
         return np.array([float(x) for x in cal_list], dtype=float)
 
+    @staticmethod
+    def read_cal_datetime(path_cal):
+        """
+        Date de l'étalonnage (champ DateTime de l'entête [Spectrum] d'un Cal_*.dat),
+        en datetime64[s], ou None si absente. Seul l'entête est lu.
+        """
+        with open(path_cal, 'r') as fic_cal:
+            for line in fic_cal:
+                if line.startswith('DateTime'):
+                    valeur = line.split('=', 1)[1].strip()
+                    try:
+                        return np.datetime64(valeur.replace(' ', 'T'), 's')
+                    except ValueError:
+                        return None
+                if line.strip().lower().startswith(('[attributes]', '[data]')):
+                    break
+        return None
+
 
 
     @staticmethod
@@ -161,6 +736,7 @@ class DataManager:
         - spectre : dict avec 'entete' (doit contenir 'device', 'date', 'heure', etc.)
         - sensor  : objet capteur_TRIOS contenant cal_lambda, cal_data, etc.
         - base_dir : dossier racine du projet (le dossier parent contenant /output)
+        Retourne le chemin du fichier écrit.
         """
 
         out_dir = os.path.join(base_dir)
@@ -172,7 +748,7 @@ class DataManager:
 
         filename = f"{spectre['entete']['device'].upper()}_{spectre['entete']['date']}_{heure_safe}.txt"
         filepath = os.path.join(out_dir, filename)
-        print(f" -> Création de {filepath}")
+        logger.debug(" -> Création de %s", filepath)
 
         # Vérification
         if getattr(sensor, 'cal_lambda', None) is None or getattr(sensor, 'cal_data', None) is None:
@@ -191,6 +767,8 @@ class DataManager:
                     spectre['entete']['heure'],
                 )
             )
+            if 'qc_flags' in spectre['entete']:
+                fo.write(f"Drapeaux_QC : {spectre['entete']['qc_flags']}\n")
 
             # Ajout des champs spécifiques si présents dans l'entête
             nom = spectre['entete']['device']
@@ -211,11 +789,167 @@ class DataManager:
                 )
 
             fo.write("\nl_onde\t\tdata\n")
-            for lam, dat in zip(sensor.cal_lambda, sensor.cal_data):
-                fo.write(f"{lam}\t\t\t{dat}\n")
+            fo.write("".join(f"{lam}\t\t\t{dat}\n" for lam, dat in zip(sensor.cal_lambda, sensor.cal_data)))
+        return filepath
+
+    @staticmethod
+    def read_calibrated_spectre_txt(path_txt):
+        """
+        Relit un spectre écrit par save_calibrated_spectre_txt.
+        Retourne (cal_lambda, cal_data).
+        """
+        with open(path_txt, 'r', encoding='utf-8') as fi:
+            for ligne in fi:
+                if ligne.startswith('l_onde'):
+                    break
+            valeurs = np.loadtxt(fi, ndmin=2)
+        return valeurs[:, 0], valeurs[:, 1]
+
+    @staticmethod
+    def query_spectres(output_dir, device=None, debut=None, fin=None, path_index=None):
+        """
+        Spectres calibrés d'un capteur (ou de tous) entre debut et fin (inclus),
+        retrouvés via l'index des sorties (voir SpectraIndex) sans parcourir l'archive.
+        Exemple : DataManager.query_spectres('output/netcdf', 'SAM_8467',
+                                             '2024-11-13T12:00', '2024-11-13T12:30')
+        Retourne {'lambda', 'data' (N, L), 'device', 'datetime', 'id_data'}, triés par date.
+        """
+        with SpectraIndex(output_dir, path_index) as index:
+            resultats = index.rechercher(device, debut, fin)
+        n = len(resultats['id_data'])
+        cal_lambda, data = None, None
+        for fichier in dict.fromkeys(resultats['fichier'].tolist()):
+            rows = np.flatnonzero(resultats['fichier'] == fichier)
+            if fichier.endswith('.nc'):
+                lam, valeurs = DataManager._lire_lignes_netcdf(fichier, resultats['ligne'][rows])
+            elif fichier.endswith(EXTENSION_STORE):
+                store = SpectrumStore(fichier)
+                lam, valeurs = store.wavelength, store.data[resultats['ligne'][rows]]
+            else:
+                lam, valeurs = DataManager.read_calibrated_spectre_txt(fichier)
+                valeurs = np.broadcast_to(valeurs, (len(rows), len(valeurs)))
+            if cal_lambda is None:
+                cal_lambda = lam
+                data = np.empty((n, len(lam)))
+            elif not np.array_equal(cal_lambda, lam):
+                raise ValueError(f"Grille de longueurs d'onde différente dans {fichier}")
+            data[rows] = valeurs
+        if data is None:
+            cal_lambda, data = np.empty(0), np.empty((0, 0))
+        return {'lambda': cal_lambda, 'data': data, 'device': resultats['device'],
+                'datetime': resultats['datetime'], 'id_data': resultats['id_data']}
+
+    @staticmethod
+    def _lire_lignes_netcdf(path_nc, lignes):
+        """
+        Lit les lignes demandées de la variable data d'un fichier NetCDF de sortie.
+        """
+        import netCDF4
+        ordre = np.argsort(lignes)
+        with netCDF4.Dataset(path_nc, 'r') as ds:
+            lam = np.asarray(ds['wavelength'][:])
+            valeurs = np.ma.filled(ds['data'][lignes[ordre], :], np.nan)
+        resultat = np.empty_like(valeurs)
+        resultat[ordre] = valeurs
+        return lam, resultat
+
+    @staticmethod
+    def load_spectrum_store(path_store):
+        """
+        Ouvre sans copie (memmap) un store de spectres calibrés écrit avec
+        format_export='store' (voir SpectrumStore.lire pour les sélections).
+        """
+        return SpectrumStore(path_store)
+
+
+class LectureEnFond:
+    """
+    Flux binaire lu d'avance par un thread : les morceaux de taille_morceau octets
+    (décompressés, si le flux l'est) sont placés dans une file bornée pendant que
+    l'appelant traite les précédents. zlib et zstandard libèrent le GIL pendant la
+    décompression, qui se recouvre ainsi avec le parse et la calibration.
+    """
+
+    def __init__(self, flux, taille_morceau=TAILLE_TAMPON, profondeur=2):
+        """
+        - flux           : flux binaire (fermé avec LectureEnFond)
+        - taille_morceau : taille des lectures du thread (octets)
+        - profondeur     : nombre max de morceaux lus d'avance
+        """
+        self.flux = flux
+        self.taille_morceau = taille_morceau
+        self._file = queue.Queue(maxsize=profondeur)
+        self._arret = threading.Event()
+        self._reste = b''
+        self._fin = False
+        self._thread = threading.Thread(target=self._lire, name='lecture-en-fond', daemon=True)
+        self._thread.start()
 
+    def _lire(self):
+        try:
+            while not self._arret.is_set():
+                morceau = self.flux.read(self.taille_morceau)
+                self._deposer(morceau)
+                if not morceau:
+                    return
+        except Exception as e:
+            self._deposer(e)
+
+    def _deposer(self, element):
+        while not self._arret.is_set():
+            try:
+                self._file.put(element, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _suivant(self):
+        """
+        Morceau suivant lu par le thread (b'' en fin de flux).
+        """
+        if self._fin:
+            return b''
+        element = self._file.get()
+        if isinstance(element, Exception):
+            self._fin = True
+            raise element
+        if not element:
+            self._fin = True
+        return element
+
+    def read(self, n=-1):
+        """
+        Lit au plus n octets (tout le reste du flux si n < 0). Retourne b'' en fin de flux.
+        """
+        if n is None or n < 0:
+            morceaux = [self._reste]
+            while True:
+                morceau = self._suivant()
+                if not morceau:
+                    break
+                morceaux.append(morceau)
+            self._reste = b''
+            return b''.join(morceaux)
+        if not self._reste:
+            self._reste = self._suivant()
+        morceau, self._reste = self._reste[:n], self._reste[n:]
+        return morceau
 
+    def close(self):
+        self._arret.set()
+        self._thread.join()
+        self.flux.close()
 
+    def __enter__(self):
+        return self
 
+    def __exit__(self, *exc):
+        self.close()
 
 
+def _importer_zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("La lecture des fichiers .zst nécessite le paquet zstandard.") from e
+    return zstandard
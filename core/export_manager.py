@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+
+import os
+import logging
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from core.data_manager import DataManager
+from core.spectra_index import SpectraIndex
+from core.spectrum_store import SpectrumStoreWriter
+from core.qc import NOMS_DRAPEAUX
+from core.aggregation import AgregateurTemporel, ExportAgrege
+
+logger = logging.getLogger(__name__)
+
+FORMATS_EXPORT = ('txt', 'netcdf', 'store')
+N_THREADS_TXT = 4  # Threads d'écriture des fichiers .txt
+
+
+class ExportTxt:
+    """
+    Export historique : un fichier .txt par spectre calibré (voir
+    DataManager.save_calibrated_spectre_txt). Les fichiers d'un lot sont écrits
+    par un pool de n_threads threads (écritures disque hors GIL).
+    """
+
+    def __init__(self, output_dir, index=True, n_threads=N_THREADS_TXT):
+        """
+        - output_dir : dossier de sortie (output/calibrated/)
+        - index      : True pour indexer les spectres exportés (voir SpectraIndex)
+        - n_threads  : threads d'écriture (1 = en série)
+        """
+        self.output_dir = output_dir
+        self.index = SpectraIndex(output_dir) if index else None
+        self.n_threads = max(1, n_threads or 1)
+        self._pool = None
+
+    def ecrire_lot(self, table, new_lam, data, capteurs):
+        """
+        Écrit un lot de spectres interpolés.
+        - table    : entête colonnaire du lot (format parse_dat_arrays)
+        - new_lam  : grille de longueurs d'onde commune
+        - data     : matrice (N, len(new_lam)) des spectres
+        - capteurs : liste des N objets CapteurTRIOS associés
+        """
+        entetes = [DataManager.entete_depuis_table(table, i) for i in range(len(data))]
+        chemins = [None] * len(data)
+
+        def ecrire(indices):
+            for i in indices:
+                sensor = SimpleNamespace(cal_lambda=new_lam, cal_data=data[i],
+                                         fichier_Cal=getattr(capteurs[i], 'fichier_Cal', 'NC'))
+                chemins[i] = DataManager.save_calibrated_spectre_txt(
+                    spectre={'entete': entetes[i]},
+                    sensor=sensor,
+                    base_dir=self.output_dir
+                )
+
+        if self.n_threads == 1 or len(data) < 2 * self.n_threads:
+            ecrire(range(len(data)))
+        else:
+            # Les spectres de même nom de fichier (même capteur, même seconde) restent
+            # dans la même tâche, dans l'ordre : le dernier écrit reste celui du fichier
+            taches = [[] for _ in range(self.n_threads)]
+            for i, entete in enumerate(entetes):
+                taches[hash((entete['device'].upper(), entete['date'], entete['heure'])) % self.n_threads].append(i)
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.n_threads, thread_name_prefix='export-txt')
+            list(self._pool.map(ecrire, taches))
+        if self.index is not None and chemins:
+            self.index.ajouter(table['IDDevice'], table['DateTime'], table['IDData'], chemins)
+
+    def flush(self):
+        pass
+
+    def lignes(self):
+        """
+        Lignes écrites par fichier de sortie (aucune : un fichier par spectre, réécrit à l'identique).
+        """
+        return {}
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ExportNetCDF:
+    """
+    Export consolidé : un fichier NetCDF4/HDF5 compressé par run (ou par capteur),
+    de dimensions (time, wavelength), avec les métadonnées de chaque spectre
+    et le fichier de calibration utilisé. La dimension time est illimitée :
+    les lots sont ajoutés à la suite sans réécrire le fichier.
+    """
+
+    # Métadonnées par spectre : variable NetCDF -> (champ d'entête, type)
+    VARIABLES_ENTETE = {
+        'id_data': ('IDData', str),
+        'integration_time': ('IntegrationTime', 'i4'),
+        'incl_x': ('InclX', 'f8'),
+        'incl_y': ('InclY', 'f8'),
+        'pressure': ('Pressure', 'f8'),
+        'temperature': ('Temperature', 'f8'),
+        'method_name': ('MethodName', str),
+        'qc_flags': ('QCFlags', 'i4'),
+        'n_spectres': ('NSpectres', 'i4'),  # Spectres agrégés (ExportAgrege), -1 sinon
+    }
+
+    def __init__(self, output_dir, nom_run, par_capteur=False, mode='w',
+                 chunk_time=256, complevel=4, dtype='f8', index=True, lignes_validees=None):
+        """
+        - output_dir      : dossier de sortie (output/netcdf/)
+        - nom_run         : préfixe des fichiers (.nc)
+        - par_capteur     : un fichier par capteur ({nom_run}_{CAPTEUR}.nc) au lieu d'un par run
+        - mode            : 'w' (écrase) ou 'a' (ajoute aux fichiers existants)
+        - chunk_time      : nombre de spectres par chunk HDF5
+        - complevel       : niveau de compression zlib
+        - index           : True pour indexer les spectres exportés (voir SpectraIndex)
+        - lignes_validees : en mode 'a', {nom de fichier: lignes validées} (voir RunManifest) :
+                            un fichier existant est ramené à ses lignes validées, et
+                            recréé s'il n'en a aucune (None = fichiers gardés tels quels)
+        """
+        try:
+            import netCDF4
+        except ImportError as e:
+            raise ImportError("L'export NetCDF nécessite le paquet netCDF4.") from e
+        self._netCDF4 = netCDF4
+        self.output_dir = output_dir
+        self.nom_run = nom_run
+        self.par_capteur = par_capteur
+        self.mode = mode
+        self.chunk_time = chunk_time
+        self.complevel = complevel
+        self.dtype = dtype
+        self.lignes_validees = lignes_validees
+        self.datasets = {}  # Cache {chemin: netCDF4.Dataset ouvert}
+        os.makedirs(output_dir, exist_ok=True)
+        self.index = SpectraIndex(output_dir) if index else None
+
+    def chemin_fichier(self, nom_capteur=None):
+        if self.par_capteur and nom_capteur is not None:
+            return os.path.join(self.output_dir, f"{self.nom_run}_{nom_capteur.upper()}.nc")
+        return os.path.join(self.output_dir, f"{self.nom_run}.nc")
+
+    def _ouvrir(self, chemin, new_lam):
+        """
+        Ouvre (ou crée) le fichier NetCDF et vérifie la grille de longueurs d'onde.
+        """
+        ds = self.datasets.get(chemin)
+        if ds is not None:
+            return ds
+        n_valide = None
+        if self.lignes_validees is not None:
+            n_valide = self.lignes_validees.get(os.path.basename(chemin), 0)
+        if self.mode == 'a' and os.path.exists(chemin) and n_valide != 0:
+            ds = self._netCDF4.Dataset(chemin, 'a')
+            if not np.array_equal(ds['wavelength'][:], new_lam):
+                ds.close()
+                raise ValueError(f"Grille de longueurs d'onde différente dans {chemin}")
+            if n_valide is not None and len(ds.dimensions['time']) > n_valide:
+                # Lignes écrites après le dernier point de contrôle validé (arrêt brutal)
+                ds.close()
+                self._tronquer(chemin, new_lam, n_valide)
+                ds = self._netCDF4.Dataset(chemin, 'a')
+        else:
+            ds = self._creer(chemin, new_lam)
+        self.datasets[chemin] = ds
+        return ds
+
+    def _creer(self, chemin, new_lam):
+        """
+        Crée un fichier NetCDF vide (écrase le fichier existant).
+        """
+        ds = self._netCDF4.Dataset(chemin, 'w', format='NETCDF4')
+        ds.createDimension('time', None)
+        ds.createDimension('wavelength', len(new_lam))
+        var = ds.createVariable('wavelength', 'f8', ('wavelength',))
+        var.units = 'nm'
+        var[:] = new_lam
+        var = ds.createVariable('time', 'i8', ('time',), chunksizes=(self.chunk_time,))
+        var.units = 'seconds since 1970-01-01 00:00:00'
+        var.calendar = 'standard'
+        ds.createVariable('data', self.dtype, ('time', 'wavelength'), zlib=True,
+                          complevel=self.complevel, fill_value=np.nan,
+                          chunksizes=(self.chunk_time, len(new_lam)))
+        ds.createVariable('device', str, ('time',))
+        ds.createVariable('calibration_file', str, ('time',))
+        for nom, (_, type_var) in self.VARIABLES_ENTETE.items():
+            if type_var is str:
+                ds.createVariable(nom, str, ('time',))
+            else:
+                ds.createVariable(nom, type_var, ('time',), zlib=True,
+                                  complevel=self.complevel, chunksizes=(self.chunk_time,))
+        ds['qc_flags'].flag_masks = np.array(list(NOMS_DRAPEAUX), dtype='i4')
+        ds['qc_flags'].flag_meanings = ' '.join(NOMS_DRAPEAUX.values())
+        ds.title = "Spectres TRIOS calibrés"
+        ds.source_run = self.nom_run
+        return ds
+
+    def _tronquer(self, chemin, new_lam, n):
+        """
+        Ramène un fichier à ses n premières lignes : la dimension time d'un fichier
+        NetCDF ne pouvant pas diminuer, elles sont recopiées dans un nouveau fichier
+        qui remplace l'ancien.
+        """
+        logger.warning("%s : lignes au-delà de la ligne %d non validées, supprimées.", chemin, n)
+        tmp = chemin + '.tmp'
+        with self._netCDF4.Dataset(chemin, 'r') as src, self._creer(tmp, new_lam) as dst:
+            pas = 16 * self.chunk_time
+            for nom, var in src.variables.items():
+                if nom not in dst.variables or var.dimensions[:1] != ('time',):
+                    continue
+                for i in range(0, n, pas):
+                    dst[nom][i:min(i + pas, n)] = var[i:min(i + pas, n)]
+        os.replace(tmp, chemin)
+
+    def ecrire_lot(self, table, new_lam, data, capteurs):
+        """
+        Ajoute un lot de spectres interpolés (même signature que ExportTxt.ecrire_lot).
+        """
+        n = len(data)
+        if n == 0:
+            return
+        devices = np.array([c.nom_capteur.upper() for c in capteurs])
+        if self.par_capteur:
+            for nom_capteur in dict.fromkeys(devices.tolist()):
+                rows = np.flatnonzero(devices == nom_capteur)
+                self._ajouter(self.chemin_fichier(nom_capteur), table, rows, new_lam, data, capteurs, devices)
+        else:
+            self._ajouter(self.chemin_fichier(), table, np.arange(n), new_lam, data, capteurs, devices)
+
+    def _ajouter(self, chemin, table, rows, new_lam, data, capteurs, devices):
+        ds = self._ouvrir(chemin, new_lam)
+        i0 = len(ds.dimensions['time'])
+        i1 = i0 + len(rows)
+        ds['data'][i0:i1, :] = data[rows]
+        ds['time'][i0:i1] = table['DateTime'][rows].astype('datetime64[s]').astype(np.int64)
+        ds['device'][i0:i1] = devices[rows].astype(object)
+        ds['calibration_file'][i0:i1] = np.array(
+            [getattr(capteurs[i], 'fichier_Cal', 'NC') for i in rows], dtype=object)
+        for nom, (champ, type_var) in self.VARIABLES_ENTETE.items():
+            if nom not in ds.variables:
+                continue  # Fichier créé par une version antérieure (mode 'a')
+            if champ in table:
+                valeurs = table[champ][rows]
+            else:
+                valeurs = np.full(len(rows), '' if type_var is str else -1 if type_var == 'i4' else np.nan)
+            ds[nom][i0:i1] = valeurs.astype(object) if type_var is str else valeurs
+        if self.index is not None:
+            self.index.ajouter(devices[rows], table['DateTime'][rows], table['IDData'][rows],
+                               [chemin] * len(rows), np.arange(i0, i1))
+
+    def flush(self):
+        """
+        Force l'écriture sur disque des fichiers ouverts (point de contrôle).
+        """
+        for ds in self.datasets.values():
+            ds.sync()
+
+    def lignes(self):
+        """
+        Lignes écrites dans chaque fichier ouvert : {nom de fichier: nombre de spectres}.
+        """
+        return {os.path.basename(chemin): len(ds.dimensions['time']) for chemin, ds in self.datasets.items()}
+
+    def close(self):
+        for ds in self.datasets.values():
+            ds.close()
+        self.datasets = {}
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ExportManager:
+    """
+    Fabrique des exporteurs de spectres calibrés.
+    """
+
+    @staticmethod
+    def creer(format_export, output_dir, nom_run='run', index=True, agregation=None, **options):
+        """
+        Retourne l'exporteur correspondant à format_export ('txt', 'netcdf' ou 'store').
+        - index      : False pour ne pas tenir l'index des spectres exportés (SpectraIndex)
+        - agregation : AgregateurTemporel servant de modèle pour exporter des statistiques
+                       par capteur et par intervalle de temps au lieu des spectres
+                       (un sous-dossier de output_dir par statistique, voir ExportAgrege)
+        """
+        if agregation is not None:
+            modele = agregation
+            return ExportAgrege(
+                AgregateurTemporel(modele.pas_s, modele.rafale_s, modele.statistiques),
+                lambda stat: ExportManager.creer(format_export, os.path.join(output_dir, stat), nom_run,
+                                                 index, **options))
+        if format_export == 'txt':
+            return ExportTxt(output_dir, index=index, n_threads=options.get('n_threads', N_THREADS_TXT))
+        if format_export == 'netcdf':
+            return ExportNetCDF(output_dir, nom_run, index=index, **options)
+        if format_export == 'store':
+            return SpectrumStoreWriter(output_dir, nom_run, index=index, **options)
+        raise ValueError(f"Format d'export inconnu : {format_export}")
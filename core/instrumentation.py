@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import random
+import cProfile
+import pstats
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+# Étapes instrumentées du pipeline de calibration
+ETAPES = ('parse', 'qc', 'bruit_de_fond', 'calibration_lambda', 'sensibilite', 'interpolation', 'traitement', 'export')
+TAILLE_ECHANTILLON = 10000  # Nombre max de durées conservées par étape (percentiles)
+
+
+class Instrumentation:
+    """
+    Compteurs et chronométrage par étape du pipeline (parse, contrôle qualité,
+    soustraction du bruit de fond, calibration des longueurs d'onde, division par
+    la sensibilité, interpolation, filtres, export).
+    Pour chaque étape : nombre d'appels, nombre de spectres, durée cumulée et
+    percentiles des durées par appel. Utilisable depuis plusieurs threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.etapes = {}  # {étape: {'appels', 'spectres', 'total', 'max', 'durees'}}
+
+    def __getstate__(self):
+        with self._lock:
+            return {'etapes': self.etapes}
+
+    def __setstate__(self, etat):
+        self._lock = threading.Lock()
+        self.etapes = etat['etapes']
+
+    def enregistrer(self, etape, duree, n_spectres=0):
+        """
+        Ajoute une mesure de duree secondes portant sur n_spectres spectres.
+        """
+        with self._lock:
+            stats = self.etapes.get(etape)
+            if stats is None:
+                stats = self.etapes[etape] = {'appels': 0, 'spectres': 0, 'total': 0.0, 'max': 0.0, 'durees': []}
+            stats['appels'] += 1
+            stats['spectres'] += n_spectres
+            stats['total'] += duree
+            stats['max'] = max(stats['max'], duree)
+            # Échantillonnage par réservoir : mémoire bornée quel que soit le nombre d'appels
+            if len(stats['durees']) < TAILLE_ECHANTILLON:
+                stats['durees'].append(duree)
+            else:
+                j = random.randrange(stats['appels'])
+                if j < TAILLE_ECHANTILLON:
+                    stats['durees'][j] = duree
+
+    @contextmanager
+    def mesure(self, etape, n_spectres=0):
+        """
+        Chronomètre le bloc with et l'enregistre pour l'étape donnée.
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.enregistrer(etape, time.perf_counter() - t0, n_spectres)
+
+    def iterer(self, etape, lots):
+        """
+        Parcourt un itérable de lots (format parse_dat_arrays) en chronométrant
+        la production de chaque lot (ex. étape 'parse' d'un générateur).
+        """
+        iterateur = iter(lots)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                lot = next(iterateur)
+            except StopIteration:
+                return
+            self.enregistrer(etape, time.perf_counter() - t0, len(lot['data']))
+            yield lot
+
+    def fusionner(self, autre):
+        """
+        Ajoute les mesures d'une autre Instrumentation (ex. d'un processus du pool).
+        """
+        for etape, stats in autre.__getstate__()['etapes'].items():
+            with self._lock:
+                cible = self.etapes.setdefault(
+                    etape, {'appels': 0, 'spectres': 0, 'total': 0.0, 'max': 0.0, 'durees': []})
+                cible['durees'] = _fusionner_echantillons(cible['durees'], cible['appels'],
+                                                          stats['durees'], stats['appels'])
+                cible['appels'] += stats['appels']
+                cible['spectres'] += stats['spectres']
+                cible['total'] += stats['total']
+                cible['max'] = max(cible['max'], stats['max'])
+
+    def rapport(self):
+        """
+        Rapport sérialisable (JSON) : {étape: {appels, spectres, total_s, moyenne_s,
+        p50_s, p90_s, p99_s, max_s, spectres_par_seconde}}.
+        """
+        rapport = {}
+        with self._lock:
+            for etape in sorted(self.etapes, key=lambda e: (ETAPES + (e,)).index(e)):
+                stats = self.etapes[etape]
+                durees = np.array(stats['durees']) if stats['durees'] else np.zeros(1)
+                p50, p90, p99 = np.percentile(durees, [50, 90, 99])
+                rapport[etape] = {
+                    'appels': stats['appels'],
+                    'spectres': stats['spectres'],
+                    'total_s': stats['total'],
+                    'moyenne_s': stats['total'] / stats['appels'] if stats['appels'] else 0.0,
+                    'p50_s': float(p50),
+                    'p90_s': float(p90),
+                    'p99_s': float(p99),
+                    'max_s': stats['max'],
+                    'spectres_par_seconde': stats['spectres'] / stats['total'] if stats['total'] > 0 else 0.0,
+                }
+        return rapport
+
+    def ecrire_rapport(self, path_json):
+        """
+        Écrit le rapport au format JSON.
+        """
+        with open(path_json, 'w', encoding='utf-8') as fo:
+            json.dump(self.rapport(), fo, indent=2, ensure_ascii=False)
+
+    def lignes_rapport(self):
+        """
+        Rapport sous forme de lignes de texte (logs, interface graphique).
+        """
+        lignes = []
+        for etape, r in self.rapport().items():
+            lignes.append(f"{etape:<20} {r['spectres']:>9} spectres  {r['total_s']:8.3f} s  "
+                          f"p50 {r['p50_s'] * 1000:7.2f} ms  p99 {r['p99_s'] * 1000:7.2f} ms")
+        return lignes
+
+
+def _fusionner_echantillons(a, n_a, b, n_b):
+    """
+    Fusionne deux échantillons par réservoir, tirés parmi n_a et n_b durées :
+    chaque côté fournit une part de l'échantillon proportionnelle à son nombre
+    de durées (tirage hypergéométrique), comme un réservoir unique l'aurait fait.
+    """
+    if len(a) + len(b) <= TAILLE_ECHANTILLON:
+        return a + b
+    k_a = int(np.random.default_rng().hypergeometric(max(n_a, len(a)), max(n_b, len(b)), TAILLE_ECHANTILLON))
+    k_a = min(max(k_a, TAILLE_ECHANTILLON - len(b)), len(a))
+    return random.sample(a, k_a) + random.sample(b, TAILLE_ECHANTILLON - k_a)
+
+
+@contextmanager
+def mesurer(instrumentation, etape, n_spectres=0):
+    """
+    Comme Instrumentation.mesure, sans effet si instrumentation vaut None.
+    """
+    if instrumentation is None:
+        yield
+    else:
+        with instrumentation.mesure(etape, n_spectres):
+            yield
+
+
+@contextmanager
+def profiler(path_prof=None):
+    """
+    Exécute le bloc with sous cProfile. Les statistiques sont écrites dans
+    path_prof (format pstats) si fourni. Le profil est retourné via le with.
+    """
+    profil = cProfile.Profile()
+    profil.enable()
+    try:
+        yield profil
+    finally:
+        profil.disable()
+        if path_prof is not None:
+            pstats.Stats(profil).dump_stats(path_prof)
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import numpy as np
+from scipy.ndimage import correlate1d, median_filter
+from scipy.signal import savgol_filter
+
+logger = logging.getLogger(__name__)
+
+# Paramètres par défaut de chaque filtre de la chaîne
+FILTRES = {
+    'lissage': {'fenetre': 11, 'polynome': 2},  # Savitzky-Golay
+    'derivee': {'ordre': 1, 'fenetre': 11, 'polynome': 3},  # Dérivée Savitzky-Golay (grille régulière)
+    'ligne_de_base': {'degre': 1, 'debut': None, 'fin': None},  # Polynôme ajusté sur [debut, fin] puis retranché
+    'normalisation': {'absolue': False},  # Division par l'aire sous le spectre (trapèzes)
+    'pics': {'fenetre': 5, 'seuil': 5.0},  # Pixels aberrants remplacés par la médiane glissante
+}
+
+
+class ProcessingManager:
+    """
+    Chaîne de filtres appliquée aux spectres interpolés, le long de l'axe des
+    longueurs d'onde d'une matrice (N, L), avant l'export : un appel vectorisé
+    par filtre pour tout le lot, en place (la matrice passée est modifiée).
+    Les noyaux (coefficients Savitzky-Golay, poids des trapèzes, pseudo-inverses
+    de la ligne de base) sont calculés une fois par grille puis mis en cache.
+
+    Exemple : ProcessingManager([('pics', {}), ('lissage', {'fenetre': 15}), ('normalisation', {})])
+    """
+
+    def __init__(self, etapes=()):
+        """
+        - etapes : liste de noms de filtres (voir FILTRES) ou de couples (nom, paramètres)
+        """
+        self.etapes = []
+        for etape in etapes:
+            nom, params = (etape, {}) if isinstance(etape, str) else etape
+            if nom not in FILTRES:
+                raise ValueError(f"Filtre inconnu : {nom}")
+            inconnus = set(params) - set(FILTRES[nom])
+            if inconnus:
+                raise ValueError(f"Paramètres inconnus pour {nom} : {', '.join(sorted(inconnus))}")
+            self.etapes.append((nom, {**FILTRES[nom], **params}))
+        self._noyaux = {}  # Cache {(filtre, grille, paramètres): noyau}
+
+    @classmethod
+    def depuis_texte(cls, texte):
+        """
+        Chaîne de filtres décrite en texte (ligne de commande), filtres séparés par
+        des virgules et paramètres par des deux-points :
+        "pics,lissage:fenetre=15:polynome=3,ligne_de_base:debut=750:fin=900,normalisation"
+        """
+        etapes = []
+        for morceau in filter(None, (m.strip() for m in texte.split(','))):
+            nom, *params = morceau.split(':')
+            etapes.append((nom, {cle: _valeur(valeur) for cle, valeur in (p.split('=', 1) for p in params)}))
+        return cls(etapes)
+
+    def decrire(self):
+        """
+        Description texte de la chaîne (format de depuis_texte).
+        """
+        return ','.join(':'.join([nom] + [f"{cle}={valeur}" for cle, valeur in params.items() if valeur is not None])
+                        for nom, params in self.etapes)
+
+    def appliquer(self, new_lam, data):
+        """
+        Applique tous les filtres, dans l'ordre, à la matrice (N, len(new_lam)) data
+        (modifiée en place si elle est en float64 et contiguë). Retourne data.
+        """
+        new_lam = np.asarray(new_lam, dtype=float)
+        data = np.atleast_2d(data)
+        if data.dtype != np.float64 or not data.flags.c_contiguous:
+            data = np.ascontiguousarray(data, dtype=np.float64)
+        if data.shape[0] == 0:
+            return data
+        for nom, params in self.etapes:
+            data = getattr(self, f"_{nom}")(new_lam, data, **params)
+        return data
+
+    # --- Filtres : (new_lam, data (N, L), paramètres) -> data, en place ---
+
+    def _lissage(self, new_lam, data, fenetre, polynome):
+        return self._savgol(new_lam, data, fenetre, polynome, 0)
+
+    def _derivee(self, new_lam, data, ordre, fenetre, polynome):
+        if ordre not in (1, 2):
+            raise ValueError("Ordre de dérivée : 1 ou 2")
+        return self._savgol(new_lam, data, fenetre, max(polynome, ordre), ordre)
+
+    def _savgol(self, new_lam, data, fenetre, polynome, deriv):
+        """
+        Filtre de Savitzky-Golay : corrélation par le noyau central, en place, et
+        ajustement polynomial sur la première et la dernière fenêtre pour les bords
+        (mêmes résultats que scipy.signal.savgol_filter, mode 'interp').
+        Les NaN ne se propagent qu'aux pixels dont la fenêtre les contient.
+        """
+        noyau, gauche, droite = self.noyau_savgol(new_lam, fenetre, polynome, deriv)
+        h = fenetre // 2
+        bord_gauche = data[:, :fenetre] @ gauche.T
+        bord_droit = data[:, -fenetre:] @ droite.T
+        correlate1d(data, noyau, axis=1, output=data, mode='constant')
+        data[:, :h] = bord_gauche
+        data[:, -h:] = bord_droit
+        return data
+
+    def noyau_savgol(self, new_lam, fenetre, polynome, deriv):
+        """
+        (noyau central (fenetre,), bord gauche (h, fenetre), bord droit (h, fenetre))
+        du filtre de Savitzky-Golay sur la grille new_lam (h = fenetre // 2).
+        """
+        cle = ('savgol', new_lam.tobytes(), fenetre, polynome, deriv)
+        if cle not in self._noyaux:
+            fenetre = int(fenetre)
+            if fenetre % 2 == 0 or fenetre < 3 or fenetre > new_lam.size:
+                raise ValueError(f"Fenêtre Savitzky-Golay invalide : {fenetre} (impaire, entre 3 et {new_lam.size})")
+            if polynome >= fenetre:
+                raise ValueError("Le degré du polynôme doit être inférieur à la fenêtre")
+            pas = np.diff(new_lam)
+            if deriv and not np.allclose(pas, pas[0]):
+                raise ValueError("Les dérivées nécessitent une grille de longueurs d'onde régulière")
+            # Opérateur du filtre sur une seule fenêtre : ligne centrale = noyau,
+            # lignes précédentes / suivantes = bords (ajustement polynomial)
+            operateur = savgol_filter(np.eye(fenetre), fenetre, int(polynome), deriv=deriv, delta=float(pas[0]),
+                                      axis=0, mode='interp')
+            h = fenetre // 2
+            self._noyaux[cle] = (operateur[h].copy(), operateur[:h].copy(), operateur[h + 1:].copy())
+        return self._noyaux[cle]
+
+    def _ligne_de_base(self, new_lam, data, degre, debut, fin):
+        """
+        Retranche à chaque spectre le polynôme de degré degre ajusté (moindres carrés)
+        sur ses pixels valides entre debut et fin (défaut : toute la grille).
+        Les spectres sont regroupés par masque de pixels valides : une pseudo-inverse
+        par masque, mise en cache.
+        """
+        colonnes = np.flatnonzero((new_lam >= (debut if debut is not None else -np.inf))
+                                  & (new_lam <= (fin if fin is not None else np.inf)))
+        if colonnes.size <= degre:
+            raise ValueError("Pas assez de longueurs d'onde pour ajuster la ligne de base")
+        # Polynôme en longueur d'onde centrée réduite (conditionnement)
+        x = (new_lam - new_lam[colonnes].mean()) / max(np.ptp(new_lam[colonnes]), 1e-12)
+        vandermonde = np.vander(x, int(degre) + 1)
+        masques = np.isfinite(data[:, colonnes])
+        if masques.all():
+            uniques, inverse = masques[:1], None
+        else:
+            # Masques comparés sous forme d'octets (np.unique sur des lignes de booléens est lent)
+            _, premiers, inverse = np.unique(np.packbits(masques, axis=1), axis=0,
+                                             return_index=True, return_inverse=True)
+            uniques, inverse = masques[premiers], inverse.ravel()
+        for k, masque in enumerate(uniques):
+            rows = slice(None) if len(uniques) == 1 else np.flatnonzero(inverse == k)
+            cols = colonnes[masque]
+            if cols.size <= degre:
+                data[rows] = np.nan
+                continue
+            cle = ('ligne_de_base', new_lam.tobytes(), int(degre), cols.tobytes())
+            if cle not in self._noyaux:
+                self._noyaux[cle] = np.linalg.pinv(vandermonde[cols])
+            coefficients = data[rows][:, cols] @ self._noyaux[cle].T
+            data[rows] -= coefficients @ vandermonde.T
+        return data
+
+    def _normalisation(self, new_lam, data, absolue):
+        """
+        Divise chaque spectre par son aire (règle des trapèzes, pixels NaN ignorés ;
+        aire de la valeur absolue si absolue).
+        """
+        cle = ('trapezes', new_lam.tobytes())
+        if cle not in self._noyaux:
+            poids = np.zeros(new_lam.size)
+            pas = np.diff(new_lam)
+            poids[:-1] += pas / 2
+            poids[1:] += pas / 2
+            self._noyaux[cle] = poids
+        poids = self._noyaux[cle]
+        valeurs = np.abs(data) if absolue else data
+        aire = valeurs @ poids
+        lignes = np.flatnonzero(np.isnan(aire))
+        if len(lignes):
+            aire[lignes] = np.nan_to_num(valeurs[lignes], nan=0.0) @ poids
+        with np.errstate(divide='ignore', invalid='ignore'):
+            data /= aire[:, None]
+        return data
+
+    def _pics(self, new_lam, data, fenetre, seuil):
+        """
+        Remplace par la médiane glissante (fenetre pixels) les pixels qui s'en écartent
+        de plus de seuil fois l'écart absolu médian (x 1.4826) du spectre.
+        """
+        mediane = median_filter(data, size=(1, int(fenetre)), mode='nearest')
+        ecart = np.abs(data - mediane)
+        echelle = np.median(ecart, axis=1, keepdims=True)
+        lignes = np.flatnonzero(np.isnan(echelle[:, 0]))
+        if len(lignes):
+            echelle[lignes] = np.nanmedian(ecart[lignes], axis=1, keepdims=True)
+        with np.errstate(invalid='ignore'):
+            pics = ecart > seuil * 1.4826 * echelle
+        n_pics = np.count_nonzero(pics)
+        if n_pics:
+            data[pics] = mediane[pics]
+            logger.debug("Filtre pics : %d pixels remplacés", n_pics)
+        return data
+
+
+def _valeur(texte):
+    """
+    Valeur d'un paramètre de filtre écrit en texte (entier, réel, booléen ou None).
+    """
+    for conversion in (int, float):
+        try:
+            return conversion(texte)
+        except ValueError:
+            pass
+    return {'true': True, 'vrai': True, 'false': False, 'faux': False, 'none': None}.get(texte.lower(), texte)
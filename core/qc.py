@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import numpy as np
+from core.data_manager import DataManager
+
+logger = logging.getLogger(__name__)
+
+# Bits des drapeaux de contrôle qualité (colonne QCFlags, un entier par spectre)
+QC_SATURATION = 1  # Au moins max_pixels_satures pixels à la dynamique max (RAWDynamic)
+QC_ERREUR = 2  # Comptes d'erreur non nuls (colonne 3 de [DATA])
+QC_STATUT = 4  # Statut de pixel non nul (colonne 4 de [DATA])
+QC_INCLINAISON = 8  # Inclinaison au-delà du seuil
+QC_INCLINAISON_INVALIDE = 16  # Inclinomètre invalide (InclValid = 0)
+QC_NAN = 32  # Pixels NaN dans les comptes
+QC_PRESSION_INVALIDE = 64  # Capteur de pression invalide (PressValid = 0, pour un capteur équipé)
+
+NOMS_DRAPEAUX = {
+    QC_SATURATION: 'saturation',
+    QC_ERREUR: 'erreur',
+    QC_STATUT: 'statut',
+    QC_INCLINAISON: 'inclinaison',
+    QC_INCLINAISON_INVALIDE: 'inclinaison_invalide',
+    QC_NAN: 'nan',
+    QC_PRESSION_INVALIDE: 'pression_invalide',
+}
+
+# Drapeaux qui entraînent le rejet d'un spectre en mode 'rejeter'
+REJET_DEFAUT = QC_SATURATION | QC_ERREUR | QC_STATUT | QC_INCLINAISON | QC_NAN
+
+
+class ControleQualite:
+    """
+    Contrôle qualité vectorisé d'un lot de spectres bruts (format parse_dat_arrays),
+    avant calibration : un entier de drapeaux par spectre (bits QC_*), calculé sur
+    la matrice des comptes, les colonnes erreur/statut de [DATA] et la table d'entête.
+    - action 'signaler' : tous les spectres sont calibrés, les drapeaux sont exportés
+    - action 'rejeter'  : les spectres portant un drapeau de rejet ne sont pas calibrés
+    """
+
+    def __init__(self, action='signaler', seuil_inclinaison=5.0, max_pixels_satures=1, rejet=REJET_DEFAUT):
+        """
+        - action             : 'signaler' ou 'rejeter'
+        - seuil_inclinaison  : inclinaison max (degrés)
+        - max_pixels_satures : nombre de pixels saturés à partir duquel le spectre est signalé
+        - rejet              : bits QC_* entraînant le rejet en mode 'rejeter'
+        """
+        if action not in ('signaler', 'rejeter'):
+            raise ValueError(f"Action de contrôle qualité inconnue : {action}")
+        self.action = action
+        self.seuil_inclinaison = seuil_inclinaison
+        self.max_pixels_satures = max_pixels_satures
+        self.rejet = rejet
+
+    def drapeaux(self, lot):
+        """
+        Drapeaux QC (uint16) de chaque spectre du lot.
+        """
+        table = lot['entete']
+        counts = lot['data']
+        n = len(counts)
+        flags = np.zeros(n, dtype=np.uint16)
+        if n == 0:
+            return flags
+
+        dynamique = table.get('RAWDynamic')
+        if dynamique is None or dynamique.dtype.kind not in 'iuf':
+            dynamique = np.full(n, 65535)
+        n_satures = np.count_nonzero(counts >= dynamique[:, None], axis=1)
+        flags[n_satures >= self.max_pixels_satures] |= QC_SATURATION
+        if 'erreur' in lot:
+            flags[lot['erreur'].any(axis=1)] |= QC_ERREUR
+        if 'statut' in lot:
+            flags[lot['statut'].any(axis=1)] |= QC_STATUT
+        if 'nan' in lot:
+            flags[lot['nan'].any(axis=1)] |= QC_NAN
+
+        inclinaison = self.inclinaison(table, n)
+        flags[inclinaison > self.seuil_inclinaison] |= QC_INCLINAISON
+        if 'InclValid' in table:
+            flags[np.asarray(table['InclValid']) == 0] |= QC_INCLINAISON_INVALIDE
+        if 'PressValid' in table:
+            flags[(np.asarray(table['PressValid']) == 0) & self.capteur_pression(table, n)] |= QC_PRESSION_INVALIDE
+        return flags
+
+    @staticmethod
+    def capteur_pression(table, n):
+        """
+        Spectres d'un capteur équipé d'une mesure de pression : Pressure renseigné,
+        fini et non nul (les unités sans capteur écrivent Pressure = +INF, ou 0).
+        """
+        if 'Pressure' not in table or np.asarray(table['Pressure']).dtype.kind != 'f':
+            return np.zeros(n, dtype=bool)
+        pression = np.asarray(table['Pressure'])
+        return np.isfinite(pression) & (pression != 0)
+
+    @staticmethod
+    def inclinaison(table, n):
+        """
+        Inclinaison (degrés) : InclV si renseigné, sinon combinaison de InclX et InclY.
+        NaN si l'entête ne contient aucune de ces informations.
+        """
+        incl_x = np.asarray(table['InclX'], dtype=float) if 'InclX' in table else np.full(n, np.nan)
+        incl_y = np.asarray(table['InclY'], dtype=float) if 'InclY' in table else np.full(n, np.nan)
+        inclinaison = np.hypot(incl_x, incl_y)
+        if 'InclV' in table:
+            incl_v = np.asarray(table['InclV'], dtype=float)
+            inclinaison = np.where(np.isfinite(incl_v), np.abs(incl_v), inclinaison)
+        return inclinaison
+
+    def appliquer(self, lot):
+        """
+        Ajoute la colonne QCFlags à la table d'entête du lot et, en mode 'rejeter',
+        retire les spectres portant un drapeau de rejet.
+        Retourne (lot, nombre de spectres rejetés).
+        """
+        flags = self.drapeaux(lot)
+        lot = dict(lot)
+        lot['entete'] = dict(lot['entete'])
+        lot['entete']['QCFlags'] = flags
+        if self.action != 'rejeter':
+            return lot, 0
+        garder = (flags & self.rejet) == 0
+        n_rejetes = int(len(flags) - garder.sum())
+        if n_rejetes:
+            lot = DataManager.select_lot(lot, garder)
+        return lot, n_rejetes
+
+    @staticmethod
+    def decrire(flags):
+        """
+        Noms des drapeaux levés dans un entier QCFlags (ex. ['saturation', 'inclinaison']).
+        """
+        return [nom for bit, nom in NOMS_DRAPEAUX.items() if int(flags) & bit]
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TAILLE_FIGURE = (6.4, 4.0)  # Pouces
+DPI = 80
+MAX_COURBES = 500  # Nombre max de spectres tracés dans une superposition
+MAX_LIGNES_CARTE = 2000  # Nombre max de lignes (temps) d'une carte temps x longueur d'onde
+SPECTRES_PAR_TACHE = 256  # Spectres envoyés à chaque tâche du pool
+
+
+def _importer_matplotlib():
+    try:
+        import matplotlib
+    except ImportError as e:
+        raise ImportError("Les quicklooks nécessitent le paquet matplotlib (pip install matplotlib).") from e
+    return matplotlib
+
+
+def _importer_image():
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise ImportError("Les quicklooks nécessitent le paquet Pillow (pip install pillow).") from e
+    return Image
+
+
+def _creer_figure():
+    """
+    Figure matplotlib hors pyplot, rendue par le backend non interactif Agg.
+    """
+    _importer_matplotlib()
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=TAILLE_FIGURE, dpi=DPI)
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0.12, 0.12, 0.84, 0.78])
+    ax.set_xlabel("Longueur d'onde (nm)")
+    return fig, ax
+
+
+def _limites(data):
+    """
+    Limites (bas, haut) de l'axe des ordonnées pour un ensemble de spectres, avec une marge de 5 %.
+    """
+    if not np.isfinite(data).any():
+        return (0.0, 1.0)
+    bas, haut = float(np.nanmin(data)), float(np.nanmax(data))
+    marge = 0.05 * (haut - bas) or 1.0
+    return (bas - marge, haut + marge)
+
+
+def _decimer(n, n_max):
+    """
+    Indices d'au plus n_max éléments régulièrement espacés parmi n.
+    """
+    if n <= n_max:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, n_max).astype(np.int64))
+
+
+class QuicklookPlotter:
+    """
+    Quicklooks PNG des spectres calibrés (output/png_files/) :
+    - un PNG par spectre, rendu en parallèle sur un pool de processus ; chaque
+      processus réutilise la même figure et son fond déjà rendu (seules la courbe
+      et le titre sont redessinés)
+    - une superposition des spectres par capteur (décimée au-delà de MAX_COURBES)
+    - une carte temps x longueur d'onde par capteur (décimée au-delà de MAX_LIGNES_CARTE)
+    Les spectres sont au format de DataManager.query_spectres.
+    Nécessite matplotlib et Pillow (ImportError explicite à la création sinon).
+    """
+
+    def __init__(self, output_dir, max_workers=None):
+        """
+        - output_dir  : dossier des PNG (output/png_files/)
+        - max_workers : nombre de processus (défaut : nombre de cœurs ; 1 = en série)
+        """
+        _importer_matplotlib()  # Dépendances optionnelles vérifiées avant le moindre tracé
+        _importer_image()
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        os.makedirs(output_dir, exist_ok=True)
+
+    @staticmethod
+    def nom_png(device, dt):
+        """
+        Nom du PNG d'un spectre, calqué sur celui du .txt calibré (CAPTEUR_date_hh-mm-ss.png).
+        """
+        date, heure = str(np.datetime64(dt, 's')).split('T')
+        return f"{str(device).upper()}_{date}_{heure.replace(':', '-')}.png"
+
+    def tracer_spectres(self, spectres):
+        """
+        Un PNG par spectre, à échelle commune par capteur (ce qui permet de ne
+        redessiner que la courbe et le titre d'un PNG à l'autre).
+        Retourne la liste des fichiers écrits.
+        """
+        n = len(spectres['data'])
+        devices = np.char.upper(spectres['device'].astype(str))
+        chemins = [os.path.join(self.output_dir, self.nom_png(d, t)) for d, t in zip(devices, spectres['datetime'])]
+        titres = [f"{d} {str(t).replace('T', ' ')}" for d, t in zip(devices, spectres['datetime'].astype('datetime64[s]'))]
+        taches = []
+        for nom_capteur in dict.fromkeys(devices.tolist()):
+            rows = np.flatnonzero(devices == nom_capteur)
+            limites = _limites(spectres['data'][rows])
+            for i in range(0, len(rows), SPECTRES_PAR_TACHE):
+                lot = rows[i:i + SPECTRES_PAR_TACHE]
+                taches.append((spectres['lambda'], spectres['data'][lot], [titres[k] for k in lot],
+                               [chemins[k] for k in lot], limites))
+        if self.max_workers == 1 or len(taches) <= 1:
+            for tache in taches:
+                _tracer_lot_spectres(*tache)
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                list(pool.map(_tracer_lot_spectres, *zip(*taches)))
+        logger.info("Quicklooks : %d spectres tracés dans %s", n, self.output_dir)
+        return chemins
+
+    def tracer_superposition(self, spectres, nom_capteur):
+        """
+        Superpose (au plus MAX_COURBES) spectres d'un capteur sur un même graphe.
+        """
+        rows = np.flatnonzero(np.char.upper(spectres['device'].astype(str)) == nom_capteur.upper())
+        rows = rows[_decimer(len(rows), MAX_COURBES)]
+        lam = spectres['lambda']
+        fig, ax = _creer_figure()
+        from matplotlib.collections import LineCollection
+        segments = np.stack([np.broadcast_to(lam, (len(rows), len(lam))), spectres['data'][rows]], axis=-1)
+        ax.add_collection(LineCollection(segments, linewidths=0.5, alpha=0.3))
+        ax.set_xlim(lam[0], lam[-1])
+        if len(rows) and np.isfinite(spectres['data'][rows]).any():
+            ax.set_ylim(np.nanmin(spectres['data'][rows]), np.nanmax(spectres['data'][rows]))
+        ax.set_title(f"{nom_capteur.upper()} : {len(rows)} spectres")
+        chemin = os.path.join(self.output_dir, f"{nom_capteur.upper()}_superposition.png")
+        fig.savefig(chemin)
+        return chemin
+
+    def tracer_carte(self, spectres, nom_capteur):
+        """
+        Carte temps x longueur d'onde des spectres d'un capteur (au plus MAX_LIGNES_CARTE lignes).
+        """
+        rows = np.flatnonzero(np.char.upper(spectres['device'].astype(str)) == nom_capteur.upper())
+        rows = rows[np.argsort(spectres['datetime'][rows], kind='stable')]
+        rows = rows[_decimer(len(rows), MAX_LIGNES_CARTE)]
+        lam = spectres['lambda']
+        fig, ax = _creer_figure()
+        ax.set_title(f"{nom_capteur.upper()} : temps x longueur d'onde")
+        if len(rows):
+            debut, fin = spectres['datetime'][rows[[0, -1]]].astype('datetime64[s]')
+            image = ax.imshow(spectres['data'][rows], aspect='auto', origin='lower', interpolation='nearest',
+                              extent=(lam[0], lam[-1], 0, len(rows)))
+            fig.colorbar(image, ax=ax)
+            ax.set_ylabel("Spectre")
+            ax.set_title(f"{nom_capteur.upper()} : {debut} -> {fin}")
+        chemin = os.path.join(self.output_dir, f"{nom_capteur.upper()}_carte.png")
+        fig.savefig(chemin)
+        return chemin
+
+    def run(self, spectres, par_spectre=True):
+        """
+        Produit tous les quicklooks d'un ensemble de spectres : superposition et carte
+        par capteur, et (si par_spectre) un PNG par spectre.
+        Retourne la liste des fichiers écrits.
+        """
+        chemins = []
+        for nom_capteur in dict.fromkeys(np.char.upper(spectres['device'].astype(str)).tolist()):
+            chemins.append(self.tracer_superposition(spectres, nom_capteur))
+            chemins.append(self.tracer_carte(spectres, nom_capteur))
+        if par_spectre:
+            chemins.extend(self.tracer_spectres(spectres))
+        return chemins
+
+
+# --- Exécution dans les processus du pool (tracer_spectres) ---
+
+_figure_worker = None  # Figure, courbe et fond (axes, graduations) réutilisés par le processus
+
+
+def _tracer_lot_spectres(cal_lambda, data, titres, chemins, limites):
+    """
+    Trace un lot de spectres en réutilisant la figure du processus : le fond (axes
+    et graduations) n'est redessiné que si les limites changent, puis pour chaque
+    spectre seuls la courbe et le titre sont redessinés (blitting) avant l'écriture du PNG.
+    """
+    global _figure_worker
+    Image = _importer_image()
+    if _figure_worker is None:
+        fig, ax = _creer_figure()
+        courbe, = ax.plot(cal_lambda, np.zeros(len(cal_lambda)), linewidth=1, animated=True)
+        titre = ax.set_title('', animated=True)
+        _figure_worker = {'fig': fig, 'ax': ax, 'courbe': courbe, 'titre': titre, 'cle': None, 'fond': None}
+    fw = _figure_worker
+    fig, ax, courbe, titre = fw['fig'], fw['ax'], fw['courbe'], fw['titre']
+    cle = (cal_lambda[0], cal_lambda[-1], len(cal_lambda), limites)
+    if fw['cle'] != cle:
+        courbe.set_xdata(cal_lambda)
+        ax.set_xlim(cal_lambda[0], cal_lambda[-1])
+        ax.set_ylim(*limites)
+        fig.canvas.draw()
+        fw['fond'] = fig.canvas.copy_from_bbox(fig.bbox)
+        fw['cle'] = cle
+    largeur, hauteur = fig.canvas.get_width_height()
+    for row, texte, chemin in zip(data, titres, chemins):
+        fig.canvas.restore_region(fw['fond'])
+        courbe.set_ydata(row)
+        titre.set_text(texte)
+        ax.draw_artist(courbe)
+        ax.draw_artist(titre)
+        image = Image.frombuffer('RGBA', (largeur, hauteur), fig.canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1)
+        image.convert('RGB').save(chemin, compress_level=1)
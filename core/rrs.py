@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+import os
+import logging
+import numpy as np
+from core.data_manager import DataManager
+
+logger = logging.getLogger(__name__)
+
+RHO_DEFAUT = 0.028  # Facteur de réflexion du ciel à la surface (Mobley 1999, vent faible)
+TOLERANCE_DEFAUT_S = 5  # Écart de temps max entre les spectres d'un triplet (s)
+
+
+class RrsCalculator:
+    """
+    Réflectance de télédétection Rrs = (Lu - rho * Lsky) / Ed à partir des spectres
+    calibrés de trois radiomètres (Ed, Lu, Lsky). Chaque spectre Lu est associé aux
+    spectres Ed et Lsky les plus proches dans le temps (tri + searchsorted), puis
+    tous les triplets sont calculés en une seule opération matricielle.
+    """
+
+    def __init__(self, roles, rho=RHO_DEFAUT, tolerance_s=TOLERANCE_DEFAUT_S):
+        """
+        - roles       : dict {'Ed': capteur, 'Lu': capteur, 'Lsky': capteur} (ex. 'SAM_8467')
+        - rho         : facteur de réflexion du ciel (sky glint)
+        - tolerance_s : écart de temps max (s) entre Lu et les spectres Ed/Lsky associés
+        """
+        manquants = {'Ed', 'Lu', 'Lsky'} - set(roles)
+        if manquants:
+            raise ValueError(f"Rôles manquants : {', '.join(sorted(manquants))}")
+        self.roles = {role: capteur.upper() for role, capteur in roles.items()}
+        self.rho = rho
+        self.tolerance_s = tolerance_s
+
+    @staticmethod
+    def apparier(t_ref, t_autre, tolerance_s):
+        """
+        Pour chaque date de t_ref, indice de la date la plus proche dans t_autre
+        (trié par ordre croissant) et masque des appariements à moins de tolerance_s.
+        """
+        t_ref = t_ref.astype('datetime64[ms]').astype(np.int64)
+        t_autre = t_autre.astype('datetime64[ms]').astype(np.int64)
+        if len(t_autre) == 0:
+            return np.zeros(len(t_ref), dtype=np.int64), np.zeros(len(t_ref), dtype=bool)
+        droite = np.clip(np.searchsorted(t_autre, t_ref), 0, len(t_autre) - 1)
+        gauche = np.clip(droite - 1, 0, len(t_autre) - 1)
+        plus_proche = np.where(np.abs(t_autre[gauche] - t_ref) <= np.abs(t_autre[droite] - t_ref), gauche, droite)
+        valide = np.abs(t_autre[plus_proche] - t_ref) <= tolerance_s * 1000
+        return plus_proche, valide
+
+    def calculer(self, spectres):
+        """
+        Calcule Rrs pour tous les triplets (Lu, Ed, Lsky) appariés.
+        - spectres : dict {'lambda', 'data', 'device', 'datetime', 'id_data'} contenant
+                     les spectres calibrés des trois capteurs (format DataManager.query_spectres)
+        Retourne {'lambda', 'rrs' (N, L), 'datetime', 'id_lu', 'id_ed', 'id_lsky'}.
+        """
+        devices = np.char.upper(np.asarray(spectres['device'], dtype=str))
+        par_role = {}
+        for role, capteur in self.roles.items():
+            rows = np.flatnonzero(devices == capteur)
+            rows = rows[np.argsort(spectres['datetime'][rows], kind='stable')]
+            par_role[role] = rows
+
+        lu = par_role['Lu']
+        t_lu = spectres['datetime'][lu]
+        i_ed, ok_ed = self.apparier(t_lu, spectres['datetime'][par_role['Ed']], self.tolerance_s)
+        i_lsky, ok_lsky = self.apparier(t_lu, spectres['datetime'][par_role['Lsky']], self.tolerance_s)
+        valide = ok_ed & ok_lsky
+        lu = lu[valide]
+        ed = par_role['Ed'][i_ed[valide]]
+        lsky = par_role['Lsky'][i_lsky[valide]]
+        logger.info("Rrs : %d triplets appariés sur %d spectres Lu", len(lu), len(valide))
+
+        data = spectres['data']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rrs = (data[lu] - self.rho * data[lsky]) / data[ed]
+        return {
+            'lambda': spectres['lambda'],
+            'rrs': rrs,
+            'datetime': spectres['datetime'][lu],
+            'id_lu': spectres['id_data'][lu],
+            'id_ed': spectres['id_data'][ed],
+            'id_lsky': spectres['id_data'][lsky],
+        }
+
+    def calculer_depuis_index(self, output_dir, debut=None, fin=None):
+        """
+        Calcule Rrs depuis les sorties calibrées indexées de output_dir
+        (voir DataManager.query_spectres) entre debut et fin.
+        """
+        morceaux = [DataManager.query_spectres(output_dir, capteur, debut, fin)
+                    for capteur in dict.fromkeys(self.roles.values())]
+        morceaux = [m for m in morceaux if len(m['data'])]
+        if not morceaux:
+            return self.calculer({'lambda': np.empty(0), 'data': np.empty((0, 0)), 'device': np.empty(0, dtype=str),
+                                  'datetime': np.empty(0, dtype='datetime64[s]'), 'id_data': np.empty(0, dtype=str)})
+        for m in morceaux[1:]:
+            if not np.array_equal(m['lambda'], morceaux[0]['lambda']):
+                raise ValueError("Grilles de longueurs d'onde différentes entre capteurs")
+        spectres = {cle: np.concatenate([m[cle] for m in morceaux]) for cle in ('data', 'device', 'datetime', 'id_data')}
+        spectres['lambda'] = morceaux[0]['lambda']
+        return self.calculer(spectres)
+
+    @staticmethod
+    def save_rrs_txt(resultat, output_dir, nom_run='Rrs'):
+        """
+        Écrit les spectres Rrs dans output/Rrs/{nom_run}.txt : une ligne par triplet
+        (date, IDData Lu/Ed/Lsky, puis Rrs à chaque longueur d'onde).
+        Retourne le chemin du fichier écrit.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        filepath = os.path.join(output_dir, f"{nom_run}.txt")
+        with open(filepath, 'w', encoding='utf-8') as fo:
+            fo.write("datetime\tid_lu\tid_ed\tid_lsky\t" + "\t".join(map(str, resultat['lambda'])) + "\n")
+            for k in range(len(resultat['rrs'])):
+                fo.write(f"{resultat['datetime'][k]}\t{resultat['id_lu'][k]}\t{resultat['id_ed'][k]}\t"
+                         f"{resultat['id_lsky'][k]}\t" + "\t".join(map(repr, resultat['rrs'][k].tolist())) + "\n")
+        logger.info("Rrs : %d spectres écrits dans %s", len(resultat['rrs']), filepath)
+        return filepath
+
+    @staticmethod
+    def iter_rrs_txt(path_rrs, taille_lot=100000):
+        """
+        Relit par lots de taille_lot spectres un fichier écrit par save_rrs_txt
+        (mémoire bornée pour les archives de plusieurs millions de spectres).
+        Produit des dicts au format de calculer().
+        """
+        with open(path_rrs, 'r', encoding='utf-8') as fi:
+            cal_lambda = np.array(fi.readline().rstrip('\n').split('\t')[4:], dtype=float)
+            while True:
+                lignes = [ligne for _, ligne in zip(range(taille_lot), fi)]
+                if not lignes:
+                    return
+                champs = [ligne.rstrip('\n').split('\t', 4) for ligne in lignes]
+                valeurs = np.fromstring('\t'.join(c[4] for c in champs), sep='\t')
+                yield {
+                    'lambda': cal_lambda,
+                    'rrs': valeurs.reshape(len(champs), len(cal_lambda)),
+                    'datetime': np.array([c[0] for c in champs], dtype='datetime64[s]'),
+                    'id_lu': np.array([c[1] for c in champs], dtype=str),
+                    'id_ed': np.array([c[2] for c in champs], dtype=str),
+                    'id_lsky': np.array([c[3] for c in champs], dtype=str),
+                }
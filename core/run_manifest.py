@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+import os
+import logging
+import json
+import hashlib
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+TAILLE_SIGNATURE = 4096  # Octets du début du fichier utilisés pour le reconnaître
+
+
+class RunManifest:
+    """
+    Manifeste d'un traitement incrémental d'un export .dat :
+    - <manifest>.json : offset atteint (octets), nombre d'IDData validés, signature du
+                        fichier et nombre de lignes validées de chaque fichier de sortie
+    - <manifest>.ids  : IDData déjà traités, un par ligne (ajout seul)
+    Seul l'état écrit par commit() fait foi : après un arrêt brutal, le traitement
+    reprend au dernier point de contrôle validé, et les fichiers de sortie sont
+    ramenés à leurs lignes validées (voir ExportNetCDF, SpectrumStoreWriter).
+    """
+
+    def __init__(self, path_manifest, path_data):
+        self.path_manifest = path_manifest
+        self.path_ids = os.path.splitext(path_manifest)[0] + '.ids'
+        self.path_data = path_data
+        self.offset = 0
+        self.ids = set()
+        self._n_ids = 0
+        # {nom du fichier de sortie: lignes validées} ; None pour un manifeste d'un
+        # format antérieur, qui ne les enregistrait pas (sorties gardées telles quelles)
+        self.sorties = {}
+
+    @classmethod
+    def charger(cls, path_manifest, path_data):
+        """
+        Charge le manifeste s'il existe et correspond toujours au fichier path_data
+        (même début de fichier, taille au moins égale à l'offset). Sinon, repart de zéro :
+        aucune ligne de sortie n'est alors validée.
+        """
+        manifest = cls(path_manifest, path_data)
+        if os.path.exists(path_manifest):
+            with open(path_manifest, 'r', encoding='utf-8') as fi:
+                etat = json.load(fi)
+            taille = os.path.getsize(path_data)
+            if taille < etat['offset'] or manifest._signature(etat['offset']) != etat['signature']:
+                logger.warning("%s a changé depuis le dernier run : retraitement complet.", path_data)
+            else:
+                manifest.offset = etat['offset']
+                manifest._n_ids = etat['n_ids']
+                manifest.sorties = etat.get('sorties')
+        manifest._lire_ids()
+        return manifest
+
+    def _lire_ids(self):
+        """
+        Relit les n_ids IDData validés et tronque le fichier .ids après eux
+        (lignes écrites par un run interrompu avant son commit).
+        """
+        if not os.path.exists(self.path_ids):
+            return
+        with open(self.path_ids, 'rb+') as fo:
+            taille, n_lignes = 0, 0
+            for _, ligne in zip(range(self._n_ids), fo):
+                self.ids.add(ligne.rstrip(b'\n').decode('utf-8'))
+                taille += len(ligne)
+                n_lignes += 1
+            self._n_ids = n_lignes
+            fo.truncate(taille)
+
+    def _signature(self, offset):
+        """
+        Empreinte des premiers octets (au plus offset) du fichier de données.
+        """
+        with open(self.path_data, 'rb') as f:
+            return hashlib.sha1(f.read(min(offset, TAILLE_SIGNATURE))).hexdigest()
+
+    def commit(self, offset, nouveaux_ids, sorties=None):
+        """
+        Valide un point de contrôle : les IDData traités sont ajoutés au fichier .ids
+        puis le .json est remplacé de façon atomique.
+        - sorties : {nom du fichier de sortie: lignes écrites} des fichiers vidés sur
+                    disque avant ce point de contrôle (voir lignes() des exporteurs)
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path_manifest)), exist_ok=True)
+        with open(self.path_ids, 'a', encoding='utf-8') as fo:
+            for id_data in nouveaux_ids:
+                fo.write(f"{id_data}\n")
+            fo.flush()
+            os.fsync(fo.fileno())
+        self.ids.update(nouveaux_ids)
+        self._n_ids += len(nouveaux_ids)
+        self.offset = offset
+        if sorties and self.sorties is not None:
+            self.sorties.update(sorties)
+
+        etat = {
+            'fichier': os.path.abspath(self.path_data),
+            'offset': self.offset,
+            'n_ids': self._n_ids,
+            'signature': self._signature(self.offset),
+        }
+        if self.sorties is not None:
+            etat['sorties'] = self.sorties
+        fd, tmp = tempfile.mkstemp(suffix='.json', dir=os.path.dirname(os.path.abspath(self.path_manifest)))
+        with os.fdopen(fd, 'w', encoding='utf-8') as fo:
+            json.dump(etat, fo, indent=2)
+            fo.flush()
+            os.fsync(fo.fileno())
+        os.replace(tmp, self.path_manifest)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sqlite3
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NOM_INDEX = 'index_spectres.sqlite'  # Fichier d'index dans le dossier de sortie
+
+
+class SpectraIndex:
+    """
+    Index persistant des spectres calibrés exportés : (capteur, date, IDData) ->
+    emplacement (fichier .txt, ou fichier .nc + ligne). Stocké en SQLite avec un
+    index B-tree sur (capteur, date) et sur la date seule : une requête sur une
+    fenêtre de temps, pour un capteur ou pour tous, coûte O(log N + nombre de
+    résultats) quelle que soit la taille de l'archive.
+    Plusieurs processus peuvent écrire dans le même index (run_multi_files).
+    """
+
+    def __init__(self, output_dir, path_index=None):
+        """
+        - output_dir : dossier des sorties calibrées indexées
+        - path_index : chemin du fichier d'index (défaut : output_dir/index_spectres.sqlite)
+        """
+        self.output_dir = output_dir
+        self.path_index = path_index or os.path.join(output_dir, NOM_INDEX)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path_index)), exist_ok=True)
+        self.connexion = sqlite3.connect(self.path_index, timeout=60)
+        self.connexion.execute(
+            "CREATE TABLE IF NOT EXISTS spectres ("
+            "id_data TEXT PRIMARY KEY, device TEXT NOT NULL, datetime INTEGER NOT NULL, "
+            "fichier TEXT NOT NULL, ligne INTEGER NOT NULL)")
+        self.connexion.execute("CREATE INDEX IF NOT EXISTS idx_device_datetime ON spectres (device, datetime)")
+        self.connexion.execute("CREATE INDEX IF NOT EXISTS idx_datetime ON spectres (datetime)")
+        self.connexion.commit()
+
+    def ajouter(self, devices, datetimes, ids_data, fichiers, lignes=None):
+        """
+        Indexe un lot de spectres exportés (un IDData déjà indexé est remplacé).
+        - devices   : noms des capteurs
+        - datetimes : dates (datetime64 ou chaînes ISO)
+        - ids_data  : IDData des spectres
+        - fichiers  : fichier de sortie de chaque spectre (chemin relatif à output_dir ou absolu)
+        - lignes    : ligne de chaque spectre dans son fichier (NetCDF) ; -1 pour un .txt
+        """
+        secondes = np.asarray(datetimes, dtype='datetime64[s]').astype(np.int64)
+        if lignes is None:
+            lignes = np.full(len(secondes), -1)
+        fichiers = [os.path.relpath(f, self.output_dir) if os.path.isabs(f) else f for f in fichiers]
+        self.connexion.executemany(
+            "INSERT OR REPLACE INTO spectres (id_data, device, datetime, fichier, ligne) VALUES (?, ?, ?, ?, ?)",
+            zip(map(str, ids_data), (str(d).upper() for d in devices), secondes.tolist(), fichiers,
+                np.asarray(lignes).tolist()))
+        self.connexion.commit()
+
+    def rechercher(self, device=None, debut=None, fin=None):
+        """
+        Spectres d'un capteur (ou de tous) dont la date est dans [debut, fin], triés par date.
+        Retourne un dict de tableaux : device, datetime (datetime64[s]), id_data, fichier, ligne.
+        """
+        conditions, params = [], []
+        if device is not None:
+            conditions.append("device = ?")
+            params.append(device.upper())
+        if debut is not None:
+            conditions.append("datetime >= ?")
+            params.append(int(np.datetime64(debut, 's').astype(np.int64)))
+        if fin is not None:
+            conditions.append("datetime <= ?")
+            params.append(int(np.datetime64(fin, 's').astype(np.int64)))
+        requete = "SELECT device, datetime, id_data, fichier, ligne FROM spectres"
+        if conditions:
+            requete += " WHERE " + " AND ".join(conditions)
+        lignes = self.connexion.execute(requete + " ORDER BY datetime, rowid", params).fetchall()
+        colonnes = list(zip(*lignes)) if lignes else [(), (), (), (), ()]
+        return {
+            'device': np.array(colonnes[0], dtype=str),
+            'datetime': np.array(colonnes[1], dtype=np.int64).astype('datetime64[s]'),
+            'id_data': np.array(colonnes[2], dtype=str),
+            'fichier': np.array([os.path.join(self.output_dir, f) for f in colonnes[3]], dtype=str),
+            'ligne': np.array(colonnes[4], dtype=np.int64),
+        }
+
+    def __len__(self):
+        return self.connexion.execute("SELECT COUNT(*) FROM spectres").fetchone()[0]
+
+    def close(self):
+        self.connexion.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import logging
+import tempfile
+import numpy as np
+from core.spectra_index import SpectraIndex
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_STORE = '.store'  # Un store est un dossier {nom_run}.store/
+
+
+class _NpyExtensible:
+    """
+    Fichier .npy dont la première dimension grandit par ajouts successifs.
+    L'entête .npy réserve la place d'un nombre de lignes quelconque : il est
+    réécrit sur place à chaque sync(), le fichier reste lisible par np.load.
+    """
+
+    def __init__(self, path, dtype, forme_ligne=(), mode='w'):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.forme_ligne = tuple(forme_ligne)
+        if mode == 'a' and os.path.exists(path):
+            existant = np.load(path, mmap_mode='r')
+            if existant.dtype != self.dtype or existant.shape[1:] != self.forme_ligne:
+                raise ValueError(f"Format incompatible dans {path}")
+            self.n = existant.shape[0]
+            self.debut_donnees = existant.offset
+            del existant
+            self.fichier = open(path, 'r+b')
+            self.fichier.truncate(self.debut_donnees + self.n * self._taille_ligne())
+        else:
+            self.n = 0
+            self.fichier = open(path, 'w+b')
+            self._ecrire_entete()
+            self.debut_donnees = self.fichier.tell()
+        self.fichier.seek(0, os.SEEK_END)
+
+    def _taille_ligne(self):
+        return self.dtype.itemsize * int(np.prod(self.forme_ligne, dtype=np.int64))
+
+    def _ecrire_entete(self):
+        self.fichier.seek(0)
+        np.lib.format.write_array_header_1_0(self.fichier, {
+            'descr': np.lib.format.dtype_to_descr(self.dtype),
+            'fortran_order': False,
+            'shape': (self.n,) + self.forme_ligne,
+        })
+
+    def ajouter(self, valeurs):
+        valeurs = np.ascontiguousarray(valeurs, dtype=self.dtype)
+        self.fichier.write(valeurs.tobytes())
+        self.n += len(valeurs)
+
+    def sync(self):
+        self._ecrire_entete()
+        self.fichier.seek(0, os.SEEK_END)
+        self.fichier.flush()
+
+    def close(self):
+        self.sync()
+        self.fichier.close()
+
+
+class SpectrumStoreWriter:
+    """
+    Store de spectres calibrés (remplace les fichiers pickle) : un dossier
+    {nom_run}.store/ contenant
+    - data.npy        : cube float32 (N, L), lu ensuite par memmap sans copie
+    - wavelength.npy  : grille de longueurs d'onde commune (L,)
+    - time.npy        : dates (secondes depuis 1970, int64)
+    - device.npy      : code du capteur (uint16), noms dans meta.json
+    - integration_time.npy, calibration.npy : temps d'intégration, code du fichier Cal
+    - qc_flags.npy    : drapeaux du contrôle qualité (voir core/qc.py)
+    - id_data.txt     : IDData, un par ligne
+    - meta.json       : nombre de spectres, noms des capteurs et fichiers Cal
+    Même interface que les exporteurs (voir ExportManager.creer).
+    """
+
+    def __init__(self, output_dir, nom_run, mode='w', dtype='f4', index=True, lignes_validees=None):
+        """
+        - output_dir      : dossier de sortie (output/store/)
+        - nom_run         : nom du store ({nom_run}.store)
+        - mode            : 'w' (écrase) ou 'a' (ajoute au store existant)
+        - dtype           : type des spectres (float32 par défaut)
+        - index           : True pour indexer les spectres exportés (voir SpectraIndex)
+        - lignes_validees : en mode 'a', {nom du store: spectres validés} (voir RunManifest) :
+                            le store est ramené à ses spectres validés, et recréé s'il
+                            n'en a aucun (None = meta.json fait foi)
+        """
+        self.output_dir = output_dir
+        self.path_store = os.path.join(output_dir, nom_run + EXTENSION_STORE)
+        self.mode = mode
+        self.dtype = dtype
+        self.lignes_validees = lignes_validees
+        self.colonnes = None  # {nom: _NpyExtensible}, ouvertes au premier lot
+        self.meta = {'n_spectres': 0, 'devices': [], 'calibrations': []}
+        os.makedirs(output_dir, exist_ok=True)
+        self.index = SpectraIndex(output_dir) if index else None
+
+    def _ouvrir(self, new_lam):
+        mode = self.mode
+        path_meta = os.path.join(self.path_store, 'meta.json')
+        n_valide = None
+        if self.lignes_validees is not None:
+            n_valide = self.lignes_validees.get(os.path.basename(self.path_store), 0)
+        if mode == 'a' and os.path.exists(path_meta) and n_valide != 0:
+            with open(path_meta, 'r', encoding='utf-8') as fi:
+                self.meta = json.load(fi)
+            if n_valide is not None and self.meta['n_spectres'] > n_valide:
+                logger.warning("%s : spectres au-delà du spectre %d non validés, supprimés.",
+                               self.path_store, n_valide)
+                self.meta['n_spectres'] = n_valide
+            if not np.array_equal(np.load(os.path.join(self.path_store, 'wavelength.npy')), new_lam):
+                raise ValueError(f"Grille de longueurs d'onde différente dans {self.path_store}")
+        else:
+            mode = 'w'
+            os.makedirs(self.path_store, exist_ok=True)
+            np.save(os.path.join(self.path_store, 'wavelength.npy'), np.asarray(new_lam, dtype='f8'))
+        self.colonnes = {
+            'data': _NpyExtensible(os.path.join(self.path_store, 'data.npy'), self.dtype, (len(new_lam),), mode),
+            'time': _NpyExtensible(os.path.join(self.path_store, 'time.npy'), 'i8', (), mode),
+            'device': _NpyExtensible(os.path.join(self.path_store, 'device.npy'), 'u2', (), mode),
+            'integration_time': _NpyExtensible(os.path.join(self.path_store, 'integration_time.npy'), 'i4', (), mode),
+            'calibration': _NpyExtensible(os.path.join(self.path_store, 'calibration.npy'), 'u2', (), mode),
+            'qc_flags': _NpyExtensible(os.path.join(self.path_store, 'qc_flags.npy'), 'u2', (), mode),
+        }
+        # Une écriture interrompue peut laisser des colonnes plus longues que meta.json
+        # (ou que les spectres validés) ;
+        # une colonne absente d'un store plus ancien est complétée par des zéros
+        n = self.meta['n_spectres']
+        for colonne in self.colonnes.values():
+            if colonne.n < n:
+                colonne.ajouter(np.zeros((n - colonne.n,) + colonne.forme_ligne, dtype=colonne.dtype))
+            elif colonne.n > n:
+                colonne.n = n
+                colonne.fichier.truncate(colonne.debut_donnees + n * colonne._taille_ligne())
+                colonne.fichier.seek(0, os.SEEK_END)
+        path_ids = os.path.join(self.path_store, 'id_data.txt')
+        if mode == 'a' and os.path.exists(path_ids):
+            with open(path_ids, 'rb+') as fo:
+                taille = sum(len(ligne) for _, ligne in zip(range(n), fo))
+                fo.truncate(taille)
+        self._ids = open(path_ids, 'a' if mode == 'a' else 'w', encoding='utf-8')
+
+    @staticmethod
+    def _codes(valeurs, noms):
+        """
+        Code de chaque valeur dans la liste noms (complétée au besoin).
+        """
+        codes = {nom: k for k, nom in enumerate(noms)}
+        for valeur in dict.fromkeys(valeurs):
+            if valeur not in codes:
+                codes[valeur] = len(noms)
+                noms.append(valeur)
+        return np.array([codes[v] for v in valeurs], dtype=np.uint16)
+
+    def ecrire_lot(self, table, new_lam, data, capteurs):
+        """
+        Ajoute un lot de spectres interpolés (même signature que ExportTxt.ecrire_lot).
+        """
+        n = len(data)
+        if n == 0:
+            return
+        if self.colonnes is None:
+            self._ouvrir(new_lam)
+        i0 = self.meta['n_spectres']
+        devices = [c.nom_capteur.upper() for c in capteurs]
+        secondes = table['DateTime'].astype('datetime64[s]').astype(np.int64)
+        self.colonnes['data'].ajouter(data)
+        self.colonnes['time'].ajouter(secondes)
+        self.colonnes['device'].ajouter(self._codes(devices, self.meta['devices']))
+        self.colonnes['integration_time'].ajouter(
+            table['IntegrationTime'] if 'IntegrationTime' in table else np.full(n, -1))
+        self.colonnes['calibration'].ajouter(self._codes(
+            [getattr(c, 'fichier_Cal', 'NC') for c in capteurs], self.meta['calibrations']))
+        self.colonnes['qc_flags'].ajouter(table['QCFlags'] if 'QCFlags' in table else np.zeros(n))
+        self._ids.write(''.join(f"{i}\n" for i in table['IDData'].tolist()))
+        self.meta['n_spectres'] = i0 + n
+        if self.index is not None:
+            self.index.ajouter(devices, secondes.astype('datetime64[s]'), table['IDData'],
+                               [self.path_store] * n, np.arange(i0, i0 + n))
+
+    def flush(self):
+        """
+        Point de contrôle : entêtes .npy à jour puis meta.json remplacé de façon atomique.
+        """
+        if self.colonnes is None:
+            return
+        for colonne in self.colonnes.values():
+            colonne.sync()
+        self._ids.flush()
+        fd, tmp = tempfile.mkstemp(suffix='.json', dir=self.path_store)
+        with os.fdopen(fd, 'w', encoding='utf-8') as fo:
+            json.dump(self.meta, fo, indent=2, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.path_store, 'meta.json'))
+
+    def lignes(self):
+        """
+        Spectres écrits dans le store : {nom du store: nombre de spectres}.
+        """
+        if self.colonnes is None:
+            return {}
+        return {os.path.basename(self.path_store): self.meta['n_spectres']}
+
+    def close(self):
+        if self.colonnes is not None:
+            self.flush()
+            for colonne in self.colonnes.values():
+                colonne.close()
+            self._ids.close()
+            self.colonnes = None
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SpectrumStore:
+    """
+    Lecture d'un store écrit par SpectrumStoreWriter. Les tableaux sont ouverts
+    en memmap : l'ouverture ne lit rien, et une sélection ne charge que les pages
+    des spectres (et longueurs d'onde) demandés.
+    """
+
+    def __init__(self, path_store):
+        self.path_store = path_store
+        with open(os.path.join(path_store, 'meta.json'), 'r', encoding='utf-8') as fi:
+            self.meta = json.load(fi)
+        n = self.meta['n_spectres']
+        self.wavelength = np.load(os.path.join(path_store, 'wavelength.npy'))
+        self.data = np.load(os.path.join(path_store, 'data.npy'), mmap_mode='r')[:n]
+        self.time = np.load(os.path.join(path_store, 'time.npy'), mmap_mode='r')[:n]
+        self.device = np.load(os.path.join(path_store, 'device.npy'), mmap_mode='r')[:n]
+        self.integration_time = np.load(os.path.join(path_store, 'integration_time.npy'), mmap_mode='r')[:n]
+        self.calibration = np.load(os.path.join(path_store, 'calibration.npy'), mmap_mode='r')[:n]
+        path_qc = os.path.join(path_store, 'qc_flags.npy')
+        self.qc_flags = np.load(path_qc, mmap_mode='r')[:n] if os.path.exists(path_qc) else np.zeros(n, dtype=np.uint16)
+        self.devices = self.meta['devices']
+        self._id_data = None
+        self._sens_temps = None  # 1 : dates croissantes, -1 : décroissantes, 0 : non triées
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def id_data(self):
+        """
+        IDData des spectres (lus au premier accès).
+        """
+        if self._id_data is None:
+            with open(os.path.join(self.path_store, 'id_data.txt'), 'r', encoding='utf-8') as fi:
+                self._id_data = np.array(fi.read().splitlines()[:len(self)], dtype=str)
+        return self._id_data
+
+    def selection(self, device=None, debut=None, fin=None):
+        """
+        Indices (triés) des spectres d'un capteur et/ou d'une fenêtre de temps.
+        Si les dates sont triées (dans un sens ou dans l'autre, comme les spectres
+        d'un export), la fenêtre est localisée par recherche dichotomique et seules
+        ses lignes sont lues ; sinon toute la colonne time est parcourue.
+        """
+        if device is not None and device.upper() not in self.devices:
+            return np.empty(0, dtype=np.int64)
+        t0 = None if debut is None else np.datetime64(debut, 's').astype(np.int64)
+        t1 = None if fin is None else np.datetime64(fin, 's').astype(np.int64)
+        i0, i1 = self.plage_temps(t0, t1)
+        masque = None
+        if self.sens_temps == 0:
+            masque = np.ones(i1 - i0, dtype=bool)
+            if t0 is not None:
+                masque &= self.time[i0:i1] >= t0
+            if t1 is not None:
+                masque &= self.time[i0:i1] <= t1
+        if device is not None:
+            code = self.devices.index(device.upper())
+            masque = self.device[i0:i1] == code if masque is None else masque & (self.device[i0:i1] == code)
+        if masque is None:
+            return np.arange(i0, i1, dtype=np.int64)
+        return i0 + np.flatnonzero(masque)
+
+    @property
+    def sens_temps(self):
+        """
+        1 si les dates sont croissantes, -1 si elles sont décroissantes, 0 sinon
+        (calculé une fois).
+        """
+        if self._sens_temps is None:
+            ecarts = np.diff(self.time)
+            self._sens_temps = 1 if np.all(ecarts >= 0) else -1 if np.all(ecarts <= 0) else 0
+        return self._sens_temps
+
+    def plage_temps(self, t0=None, t1=None):
+        """
+        Plage de lignes (i0, i1) contenant les spectres datés de [t0, t1] (secondes
+        depuis 1970) : exacte si les dates sont triées, tout le store sinon.
+        """
+        n = len(self)
+        if (t0 is None and t1 is None) or self.sens_temps == 0:
+            return 0, n
+        if self.sens_temps == 1:
+            temps = self.time
+        else:
+            temps = self.time[::-1]
+        j0 = 0 if t0 is None else int(np.searchsorted(temps, t0, side='left'))
+        j1 = n if t1 is None else int(np.searchsorted(temps, t1, side='right'))
+        j1 = max(j0, j1)
+        return (j0, j1) if self.sens_temps == 1 else (n - j1, n - j0)
+
+    def colonnes_longueurs_onde(self, lambda_min=None, lambda_max=None):
+        """
+        Tranche des colonnes correspondant à [lambda_min, lambda_max].
+        """
+        j0 = 0 if lambda_min is None else int(np.searchsorted(self.wavelength, lambda_min, side='left'))
+        j1 = len(self.wavelength) if lambda_max is None else int(np.searchsorted(self.wavelength, lambda_max, side='right'))
+        return slice(j0, j1)
+
+    def lire(self, device=None, debut=None, fin=None, lambda_min=None, lambda_max=None):
+        """
+        Spectres sélectionnés par capteur, fenêtre de temps et plage de longueurs d'onde.
+        Retourne {'lambda', 'data', 'device', 'datetime', 'id_data'} (format de DataManager.query_spectres).
+        """
+        rows = self.selection(device, debut, fin)
+        colonnes = self.colonnes_longueurs_onde(lambda_min, lambda_max)
+        return {
+            'lambda': self.wavelength[colonnes],
+            'data': self.data[rows, colonnes],
+            'device': np.array(self.devices, dtype=str)[self.device[rows]] if len(rows) else np.empty(0, dtype=str),
+            'datetime': self.time[rows].astype('datetime64[s]'),
+            'id_data': self.id_data[rows],
+        }
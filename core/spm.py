@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+import os
+import logging
+import numpy as np
+from core.capteur import grille_interpolation
+from core.rrs import RrsCalculator
+
+logger = logging.getLogger(__name__)
+
+# Coefficients mono-bande de Nechad et al. (2010) : {longueur d'onde (nm): (A (g/m3), C)}
+# SPM = A * rho_w / (1 - rho_w / C), avec rho_w = pi * Rrs
+COEFFICIENTS_NECHAD = {
+    665: (355.85, 0.1728),
+    865: (2971.93, 0.2115),
+}
+
+# Bascule rouge -> proche infrarouge inspirée de Dogliotti et al. (2015) : bande
+# rouge en dessous de SEUILS_BASCULE[0], proche infrarouge au-dessus de
+# SEUILS_BASCULE[1], mélange linéaire entre les deux. Adaptation : la publication
+# (turbidité) bascule sur rho_w(645) entre les bandes 645 et 859 nm ; ici, mêmes
+# seuils appliqués à rho_w(665) avec les bandes SPM 665 / 865 nm de Nechad (2010).
+SEUILS_BASCULE = (0.05, 0.07)
+DEMI_LARGEUR_BANDE = 5  # Demi-largeur (nm) de la moyenne autour de chaque bande
+
+
+class SPMEstimator:
+    """
+    Estimation de la concentration en matières en suspension (SPM, g/m3) à partir
+    de spectres Rrs, pour des lots entiers à la fois : les indices des bandes sur la
+    grille d'interpolation sont calculés une seule fois, puis chaque algorithme est
+    une opération vectorisée sur la matrice (N, L) des Rrs.
+    """
+
+    def __init__(self, mode='UV_Vis', coefficients=None, seuils=SEUILS_BASCULE, demi_largeur=DEMI_LARGEUR_BANDE):
+        """
+        - mode         : grille de longueurs d'onde des Rrs (voir grille_interpolation)
+        - coefficients : dict {longueur d'onde: (A, C)} (défaut : Nechad 2010, 665 et 865 nm)
+        - seuils       : seuils de rho_w(bande rouge) de la bascule rouge -> proche infrarouge
+        - demi_largeur : demi-largeur (nm) des bandes
+        """
+        self.coefficients = dict(coefficients or COEFFICIENTS_NECHAD)
+        self.seuils = seuils
+        self.demi_largeur = demi_largeur
+        self._indices = {}  # Cache {grille (octets): (bandes, poids)}
+        self.indices_bandes(grille_interpolation(mode))
+
+    def indices_bandes(self, cal_lambda):
+        """
+        Poids (N_bandes, L) de la moyenne de chaque bande sur la grille cal_lambda (calculés une fois par grille).
+        """
+        cal_lambda = np.asarray(cal_lambda, dtype=float)
+        cle = cal_lambda.tobytes()
+        if cle not in self._indices:
+            bandes = sorted(self.coefficients)
+            poids = np.zeros((len(bandes), len(cal_lambda)))
+            for k, bande in enumerate(bandes):
+                dans_bande = np.abs(cal_lambda - bande) <= self.demi_largeur
+                if not dans_bande.any():
+                    raise ValueError(f"Bande {bande} nm hors de la grille de longueurs d'onde")
+                poids[k, dans_bande] = 1.0 / dans_bande.sum()
+            self._indices[cle] = (bandes, poids)
+        return self._indices[cle]
+
+    def rho_w_bandes(self, cal_lambda, rrs):
+        """
+        Réflectance rho_w = pi * Rrs moyennée sur chaque bande : dict {longueur d'onde: (N,)}.
+        """
+        bandes, poids = self.indices_bandes(cal_lambda)
+        rho_w = np.pi * np.nan_to_num(rrs, nan=0.0) @ poids.T
+        # Une bande contenant un NaN donne NaN
+        invalide = np.isnan(rrs).astype(float) @ (poids > 0).T > 0
+        rho_w[invalide] = np.nan
+        return dict(zip(bandes, rho_w.T))
+
+    def nechad(self, rho_w, bande):
+        """
+        Algorithme mono-bande de Nechad et al. (2010) pour une bande donnée.
+        Hors du domaine de l'algorithme (rho_w >= C, bande saturée), le SPM vaut NaN.
+        """
+        a, c = self.coefficients[bande]
+        rho_w = np.asarray(rho_w, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            spm = a * rho_w / (1 - rho_w / c)
+        return np.where(rho_w >= c, np.nan, spm)
+
+    def estimer(self, cal_lambda, rrs):
+        """
+        SPM de chaque spectre d'une matrice Rrs (N, L).
+        Retourne {'spm_<bande>' pour chaque bande, 'spm' (bascule rouge -> proche infrarouge,
+        adaptée de Dogliotti et al. 2015 : voir SEUILS_BASCULE), 'poids_nir' (part de la
+        bande proche infrarouge dans spm)}.
+        """
+        rho_w = self.rho_w_bandes(cal_lambda, rrs)
+        resultat = {f"spm_{bande}": self.nechad(rho_w[bande], bande) for bande in rho_w}
+        bandes = sorted(rho_w)
+        rouge, nir = bandes[0], bandes[-1]
+        bas, haut = self.seuils
+        poids_nir = np.clip((rho_w[rouge] - bas) / (haut - bas), 0.0, 1.0)
+        spm_rouge, spm_nir = resultat[f"spm_{rouge}"], resultat[f"spm_{nir}"]
+        # Une bande de poids nul (ex. rouge saturé) ne rend pas le mélange NaN
+        with np.errstate(invalid='ignore'):
+            melange = (1 - poids_nir) * spm_rouge + poids_nir * spm_nir
+        resultat['spm'] = np.where(poids_nir == 0, spm_rouge, np.where(poids_nir == 1, spm_nir, melange))
+        resultat['poids_nir'] = poids_nir
+        return resultat
+
+    def run(self, path_rrs, output_dir, nom_run=None, taille_lot=100000):
+        """
+        Estime le SPM de tous les spectres d'un fichier Rrs (voir RrsCalculator.save_rrs_txt),
+        lu par lots de taille_lot spectres, et écrit output/Rrs/SPM_estimee/{nom_run}.txt
+        avec les métadonnées de chaque spectre (date, IDData Lu/Ed/Lsky).
+        Retourne le nombre de spectres traités.
+        """
+        nom_run = nom_run or f"SPM_{os.path.splitext(os.path.basename(path_rrs))[0]}"
+        os.makedirs(output_dir, exist_ok=True)
+        filepath = os.path.join(output_dir, f"{nom_run}.txt")
+        n_spectres = 0
+        with open(filepath, 'w', encoding='utf-8') as fo:
+            colonnes = None
+            for lot in RrsCalculator.iter_rrs_txt(path_rrs, taille_lot):
+                resultat = self.estimer(lot['lambda'], lot['rrs'])
+                if colonnes is None:
+                    colonnes = list(resultat)
+                    fo.write("datetime\tid_lu\tid_ed\tid_lsky\t" + "\t".join(colonnes) + "\n")
+                valeurs = np.column_stack([resultat[c] for c in colonnes])
+                for k in range(len(valeurs)):
+                    fo.write(f"{lot['datetime'][k]}\t{lot['id_lu'][k]}\t{lot['id_ed'][k]}\t{lot['id_lsky'][k]}\t"
+                             + "\t".join(map(repr, valeurs[k].tolist())) + "\n")
+                n_spectres += len(valeurs)
+        logger.info("SPM : %d spectres estimés, écrits dans %s", n_spectres, filepath)
+        return n_spectres
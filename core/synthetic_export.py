@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+# Capteurs simulés par défaut : {IDDevice: (MethodName, IDDataBack, IDDataCal, temps d'intégration possibles)}
+CAPTEURS_DEFAUT = {
+    'SAM_8467': ('SAMIP_5097', 'DLAB_2023-09-19_11-18-33_395_812', 'DLAB_2023-09-20_07-34-21_040_119',
+                 (8, 16, 32, 64, 4096)),
+    'SAM_85AE': ('SAMIP_50F7', 'DLAB_2023-07-10_10-37-37_480_457', 'DLAB_2023-07-19_15-04-04_108_113',
+                 (128, 256, 512, 4096)),
+}
+
+# Entête d'un bloc, calqué sur export_recife_2024.dat
+MODELE_ENTETE = """[Spectrum]
+Version            = 1
+IDData             = {id_data}
+IDDevice           = {device}
+IDDataType         = SPECTRUM
+IDDataTypeSub1     = RAW
+IDDataTypeSub2     =
+IDDataTypeSub3     =
+DateTime           = {date_time}
+PositionLatitude   = 0
+PositionLongitude  = 0
+Comment            =
+CommentSub1        =
+CommentSub2        =
+CommentSub3        =
+IDMethodType       = SAMIP Control
+MethodName         = {method}
+Mission            = No Mission
+MissionSub         = 1
+RecordType         = 0
+[Attributes]
+CalFactor = 1
+IDBasisSpec =
+IDDataBack = {id_back}
+IDDataCal = {id_cal}
+InclV = {incl_v}
+InclValid = 1
+InclX = {incl_x}
+InclY = {incl_y}
+IntegrationTime = {integtime}
+P31 = -1
+P31e = 0
+PathLength = +INF
+PathLengthCustomOn = 0
+PressValid = 0
+Pressure = +INF
+RAWDynamic = 65535
+Salinity = 0
+Temperature = -NAN
+Unit1 = $05 $00 Pixel
+Unit2 = $03 $05 Intensity counts
+Unit3 = $f0 $05 Error counts
+Unit4 = $f1 $00 Status
+p999 = 433
+[END] of [Attributes]
+[DATA]
+"""
+
+
+class SyntheticExportGenerator:
+    """
+    Générateur d'exports TRIOS (.dat) synthétiques mais réalistes, au format
+    [Spectrum]/[Attributes]/[DATA] de export_recife_2024.dat : entêtes complets,
+    256 lignes (pixel, comptes, erreur, statut), fins de ligne CRLF.
+    Sert aux benchmarks du pipeline (de 1k à 1M spectres).
+    """
+
+    def __init__(self, capteurs=None, proportions=None, seed=0, debut='2024-11-13T12:00:00', pas_s=2):
+        """
+        - capteurs    : dict {IDDevice: (MethodName, IDDataBack, IDDataCal, temps d'intégration)}
+        - proportions : dict {IDDevice: poids} (défaut : équiréparti)
+        - seed        : graine du générateur aléatoire (exports reproductibles)
+        - debut, pas_s : date du premier spectre et pas de temps entre deux spectres
+        """
+        self.capteurs = capteurs or CAPTEURS_DEFAUT
+        noms = list(self.capteurs)
+        poids = np.array([(proportions or {}).get(nom, 1.0) for nom in noms], dtype=float)
+        self.noms = noms
+        self.poids = poids / poids.sum()
+        self.rng = np.random.default_rng(seed)
+        self.debut = np.datetime64(debut, 's')
+        self.pas_s = pas_s
+        pixels = np.arange(256)
+        # Forme spectrale type : signal lissé centré dans le visible
+        self._forme = np.exp(-0.5 * ((pixels - 110) / 55.0) ** 2)
+
+    def _comptes(self, n):
+        """
+        Matrice (n, 256) de comptes bruts : obscurité + signal (le temps d'intégration
+        automatique du SAM vise un pic entre 2000 et 58000 comptes) + bruit.
+        Environ 1 % des spectres sont saturés (65535).
+        """
+        amplitude = self.rng.uniform(2000.0, 58000.0, size=(n, 1))
+        amplitude[self.rng.random(n) < 0.01] = 80000.0
+        signal = 1100.0 + amplitude * self._forme + self.rng.normal(0.0, 8.0, size=(n, 256))
+        return np.clip(np.rint(signal), 0, 65535).astype(np.int64)
+
+    def iter_blocs(self, n_spectres, taille_lot=1000):
+        """
+        Produit le texte de l'export par morceaux de taille_lot spectres.
+        """
+        index = 0
+        while index < n_spectres:
+            n = min(taille_lot, n_spectres - index)
+            devices = self.rng.choice(len(self.noms), size=n, p=self.poids)
+            integtimes = np.array([self.rng.choice(self.capteurs[self.noms[d]][3]) for d in devices])
+            comptes = self._comptes(n)
+            comptes[:, 0] = self.rng.integers(1, 12, size=n)
+            incl = self.rng.normal(0.0, 2.0, size=(n, 2)).round(2)
+            morceaux = []
+            for k in range(n):
+                device = self.noms[devices[k]]
+                method, id_back, id_cal, _ = self.capteurs[device]
+                dt = self.debut + np.timedelta64((index + k) * self.pas_s, 's')
+                date_time = str(dt).replace('T', ' ')
+                entete = MODELE_ENTETE.format(
+                    id_data=f"622f_{date_time.replace(' ', '_').replace(':', '-')}_582_{index + k}",
+                    device=device, date_time=date_time, method=method, id_back=id_back, id_cal=id_cal,
+                    incl_v=float(np.hypot(*incl[k])), incl_x=incl[k, 0], incl_y=incl[k, 1],
+                    integtime=integtimes[k],
+                )
+                data = '\n'.join(f" {p} {c} 0 0" for p, c in enumerate(comptes[k].tolist()))
+                morceaux.append(f"{entete}{data}\n[END] of [DATA]\n[END] of Spectrum\n\n")
+            yield ''.join(morceaux).replace('\n', '\r\n')
+            index += n
+
+    def generer(self, path_data, n_spectres, taille_lot=1000):
+        """
+        Écrit un export synthétique de n_spectres spectres dans path_data.
+        Retourne la taille du fichier en octets.
+        """
+        taille = 0
+        with open(path_data, 'w', encoding='latin-1', newline='') as fo:
+            for texte in self.iter_blocs(n_spectres, taille_lot):
+                fo.write(texte)
+                taille += len(texte)
+        return taille
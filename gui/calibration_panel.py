@@ -6,9 +6,13 @@ Created on Wed May 21 16:32:25 2025
 @author: mdlemineahmedou
 """
 
+import queue
 import tkinter as tk
 from tkinter import filedialog, ttk
-from core.calibration_manager import CalibrationManager
+from gui.calibration_worker import CalibrationWorker
+
+INTERVALLE_FILE_MS = 100  # Période de vidage de la file de messages du worker
+MESSAGES_PAR_VIDAGE = 500  # Nombre max de messages traités par vidage
 
 class CalibrationPanel(tk.Frame):
     def __init__(self, master, logs_panel):
@@ -25,6 +29,8 @@ class CalibrationPanel(tk.Frame):
         self.calib_dir = tk.StringVar()
         self.output_dir = tk.StringVar()
         self.interpolation_mode = tk.StringVar(value="UV_Vis")
+        self.progression_texte = tk.StringVar(value="")
+        self.worker = None  # CalibrationWorker du run en cours
 
         # Widgets
         tk.Label(self, text="Fichier .dat à traiter:").grid(row=0, column=0, sticky="e")
@@ -44,14 +50,21 @@ class CalibrationPanel(tk.Frame):
         mode_menu.grid(row=3, column=1, sticky="w")
         mode_menu.bind("<<ComboboxSelected>>", self.update_mode)
 
-        tk.Button(self, text="Lancer la calibration", command=self.on_run_calibration).grid(row=4, column=1, pady=10)
+        self.run_button = tk.Button(self, text="Lancer la calibration", command=self.on_run_calibration)
+        self.run_button.grid(row=4, column=1, pady=10)
         tk.Button(self, text="Réinitialiser", command=self.reset_fields).grid(row=4, column=2)
+        self.cancel_button = tk.Button(self, text="Annuler", command=self.on_cancel_calibration, state='disabled')
+        self.cancel_button.grid(row=4, column=0)
+
+        self.progress_bar = ttk.Progressbar(self, orient='horizontal', mode='determinate', maximum=100)
+        self.progress_bar.grid(row=5, column=0, columnspan=3, sticky="ew")
+        tk.Label(self, textvariable=self.progression_texte).grid(row=6, column=0, columnspan=3, sticky="w")
 
     def choose_dat_file(self):
         """
         Ouvre une boîte de dialogue pour choisir le fichier .dat brut à calibrer.
         """
-        path = filedialog.askopenfilename(title="Choisir fichier .dat", filetypes=[("DAT files", "*.dat")])
+        path = filedialog.askopenfilename(title="Choisir fichier .dat", filetypes=[("DAT files", "*.dat *.dat.gz *.dat.zst")])
         if path:
             self.dat_path.set(path)
             self.logs_panel.log(f"Fichier .dat sélectionné : {path}")
@@ -83,19 +96,79 @@ class CalibrationPanel(tk.Frame):
 
     def on_run_calibration(self):
         """
-        Lance le pipeline de calibration et affiche la progression dans les logs.
-        """
-        try:
-            self.logs_panel.log("Début de la calibration...")
-            manager = CalibrationManager(path_calib_dir=self.calib_dir.get())
-            manager.run_full_calibration_pipeline(
-                path_data=self.dat_path.get(),
-                output_dir=self.output_dir.get(),
-                interpolation_mode=self.interpolation_mode.get()
-            )
-            self.logs_panel.log("Calibration terminée avec succès.")
-        except Exception as e:
-            self.logs_panel.log(f"Erreur lors de la calibration : {e}")
+        Lance le pipeline de calibration dans un thread (CalibrationWorker) : la
+        fenêtre reste réactive, la progression et les logs arrivent par une file.
+        """
+        if self.worker is not None and self.worker.is_alive():
+            return
+        self.logs_panel.log("Début de la calibration...")
+        self.worker = CalibrationWorker(
+            path_data=self.dat_path.get(),
+            path_calib_dir=self.calib_dir.get(),
+            output_dir=self.output_dir.get(),
+            interpolation_mode=self.interpolation_mode.get()
+        )
+        self.progress_bar['value'] = 0
+        self.progression_texte.set("Chargement...")
+        self.run_button.config(state='disabled')
+        self.cancel_button.config(state='normal')
+        self.worker.start()
+        self.after(INTERVALLE_FILE_MS, self.drain_worker_queue)
+
+    def on_cancel_calibration(self):
+        """
+        Demande l'arrêt du run en cours (effectif après le lot en cours).
+        """
+        if self.worker is not None and self.worker.is_alive():
+            self.worker.annuler()
+            self.cancel_button.config(state='disabled')
+            self.logs_panel.log("Annulation demandée...")
+
+    def drain_worker_queue(self):
+        """
+        Traite par paquets les messages du worker, puis se reprogramme tant que le run n'est pas fini.
+        """
+        termine = False
+        progression = None
+        for _ in range(MESSAGES_PAR_VIDAGE):
+            try:
+                type_message, contenu = self.worker.file_messages.get_nowait()
+            except queue.Empty:
+                break
+            if type_message == 'log':
+                self.logs_panel.log(contenu)
+            elif type_message == 'progression':
+                progression = contenu  # Seule la dernière progression est affichée
+            elif type_message == 'fin':
+                n_spectres, instrumentation = contenu
+                if self.worker.stop_event.is_set():
+                    self.logs_panel.log(f"Calibration annulée après {n_spectres} spectres.")
+                else:
+                    self.logs_panel.log("Calibration terminée avec succès.")
+                self.logs_panel.log_rapport(instrumentation)
+                termine = True
+            elif type_message == 'erreur':
+                self.logs_panel.log(f"Erreur lors de la calibration : {contenu}")
+                termine = True
+        if progression is not None:
+            self.update_progress(progression)
+        if termine:
+            self.run_button.config(state='normal')
+            self.cancel_button.config(state='disabled')
+        else:
+            self.after(INTERVALLE_FILE_MS, self.drain_worker_queue)
+
+    def update_progress(self, stats):
+        """
+        Met à jour la barre de progression (fraction du fichier lue), le débit et le temps restant estimé.
+        """
+        fraction = stats['offset'] / stats['taille'] if stats['taille'] else 1.0
+        vitesse = stats['n_spectres'] / stats['duree'] if stats['duree'] > 0 else 0.0
+        restant = stats['duree'] * (1 - fraction) / fraction if fraction > 0 else 0.0
+        self.progress_bar['value'] = 100 * fraction
+        self.progression_texte.set(
+            f"{stats['n_spectres']} spectres - {vitesse:.0f} spectres/s - "
+            f"reste {int(restant) // 60:02d}:{int(restant) % 60:02d}")
 
     def reset_fields(self):
         """
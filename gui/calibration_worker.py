@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exécution du pipeline de calibration hors du thread Tk.
+"""
+
+import queue
+import logging
+import threading
+
+
+class QueueLogHandler(logging.Handler):
+    """
+    Handler logging qui dépose les messages dans une file ('log', message),
+    vidée ensuite par le thread Tk.
+    """
+    def __init__(self, file_messages, level=logging.INFO):
+        super().__init__(level)
+        self.file_messages = file_messages
+        self.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+
+    def emit(self, record):
+        try:
+            self.file_messages.put(('log', self.format(record)))
+        except Exception:
+            self.handleError(record)
+
+
+class CalibrationWorker(threading.Thread):
+    """
+    Thread qui exécute CalibrationManager.run_full_calibration_pipeline et
+    communique avec l'interface uniquement par une file de messages :
+    - ('log', message)              : ligne de log
+    - ('progression', stats)        : {n_spectres, offset, taille, duree} après chaque lot
+    - ('fin', (n, instrumentation)) : run terminé (ou annulé)
+    - ('erreur', message)           : exception levée par le pipeline
+    NumPy/SciPy ne sont importés qu'au lancement du premier run.
+    """
+
+    def __init__(self, path_data, path_calib_dir, output_dir, interpolation_mode='UV_Vis'):
+        super().__init__(daemon=True)
+        self.path_data = path_data
+        self.path_calib_dir = path_calib_dir
+        self.output_dir = output_dir
+        self.interpolation_mode = interpolation_mode
+        self.file_messages = queue.Queue()
+        self.stop_event = threading.Event()
+
+    def annuler(self):
+        """
+        Demande l'arrêt du run après le lot en cours.
+        """
+        self.stop_event.set()
+
+    def run(self):
+        logger_core = logging.getLogger('core')
+        handler = QueueLogHandler(self.file_messages)
+        logger_core.addHandler(handler)
+        niveau_precedent = logger_core.level
+        logger_core.setLevel(logging.INFO)
+        try:
+            from core.calibration_manager import CalibrationManager  # import différé (NumPy, SciPy)
+            manager = CalibrationManager(path_calib_dir=self.path_calib_dir)
+            n_spectres = manager.run_full_calibration_pipeline(
+                path_data=self.path_data,
+                output_dir=self.output_dir,
+                interpolation_mode=self.interpolation_mode,
+                stop_event=self.stop_event,
+                callback=lambda stats: self.file_messages.put(('progression', stats))
+            )
+            self.file_messages.put(('fin', (n_spectres, manager.instrumentation)))
+        except Exception as e:
+            self.file_messages.put(('erreur', f"{type(e).__name__}: {e}"))
+        finally:
+            logger_core.removeHandler(handler)
+            logger_core.setLevel(niveau_precedent)
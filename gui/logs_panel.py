@@ -7,33 +7,68 @@ Created on Wed May 21 16:44:53 2025
 """
 
 import tkinter as tk
+from collections import deque
 from tkinter.scrolledtext import ScrolledText
 
+MAX_LIGNES = 5000  # Taille du tampon circulaire de la zone de logs
+INTERVALLE_AFFICHAGE_MS = 100  # Période d'affichage des messages en attente
+
+
 class LogsPanel(tk.Frame):
-    def __init__(self, master):
+    def __init__(self, master, max_lignes=MAX_LIGNES):
         """
         Initialise une zone de texte scrollable pour afficher les logs utilisateur.
         - master : fenêtre ou frame parente.
+        - max_lignes : nombre de lignes conservées (les plus anciennes sont supprimées)
         """
         super().__init__(master)
+        self.max_lignes = max_lignes
+        self.en_attente = deque(maxlen=max_lignes)  # Messages pas encore affichés
 
         self.text_area = ScrolledText(self, width=80, height=15, state='disabled', wrap='word')
         self.text_area.pack(expand=True, fill='both')
+        self.after(INTERVALLE_AFFICHAGE_MS, self.afficher_en_attente)
 
     def log(self, message):
         """
-        Affiche un message dans la zone de logs.
+        Ajoute un message à la zone de logs. L'affichage est fait par paquets
+        (afficher_en_attente) : log peut être appelé très souvent sans ralentir l'interface.
         - message : texte à afficher
         """
-        self.text_area.config(state='normal')
-        self.text_area.insert(tk.END, message + '\n')
-        self.text_area.config(state='disabled')
-        self.text_area.see(tk.END)
+        self.en_attente.append(message)
+
+    def afficher_en_attente(self):
+        """
+        Affiche en une fois les messages en attente, puis supprime les lignes
+        au-delà de max_lignes. Se reprogramme avec after().
+        """
+        if self.en_attente:
+            messages = []
+            while self.en_attente:
+                messages.append(self.en_attente.popleft())
+            self.text_area.config(state='normal')
+            self.text_area.insert(tk.END, '\n'.join(messages) + '\n')
+            n_lignes = int(self.text_area.index('end-1c').split('.')[0]) - 1
+            if n_lignes > self.max_lignes:
+                self.text_area.delete('1.0', f"{n_lignes - self.max_lignes + 1}.0")
+            self.text_area.config(state='disabled')
+            self.text_area.see(tk.END)
+        self.after(INTERVALLE_AFFICHAGE_MS, self.afficher_en_attente)
+
+    def log_rapport(self, instrumentation):
+        """
+        Affiche le rapport de chronométrage par étape d'un run.
+        - instrumentation : objet Instrumentation du CalibrationManager
+        """
+        lignes = instrumentation.lignes_rapport()
+        if lignes:
+            self.log("Durées par étape :\n" + "\n".join(lignes))
 
     def clear(self):
         """
         Efface tous les logs de la zone de texte.
         """
+        self.en_attente.clear()
         self.text_area.config(state='normal')
         self.text_area.delete('1.0', tk.END)
         self.text_area.config(state='disabled')
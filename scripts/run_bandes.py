@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulation des bandes satellites (Sentinel-2 MSI, Sentinel-3 OLCI, Landsat OLI...)
+à partir d'un fichier Rrs (voir scripts/run_rrs.py) ou des spectres calibrés
+indexés d'un dossier de sortie (txt, NetCDF ou store).
+
+Les réponses spectrales sont lues dans data/srf/ : une table par mission
+(ex. S2A_MSI.csv), longueur d'onde puis une colonne par bande.
+
+Exemples :
+    python scripts/run_bandes.py output/Rrs/Rrs.txt --missions S2A_MSI S3A_OLCI
+    python scripts/run_bandes.py output/calibrated --capteur SAM_8467
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# === Importer tes classes maison ===
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.bandes_satellite import SimulateurBandes
+from core.rrs import RrsCalculator
+from core.data_manager import DataManager
+
+# Toujours commencer par trouver la racine du projet par rapport à ce script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valeurs équivalentes aux bandes satellites")
+    parser.add_argument('source', help="Fichier Rrs (.txt) ou dossier de sortie calibré indexé")
+    parser.add_argument('--srf-dir', default=os.path.join(project_root, 'data', 'srf'),
+                        help="Dossier des tables de réponse spectrale (une par mission)")
+    parser.add_argument('--missions', nargs='+', default=None,
+                        help="Missions à simuler (défaut : toutes les tables de --srf-dir)")
+    parser.add_argument('--output-dir', default=os.path.join(project_root, 'output', 'bandes'),
+                        help="Dossier de sortie")
+    parser.add_argument('--capteur', default=None, help="Spectres calibrés : capteur à convoluer (défaut : tous)")
+    parser.add_argument('--debut', default=None, help="Spectres calibrés : début de la fenêtre (ISO 8601)")
+    parser.add_argument('--fin', default=None, help="Spectres calibrés : fin de la fenêtre (ISO 8601)")
+    parser.add_argument('--taille-lot', type=int, default=100000, help="Spectres Rrs traités par lot")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+    simulateur = SimulateurBandes(args.srf_dir)
+    missions = args.missions or simulateur.missions()
+    if not missions:
+        parser.error(f"Aucune table SRF dans {args.srf_dir}")
+
+    if os.path.isfile(args.source):
+        lots = RrsCalculator.iter_rrs_txt(args.source, args.taille_lot)
+        nom_run = os.path.splitext(os.path.basename(args.source))[0]
+    else:
+        lots = [DataManager.query_spectres(args.source, args.capteur, args.debut, args.fin)]
+        nom_run = args.capteur.upper() if args.capteur else 'calibre'
+    simulateur.run(lots, missions, args.output_dir, nom_run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
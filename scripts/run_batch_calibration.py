@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Calibration en parallèle de plusieurs exports TRIOS (.dat).
+
+Exemples :
+    python scripts/run_batch_calibration.py data/raw/
+    python scripts/run_batch_calibration.py "data/raw/**/*.dat" --workers 8 --format netcdf
+    python scripts/run_batch_calibration.py archives/campagne_2023.zip archives/export.dat.zst
+"""
+
+import os
+import sys
+import json
+import logging
+import contextlib
+import argparse
+
+# === Importer tes classes maison ===
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.calibration_manager import CalibrationManager, N_CALCUL
+from core.qc import ControleQualite
+from core.processing_manager import ProcessingManager
+from core.aggregation import AgregateurTemporel, STATISTIQUES_DEFAUT
+from core.instrumentation import profiler
+
+# Toujours commencer par trouver la racine du projet par rapport à ce script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibration multi-fichiers des exports TRIOS")
+    parser.add_argument('sources', nargs='+', help="Fichiers .dat (ou .dat.gz, .dat.zst, archives .zip de .dat), dossiers ou motifs glob")
+    parser.add_argument('--calib-dir', nargs='+', default=[os.path.join(project_root, 'data', 'calibration')],
+                        help="Dossiers calibration (Cal_*, Back_*, *.ini), ou dossiers de jeux datés "
+                             "(ex. ALL_2023, ALL_2024) : la calibration valable à la date de chaque spectre est utilisée")
+    parser.add_argument('--output-dir', default=None,
+                        help="Dossier de sortie (défaut : output/calibrated, output/netcdf ou output/store)")
+    parser.add_argument('--mode', default='UV_Vis', choices=['UV_Vis', 'UV'], help="Mode d'interpolation")
+    parser.add_argument('--workers', type=int, default=None, help="Nombre de processus (défaut : nombre de cœurs)")
+    parser.add_argument('--format', default='txt', choices=['txt', 'netcdf', 'store'],
+                        help="Format d'export")
+    parser.add_argument('--par-capteur', action='store_true', help="NetCDF : un fichier par capteur")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Ne traiter que les spectres ajoutés depuis le dernier run (manifeste)")
+    parser.add_argument('--resume', default=None, help="Chemin du résumé JSON du run (avec les durées par étape)")
+    parser.add_argument('--profil', default=None,
+                        help="Profil cProfile du run (fichier .prof ; utiliser --workers 1 pour tout profiler)")
+    parser.add_argument('--decouper', action='store_true',
+                        help="Découper chaque fichier en plages d'octets réparties sur tous les processus "
+                             "(un seul très gros fichier)")
+    parser.add_argument('--threads-calcul', type=int, default=N_CALCUL,
+                        help="Threads de calibration par fichier (lecture, calcul et export se recouvrent)")
+    parser.add_argument('--threads-export', type=int, default=None,
+                        help="Threads d'écriture des fichiers .txt (défaut : 4)")
+    parser.add_argument('--qc', default='signaler', choices=['signaler', 'rejeter'],
+                        help="Contrôle qualité : drapeaux exportés seulement, ou rejet des spectres signalés")
+    parser.add_argument('--inclinaison-max', type=float, default=5.0, help="Inclinaison max (degrés) du contrôle qualité")
+    parser.add_argument('--filtres', default=None,
+                        help="Chaîne de filtres après interpolation, ex. 'pics,lissage:fenetre=15,normalisation' "
+                             "(lissage, derivee, ligne_de_base, normalisation, pics)")
+    parser.add_argument('--agregation', type=int, default=None,
+                        help="Exporter des statistiques par capteur et par intervalle de SECONDES au lieu des spectres")
+    parser.add_argument('--rafale', type=float, default=None,
+                        help="Agréger par rafale : spectres consécutifs séparés de moins de SECONDES")
+    parser.add_argument('--statistiques', nargs='+', default=list(STATISTIQUES_DEFAUT),
+                        help="Statistiques agrégées (moyenne, ecart_type, mediane, min, max, n, pNN)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Affiche aussi les messages DEBUG")
+    args = parser.parse_args()
+    if args.incremental and (args.agregation or args.rafale):
+        parser.error("--agregation et --rafale ne sont pas disponibles avec --incremental")
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='[%(levelname)s] %(message)s')
+
+    output_dir = args.output_dir
+    if output_dir is None:
+        sous_dossier = {'netcdf': 'netcdf', 'store': 'store'}.get(args.format, 'calibrated')
+        output_dir = os.path.join(project_root, 'output', sous_dossier)
+    options_export = {'par_capteur': True} if args.par_capteur else {}
+    if not args.incremental and not args.decouper:
+        options_export['n_calcul'] = args.threads_calcul
+    if args.format == 'txt' and args.threads_export:
+        options_export['n_threads'] = args.threads_export
+    if args.agregation or args.rafale:
+        options_export['agregation'] = AgregateurTemporel(pas_s=args.agregation, rafale_s=args.rafale,
+                                                          statistiques=args.statistiques)
+
+    qc = ControleQualite(action=args.qc, seuil_inclinaison=args.inclinaison_max)
+    traitement = ProcessingManager.depuis_texte(args.filtres) if args.filtres else None
+    calibration_manager = CalibrationManager(path_calib_dir=args.calib_dir, qc=qc, traitement=traitement)
+    with profiler(args.profil) if args.profil else contextlib.nullcontext():
+        resume = calibration_manager.run_multi_files(
+            args.sources,
+            output_dir=output_dir,
+            interpolation_mode=args.mode,
+            max_workers=args.workers,
+            format_export=args.format,
+            incremental=args.incremental,
+            decouper=args.decouper,
+            **options_export
+        )
+
+    for r in resume['fichiers']:
+        statut = 'OK' if r['erreur'] is None else f"ÉCHEC ({r['erreur']})"
+        print(f"  {r['fichier']} : {r['n_spectres']} spectres en {r['duree']:.2f} s - {statut}")
+    for ligne in calibration_manager.instrumentation.lignes_rapport():
+        print(f"  {ligne}")
+
+    if args.resume:
+        with open(args.resume, 'w', encoding='utf-8') as fo:
+            json.dump(resume, fo, indent=2, ensure_ascii=False)
+        print(f"[INFO] Résumé écrit dans {args.resume}")
+
+    return 1 if resume['n_echecs'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
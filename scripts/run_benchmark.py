@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark du pipeline de calibration sur des exports TRIOS synthétiques.
+
+Pour chaque taille demandée, génère un export (voir core/synthetic_export.py),
+puis mesure la durée et le pic mémoire de chaque étape : génération, parse
+historique et parse en tableaux, chargement des calibrations ALL_2023, et
+pipeline complet (avec le détail par étape de l'instrumentation).
+Le résultat est écrit en JSON ; s'il est comparé à un benchmark de référence,
+le script sort en erreur (code 1) quand une mesure dépasse le seuil de régression
+(les durées de quelques millisecondes, trop bruitées, sont ignorées : voir --plancher).
+
+Exemples :
+    python scripts/run_benchmark.py --tailles 1000 10000 --sortie bench.json
+    python scripts/run_benchmark.py --tailles 1000000 --capteurs SAM_8467=3 SAM_85AE=1 --max-legacy 0
+    python scripts/run_benchmark.py --baseline bench_ref.json --seuil 0.2
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import resource
+import argparse
+import tempfile
+import tracemalloc
+
+# === Importer tes classes maison ===
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+from core.synthetic_export import SyntheticExportGenerator, CAPTEURS_DEFAUT
+from core.calibration_manager import CalibrationManager, N_CALCUL
+from core.data_manager import DataManager
+
+# Toujours commencer par trouver la racine du projet par rapport à ce script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PLANCHER_S = 0.05  # Écart de durée (s) en dessous duquel une mesure n'est pas une régression
+
+
+def mesurer(fonction, n_spectres, memoire=True):
+    """
+    Exécute fonction() et retourne (résultat, mesure) avec mesure =
+    {duree_s, spectres_par_seconde, pic_memoire_mo}. Le pic mémoire (tracemalloc)
+    ralentit l'exécution : la durée est alors celle d'un second appel, sans traçage.
+    """
+    gc.collect()
+    mesure = {}
+    if memoire:
+        tracemalloc.start()
+        fonction()
+        mesure['pic_memoire_mo'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+        gc.collect()
+    t0 = time.perf_counter()
+    resultat = fonction()
+    duree = time.perf_counter() - t0
+    mesure['duree_s'] = duree
+    mesure['spectres_par_seconde'] = n_spectres / duree if duree > 0 else 0.0
+    return resultat, mesure
+
+
+def benchmark_taille(n_spectres, args, workdir):
+    """
+    Mesures de toutes les étapes pour un export synthétique de n_spectres spectres.
+    """
+    mesures = {}
+    path_data = os.path.join(workdir, f"synthetique_{n_spectres}.dat")
+    generateur = SyntheticExportGenerator(proportions=args.proportions, seed=args.seed)
+    _, mesures['generation'] = mesurer(lambda: generateur.generer(path_data, n_spectres), n_spectres, memoire=False)
+    mesures['generation']['taille_mo'] = os.path.getsize(path_data) / 2 ** 20
+    logging.info("Export synthétique de %d spectres : %.1f Mo", n_spectres, mesures['generation']['taille_mo'])
+
+    if n_spectres <= args.max_legacy:
+        _, mesures['parse_legacy'] = mesurer(lambda: DataManager.parse_dat_file(path_data), n_spectres, args.memoire)
+    _, mesures['parse_arrays'] = mesurer(lambda: DataManager.parse_dat_arrays(path_data), n_spectres, args.memoire)
+
+    noms = sorted(args.proportions or CAPTEURS_DEFAUT)
+    _, mesures['chargement_calibration'] = mesurer(
+        lambda: CalibrationManager(args.calib_dir, use_cache=False).preload_calibrations(noms), 0, memoire=False)
+
+    output_dir = os.path.join(workdir, f"sortie_{n_spectres}")
+    managers = []
+
+    def pipeline():
+        shutil.rmtree(output_dir, ignore_errors=True)
+        manager = CalibrationManager(args.calib_dir)
+        managers.append(manager)
+        return manager.run_full_calibration_pipeline(path_data, output_dir, args.mode, taille_lot=args.taille_lot,
+                                                     format_export=args.format, n_calcul=args.threads_calcul)
+
+    _, mesures['pipeline'] = mesurer(pipeline, n_spectres, args.memoire)
+    # Détail par étape du dernier run (celui qui n'est pas tracé)
+    for etape, r in managers[-1].instrumentation.rapport().items():
+        mesures[f"pipeline.{etape}"] = {'duree_s': r['total_s'], 'spectres_par_seconde': r['spectres_par_seconde'],
+                                        'p99_s': r['p99_s']}
+    shutil.rmtree(output_dir, ignore_errors=True)
+    if not args.garder:
+        os.remove(path_data)
+    return mesures
+
+
+def comparer(resultats, reference, seuil, plancher=PLANCHER_S):
+    """
+    Compare les durées et pics mémoire aux mêmes mesures du benchmark de référence.
+    Retourne la liste des régressions (ratio nouveau / référence > 1 + seuil).
+    Les durées de référence inférieures à plancher secondes, ou qui augmentent de
+    moins de plancher secondes, ne comptent pas comme régressions (bruit de mesure
+    des étapes de quelques millisecondes) ; leur ratio reste enregistré.
+    """
+    regressions = []
+    for taille, mesures in resultats.items():
+        for nom, mesure in mesures.items():
+            ref = reference.get('resultats', {}).get(taille, {}).get(nom)
+            if ref is None:
+                continue
+            for cle in ('duree_s', 'pic_memoire_mo'):
+                if cle not in mesure or not ref.get(cle):
+                    continue
+                ratio = mesure[cle] / ref[cle]
+                mesure[f"ratio_{cle}"] = ratio
+                if cle == 'duree_s' and (ref[cle] < plancher or mesure[cle] - ref[cle] < plancher):
+                    continue
+                if ratio > 1 + seuil:
+                    regressions.append({'taille': taille, 'mesure': nom, 'grandeur': cle,
+                                        'reference': ref[cle], 'nouveau': mesure[cle], 'ratio': ratio})
+    return regressions
+
+
+def lire_proportions(valeurs):
+    """
+    Convertit ['SAM_8467=3', 'SAM_85AE=1'] en {'SAM_8467': 3.0, 'SAM_85AE': 1.0}.
+    """
+    proportions = {}
+    for valeur in valeurs or []:
+        nom, _, poids = valeur.partition('=')
+        if nom not in CAPTEURS_DEFAUT:
+            raise ValueError(f"Capteur non simulé : {nom} (disponibles : {', '.join(CAPTEURS_DEFAUT)})")
+        proportions[nom] = float(poids or 1.0)
+    return proportions or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline de calibration TRIOS")
+    parser.add_argument('--tailles', type=int, nargs='+', default=[1000, 10000],
+                        help="Nombres de spectres des exports synthétiques (ex. 1000 100000 1000000)")
+    parser.add_argument('--capteurs', nargs='*', default=None,
+                        help="Mélange de capteurs NOM=poids (défaut : capteurs simulés équirépartis)")
+    parser.add_argument('--seed', type=int, default=0, help="Graine du générateur synthétique")
+    parser.add_argument('--calib-dir', default=os.path.join(project_root, 'data', 'calibration', 'ALL_2023'),
+                        help="Dossier calibration (Cal_*, Back_*, *.ini)")
+    parser.add_argument('--mode', default='UV_Vis', choices=['UV_Vis', 'UV'], help="Mode d'interpolation")
+    parser.add_argument('--format', default='netcdf', choices=['txt', 'netcdf', 'store'],
+                        help="Format d'export du pipeline")
+    parser.add_argument('--taille-lot', type=int, default=1024, help="Spectres par lot du pipeline")
+    parser.add_argument('--threads-calcul', type=int, default=N_CALCUL, help="Threads de calibration du pipeline")
+    parser.add_argument('--max-legacy', type=int, default=100000,
+                        help="Taille max pour mesurer le parse historique (lent)")
+    parser.add_argument('--sans-memoire', dest='memoire', action='store_false',
+                        help="Ne pas mesurer les pics mémoire (tracemalloc)")
+    parser.add_argument('--workdir', default=None, help="Dossier des exports générés (défaut : temporaire)")
+    parser.add_argument('--garder', action='store_true', help="Conserver les exports générés")
+    parser.add_argument('--sortie', default=os.path.join(project_root, 'output', 'benchmark.json'),
+                        help="Résultats JSON")
+    parser.add_argument('--baseline', default=None, help="Résultats JSON de référence à comparer")
+    parser.add_argument('--seuil', type=float, default=0.2,
+                        help="Régression si une mesure dépasse la référence de plus de ce ratio (0.2 = +20 %%)")
+    parser.add_argument('--plancher', type=float, default=PLANCHER_S,
+                        help="Durées ignorées par la comparaison si la référence ou l'écart est sous ce "
+                             "nombre de secondes")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+    args.proportions = lire_proportions(args.capteurs)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_trios_')
+    os.makedirs(workdir, exist_ok=True)
+    resultats = {}
+    try:
+        for n_spectres in args.tailles:
+            resultats[str(n_spectres)] = benchmark_taille(n_spectres, args, workdir)
+    finally:
+        if args.workdir is None and not args.garder:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    bench = {
+        'environnement': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'plateforme': platform.platform(),
+            'processeurs': os.cpu_count(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'parametres': {'capteurs': args.proportions, 'seed': args.seed, 'mode': args.mode,
+                       'format': args.format, 'taille_lot': args.taille_lot,
+                       'threads_calcul': args.threads_calcul},
+        'rss_max_mo': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'resultats': resultats,
+    }
+
+    for taille, mesures in resultats.items():
+        print(f"  {taille} spectres :")
+        for nom, m in mesures.items():
+            memoire = f"  pic {m['pic_memoire_mo']:8.1f} Mo" if 'pic_memoire_mo' in m else ''
+            print(f"    {nom:<28} {m['duree_s']:9.3f} s  {m['spectres_par_seconde']:12.0f} spectres/s{memoire}")
+
+    code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as fi:
+            reference = json.load(fi)
+        regressions = comparer(resultats, reference, args.seuil, args.plancher)
+        bench['baseline'] = {'fichier': args.baseline, 'seuil': args.seuil, 'plancher_s': args.plancher,
+                             'regressions': regressions}
+        for r in regressions:
+            print(f"[REGRESSION] {r['taille']} spectres, {r['mesure']} ({r['grandeur']}) : "
+                  f"{r['reference']:.3f} -> {r['nouveau']:.3f} (x{r['ratio']:.2f})")
+        code = 1 if regressions else 0
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.sortie)), exist_ok=True)
+    with open(args.sortie, 'w', encoding='utf-8') as fo:
+        json.dump(bench, fo, indent=2, ensure_ascii=False)
+    print(f"[INFO] Résultats écrits dans {args.sortie}")
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,11 +8,15 @@ Created on Tue May 20 11:25:31 2025
 
 import os
 import sys
+import logging
 
 # === Importer tes classes maison ===
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from core.calibration_manager import CalibrationManager
 
+# Messages [INFO] du pipeline sur la console (les détails par spectre restent en DEBUG)
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
 # Toujours commencer par trouver la racine du projet par rapport à ce script
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
@@ -32,7 +36,9 @@ calibration_manager = CalibrationManager(path_calib_dir=path_calib_dir)
 calibration_manager.run_full_calibration_pipeline(
     path_data=path_data,
     output_dir=output_dir,
-    interpolation_mode='UV'  # ou 'UV_Vis' selon besoin
+    interpolation_mode='UV',  # ou 'UV_Vis' selon besoin
+    format_export='txt'       # ou 'netcdf' : un seul fichier .nc par run (output/netcdf/)
 )
 
-print(f"[INFO] Pipeline terminé : spectres calibrés et exportés dans {output_dir}")
+for ligne in calibration_manager.instrumentation.lignes_rapport():
+    print(ligne)
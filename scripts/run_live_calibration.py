@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Calibration en direct d'un export TRIOS (.dat) pendant l'acquisition.
+Le fichier est suivi comme avec tail -f : chaque spectre complet est calibré
+et exporté immédiatement. Ctrl+C pour arrêter.
+
+Exemple :
+    python scripts/run_live_calibration.py data/raw/export_en_cours.dat --format netcdf
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# === Importer tes classes maison ===
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.calibration_manager import CalibrationManager
+from core.qc import ControleQualite
+from core.processing_manager import ProcessingManager
+
+# Toujours commencer par trouver la racine du projet par rapport à ce script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibration en direct d'un export TRIOS en cours d'écriture")
+    parser.add_argument('path_data', help="Fichier .dat suivi")
+    parser.add_argument('--calib-dir', nargs='+', default=[os.path.join(project_root, 'data', 'calibration')],
+                        help="Dossiers calibration (Cal_*, Back_*, *.ini), ou dossiers de jeux datés "
+                             "(ex. ALL_2023, ALL_2024) : la calibration valable à la date de chaque spectre est utilisée")
+    parser.add_argument('--output-dir', default=None,
+                        help="Dossier de sortie (défaut : output/calibrated, output/netcdf ou output/store)")
+    parser.add_argument('--mode', default='UV_Vis', choices=['UV_Vis', 'UV'], help="Mode d'interpolation")
+    parser.add_argument('--format', default='txt', choices=['txt', 'netcdf', 'store'],
+                        help="Format d'export")
+    parser.add_argument('--intervalle', type=float, default=0.2, help="Période de scrutation du fichier (s)")
+    parser.add_argument('--depuis-fin', action='store_true',
+                        help="Ignorer les spectres déjà présents et ne traiter que les nouveaux")
+    parser.add_argument('--inactivite-max', type=float, default=None,
+                        help="Arrêt après ce nombre de secondes sans nouvelle donnée")
+    parser.add_argument('--qc', default='signaler', choices=['signaler', 'rejeter'],
+                        help="Contrôle qualité : drapeaux exportés seulement, ou rejet des spectres signalés")
+    parser.add_argument('--inclinaison-max', type=float, default=5.0, help="Inclinaison max (degrés) du contrôle qualité")
+    parser.add_argument('--filtres', default=None,
+                        help="Chaîne de filtres après interpolation, ex. 'pics,lissage:fenetre=15,normalisation' "
+                             "(lissage, derivee, ligne_de_base, normalisation, pics)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Affiche aussi les messages DEBUG")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='[%(levelname)s] %(message)s')
+
+    output_dir = args.output_dir
+    if output_dir is None:
+        sous_dossier = {'netcdf': 'netcdf', 'store': 'store'}.get(args.format, 'calibrated')
+        output_dir = os.path.join(project_root, 'output', sous_dossier)
+    offset = os.path.getsize(args.path_data) if args.depuis_fin else 0
+
+    qc = ControleQualite(action=args.qc, seuil_inclinaison=args.inclinaison_max)
+    traitement = ProcessingManager.depuis_texte(args.filtres) if args.filtres else None
+    calibration_manager = CalibrationManager(path_calib_dir=args.calib_dir, qc=qc, traitement=traitement)
+    calibration_manager.preload_calibrations()
+    try:
+        calibration_manager.run_follow_pipeline(
+            args.path_data,
+            output_dir=output_dir,
+            interpolation_mode=args.mode,
+            format_export=args.format,
+            intervalle=args.intervalle,
+            offset=offset,
+            inactivite_max=args.inactivite_max
+        )
+    except KeyboardInterrupt:
+        print("[INFO] Suivi interrompu.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Quicklooks PNG des spectres calibrés (indexés) : superposition et carte
+temps x longueur d'onde par capteur, et un PNG par spectre.
+
+Exemple :
+    python scripts/run_quicklooks.py output/netcdf --device SAM_8467 --debut 2024-11-13T12:00 --workers 8
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+# === Importer tes classes maison ===
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.data_manager import DataManager
+from core.quicklook import QuicklookPlotter
+
+# Toujours commencer par trouver la racine du projet par rapport à ce script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quicklooks PNG des spectres calibrés")
+    parser.add_argument('calibrated_dir', help="Dossier des sorties calibrées (output/calibrated ou output/netcdf)")
+    parser.add_argument('--device', default=None, help="Capteur à tracer (défaut : tous)")
+    parser.add_argument('--debut', default=None, help="Date de début (ex. 2024-11-13T12:00)")
+    parser.add_argument('--fin', default=None, help="Date de fin (ex. 2024-11-13T12:30)")
+    parser.add_argument('--output-dir', default=os.path.join(project_root, 'output', 'png_files'),
+                        help="Dossier de sortie")
+    parser.add_argument('--workers', type=int, default=None, help="Nombre de processus (défaut : nombre de cœurs)")
+    parser.add_argument('--sans-spectres', action='store_true',
+                        help="Ne produire que les superpositions et cartes par capteur")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+    t0 = time.perf_counter()
+    spectres = DataManager.query_spectres(args.calibrated_dir, args.device, args.debut, args.fin)
+    plotter = QuicklookPlotter(args.output_dir, max_workers=args.workers)
+    chemins = plotter.run(spectres, par_spectre=not args.sans_spectres)
+    print(f"[INFO] {len(chemins)} PNG écrits dans {args.output_dir} en {time.perf_counter() - t0:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
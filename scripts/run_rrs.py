@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Calcul de la réflectance de télédétection Rrs = (Lu - rho * Lsky) / Ed à partir
+des spectres calibrés (et indexés) produits par le pipeline de calibration.
+
+Exemple :
+    python scripts/run_rrs.py output/netcdf --ed SAM_8467 --lu SAM_85AE --lsky SAM_8172 --rho 0.028
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# === Importer tes classes maison ===
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.rrs import RrsCalculator, RHO_DEFAUT, TOLERANCE_DEFAUT_S
+
+# Toujours commencer par trouver la racine du projet par rapport à ce script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcul de Rrs à partir des spectres calibrés")
+    parser.add_argument('calibrated_dir', help="Dossier des sorties calibrées (output/calibrated ou output/netcdf)")
+    parser.add_argument('--ed', required=True, help="Capteur de l'éclairement descendant Ed")
+    parser.add_argument('--lu', required=True, help="Capteur de la luminance montante Lu")
+    parser.add_argument('--lsky', required=True, help="Capteur de la luminance du ciel Lsky")
+    parser.add_argument('--rho', type=float, default=RHO_DEFAUT, help="Facteur de réflexion du ciel")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE_DEFAUT_S,
+                        help="Écart de temps max entre les spectres d'un triplet (s)")
+    parser.add_argument('--debut', default=None, help="Date de début (ex. 2024-11-13T12:00)")
+    parser.add_argument('--fin', default=None, help="Date de fin (ex. 2024-11-13T12:30)")
+    parser.add_argument('--output-dir', default=os.path.join(project_root, 'output', 'Rrs'),
+                        help="Dossier de sortie")
+    parser.add_argument('--nom', default='Rrs', help="Nom du fichier de sortie (sans extension)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+    calculateur = RrsCalculator({'Ed': args.ed, 'Lu': args.lu, 'Lsky': args.lsky},
+                                rho=args.rho, tolerance_s=args.tolerance)
+    resultat = calculateur.calculer_depuis_index(args.calibrated_dir, args.debut, args.fin)
+    RrsCalculator.save_rrs_txt(resultat, args.output_dir, args.nom)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
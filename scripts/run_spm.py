@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estimation des matières en suspension (SPM) à partir d'un fichier Rrs
+(voir scripts/run_rrs.py), par lots, avec bascule rouge -> proche infrarouge.
+
+Exemple :
+    python scripts/run_spm.py output/Rrs/Rrs.txt
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# === Importer tes classes maison ===
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core.spm import SPMEstimator, SEUILS_BASCULE
+
+# Toujours commencer par trouver la racine du projet par rapport à ce script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimation du SPM à partir des spectres Rrs")
+    parser.add_argument('path_rrs', help="Fichier Rrs (output/Rrs/*.txt)")
+    parser.add_argument('--output-dir', default=os.path.join(project_root, 'output', 'Rrs', 'SPM_estimee'),
+                        help="Dossier de sortie")
+    parser.add_argument('--mode', default='UV_Vis', choices=['UV_Vis', 'UV'], help="Grille des spectres Rrs")
+    parser.add_argument('--seuils', type=float, nargs=2, default=list(SEUILS_BASCULE),
+                        help="Seuils de rho_w(665) de la bascule rouge -> proche infrarouge")
+    parser.add_argument('--taille-lot', type=int, default=100000, help="Spectres traités par lot")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+    estimateur = SPMEstimator(mode=args.mode, seuils=tuple(args.seuils))
+    estimateur.run(args.path_rrs, args.output_dir, taille_lot=args.taille_lot)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Agrégation temporelle des spectres calibrés (AgregateurTemporel, ExportAgrege) :
+statistiques par capteur et par intervalle comparées à celles de NumPy.
+"""
+
+import os
+import sys
+import warnings
+from types import SimpleNamespace
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+np = pytest.importorskip('numpy')
+from core.aggregation import AgregateurTemporel
+from core.export_manager import ExportManager
+
+STATISTIQUES = ('moyenne', 'ecart_type', 'mediane', 'p10', 'p90', 'min', 'max', 'n')
+PAS_S = 60
+COUPURE = 95  # Premier lot : spectres avant 95 s ; l'intervalle [60, 120) est à cheval sur les deux lots
+
+
+@pytest.fixture
+def spectres():
+    rng = np.random.default_rng(3)
+    secondes = np.repeat(np.arange(0, 240, 5), 2)
+    device = np.tile(np.array(['SAM_8467', 'SAM_85AE']), len(secondes) // 2)
+    data = rng.normal(size=(len(secondes), 20))
+    data[rng.random(data.shape) < 0.2] = np.nan
+    data[:, 0] = np.nan  # Pixel toujours NaN
+    return device, secondes, data
+
+
+def lot(device, secondes, data, rows):
+    table = {'IDDevice': device[rows], 'DateTime': secondes[rows].astype('datetime64[s]'),
+             'IntegrationTime': np.full(len(rows), 128), 'QCFlags': np.zeros(len(rows), dtype=np.uint16)}
+    return table, np.arange(data.shape[1]), data[rows], [SimpleNamespace(nom_capteur=d) for d in device[rows]]
+
+
+def en_lots(device, secondes, data):
+    rows = np.arange(len(secondes))
+    return [lot(device, secondes, data, rows[secondes < COUPURE]),
+            lot(device, secondes, data, rows[secondes >= COUPURE])]
+
+
+def attendu(data, stat):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # Pixels entièrement NaN
+        if stat == 'moyenne':
+            return np.nanmean(data, axis=0)
+        if stat == 'ecart_type':
+            return np.nanstd(data, axis=0, ddof=1)
+        if stat == 'mediane':
+            return np.nanmedian(data, axis=0)
+        if stat == 'min':
+            return np.nanmin(data, axis=0)
+        if stat == 'max':
+            return np.nanmax(data, axis=0)
+        if stat == 'n':
+            return np.isfinite(data).sum(axis=0).astype(float)
+        return np.nanpercentile(data, float(stat[1:]), axis=0)
+
+
+def test_statistiques_identiques_a_numpy(spectres):
+    device, secondes, data = spectres
+    agregateur = AgregateurTemporel(PAS_S, statistiques=STATISTIQUES)
+    resultats = [agregateur.ajouter(*l) for l in en_lots(device, secondes, data)] + [agregateur.terminer()]
+    resultats = [r for r in resultats if r is not None]
+
+    n_groupes = 0
+    for table, _, cubes, _ in resultats:
+        for g, (nom, debut) in enumerate(zip(table['IDDevice'], table['DateTime'].astype(np.int64))):
+            rows = (device == nom) & (secondes // PAS_S * PAS_S == debut)
+            assert table['NSpectres'][g] == rows.sum()
+            for stat in STATISTIQUES:
+                np.testing.assert_allclose(cubes[stat][g], attendu(data[rows], stat), rtol=1e-12,
+                                           equal_nan=True, err_msg=f"{nom} {debut} {stat}")
+            n_groupes += 1
+    assert n_groupes == 2 * 4
+    # L'intervalle [60, 120) n'est émis qu'une fois, avec les spectres des deux lots
+    tables = [r[0] for r in resultats]
+    debuts = np.concatenate([t['DateTime'].astype(np.int64) for t in tables])
+    assert (debuts == 60).sum() == 2
+    assert all(n == 12 for t in tables for n in t['NSpectres'][t['DateTime'].astype(np.int64) == 60])
+
+
+def test_export_netcdf_n_spectres(spectres, tmp_path):
+    netCDF4 = pytest.importorskip('netCDF4')
+    device, secondes, data = spectres
+    output_dir = str(tmp_path / 'netcdf')
+    agregation = AgregateurTemporel(PAS_S, statistiques=('moyenne', 'n'))
+    with ExportManager.creer('netcdf', output_dir, 'export', index=False, agregation=agregation) as writer:
+        for l in en_lots(device, secondes, data):
+            writer.ecrire_lot(*l)
+
+    with netCDF4.Dataset(os.path.join(output_dir, 'moyenne', 'export.nc')) as ds:
+        n_spectres = np.asarray(ds['n_spectres'][:])
+        temps = np.asarray(ds['time'][:])
+        devices = np.asarray(ds['device'][:]).astype(str)
+    assert n_spectres.sum() == len(secondes)
+    for nom, debut, n in zip(devices, temps, n_spectres):
+        assert n == ((device == nom) & (secondes // PAS_S * PAS_S == debut)).sum()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Registre des calibrations (RegistreCalibrations) : casse des noms de capteurs
+et de fichiers, choix de la calibration valable à la date de chaque spectre.
+"""
+
+import os
+import sys
+import shutil
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+np = pytest.importorskip('numpy')
+from core.calibration_registry import RegistreCalibrations
+
+CALIB_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'calibration', 'ALL_2023')
+DEBUT_8467 = np.datetime64('2023-09-20T07:33:25', 's')  # DateTime de Cal_SAM_8467.dat
+DEBUT_2024 = np.datetime64('2024-06-01T00:00:00', 's')
+
+
+@pytest.fixture(scope='module')
+def registre():
+    return RegistreCalibrations(CALIB_DIR)
+
+
+def test_casse_des_noms_de_capteurs(registre):
+    for nom in ('SAM_85ae', 'sam_85AE', ' SAM_85AE '):
+        assert registre.normaliser(nom) == 'SAM_85AE'
+        assert registre.epoque(nom) is registre.epoque('SAM_85AE')
+        assert registre.n_epoques(nom) == 1
+    assert 'SAM_85AE' in registre.capteurs()
+    assert 'SAM_85ae' not in registre.capteurs()
+
+
+def test_casse_des_noms_de_fichiers(registre):
+    # SAM_839e.ini, Back_SAM_839E.dat et Cal_SAM_839E.dat forment une seule calibration
+    ini, back, cal = registre.epoque('SAM_839E').chemins
+    assert os.path.basename(ini) == 'SAM_839e.ini'
+    assert os.path.basename(back) == 'Back_SAM_839E.dat'
+    assert os.path.basename(cal) == 'Cal_SAM_839E.dat'
+    # ... et SAM_877d.ini, Back_SAM_877d.dat, Cal_SAM_877d.dat sont rangés sous SAM_877D
+    assert [os.path.basename(c) for c in registre.epoque('sam_877D').chemins] == [
+        'SAM_877d.ini', 'Back_SAM_877d.dat', 'Cal_SAM_877d.dat']
+    assert registre.epoque('SAM_877E').chemins != registre.epoque('SAM_877D').chemins
+    assert not any(nom.startswith('SAMIP') for nom in registre.capteurs())  # .ini sans Cal_*.dat
+
+
+def test_calibration_inconnue(registre):
+    with pytest.raises(FileNotFoundError):
+        registre.epoque('SAM_0000')
+    with pytest.raises(FileNotFoundError):
+        registre.numeros('SAM_0000', [DEBUT_8467])
+
+
+def test_dates_aux_bornes_des_epoques(tmp_path):
+    for jeu in ('ALL_2023', 'ALL_2024'):
+        os.makedirs(tmp_path / jeu)
+        for fichier in ('SAM_8467.ini', 'Back_SAM_8467.dat', 'Cal_SAM_8467.dat'):
+            shutil.copy(os.path.join(CALIB_DIR, fichier), tmp_path / jeu / fichier)
+    registre = RegistreCalibrations(str(tmp_path), debuts={'ALL_2024': str(DEBUT_2024)})
+
+    assert registre.n_epoques('sam_8467') == 2
+    assert [e.debut for e in registre.epoques['SAM_8467']] == [DEBUT_8467, DEBUT_2024]
+    assert os.path.basename(registre.epoque('SAM_8467', 1).dossier) == 'ALL_2024'
+    secondes = np.timedelta64(1, 's')
+    dates = np.array([DEBUT_8467 - 86400 * secondes, DEBUT_8467 - secondes, DEBUT_8467, DEBUT_8467 + secondes,
+                      DEBUT_2024 - secondes, DEBUT_2024, DEBUT_2024 + secondes])
+    # Une calibration est valable à partir de son début inclus, et avant la première calibration
+    np.testing.assert_array_equal(registre.numeros('SAM_8467', dates), [0, 0, 0, 0, 0, 1, 1])
+    # Dates plus fines que la seconde : tronquées à la seconde
+    dates_ms = dates.astype('datetime64[ms]') + np.timedelta64(999, 'ms')
+    np.testing.assert_array_equal(registre.numeros('SAM_8467', dates_ms), [0, 0, 0, 0, 0, 1, 1])
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Calibration et interpolation vectorisées d'un capteur (CapteurTRIOS) :
+équivalence avec le traitement spectre par spectre et usage depuis plusieurs threads.
+"""
+
+import os
+import sys
+import threading
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+from scipy.interpolate import interp1d
+import core.capteur
+from core.calibration_manager import CalibrationManager
+from core.data_manager import DataManager
+
+CALIB_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'calibration', 'ALL_2023')
+EXPORT = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'export_recife_2024.dat')
+
+
+@pytest.fixture(scope='module')
+def lot():
+    return DataManager.parse_dat_arrays(EXPORT)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return CalibrationManager(CALIB_DIR, cache_dir=str(tmp_path / 'cache'))
+
+
+def groupes(lot):
+    """
+    Indices des spectres par (capteur, temps d'intégration), comme calibrer_lot.
+    """
+    table = lot['entete']
+    devices = np.char.upper(np.char.strip(np.asarray(table['IDDevice']).astype(str)))
+    resultat = {}
+    for i, key in enumerate(zip(devices.tolist(), table['IntegrationTime'].tolist())):
+        resultat.setdefault(key, []).append(i)
+    return resultat
+
+
+def test_calibrate_batch_identique_a_calibrate_spectre(lot, manager):
+    for (nom_capteur, integtime), indices in groupes(lot).items():
+        capteur = manager.get_or_create_capteur(nom_capteur, int(integtime))
+        lambda_calib, data_calib = capteur.calibrate_batch(lot['data'][indices], lot['lambda'])
+        assert data_calib.shape == (len(indices), len(lot['lambda']))
+        for k, i in enumerate(indices):
+            capteur.calibrate_spectre(lot['data'][i], lot['lambda'])
+            np.testing.assert_array_equal(capteur.cal_lambda, lambda_calib)
+            np.testing.assert_array_equal(capteur.cal_data, data_calib[k])
+
+
+def test_operateurs_partages_entre_threads(lot, manager, monkeypatch):
+    monkeypatch.setattr(core.capteur, 'TAILLE_CACHE_OPERATEURS', 2)
+    (nom_capteur, integtime), indices = next(iter(groupes(lot).items()))
+    capteur = manager.get_or_create_capteur(nom_capteur, int(integtime))
+    lambda_calib, data_calib = capteur.calibrate_batch(lot['data'][indices[:8]], lot['lambda'])
+    # Un masque de NaN différent par lot : le cache (2 opérateurs) est sans cesse vidé
+    lots = []
+    for k in range(12):
+        data = data_calib.copy()
+        data[:, 10 + k] = np.nan
+        data[::2, 50 + k] = np.nan
+        lots.append(data)
+    references = [capteur.interpolate_batch(lambda_calib, data)[1] for data in lots]
+
+    erreurs = []
+    resultats = {}
+
+    def interpoler(t):
+        try:
+            for _ in range(20):
+                for k in range(t % 3, len(lots), 3):
+                    resultats[t, k] = capteur.interpolate_batch(lambda_calib, lots[k])[1]
+        except Exception as e:
+            erreurs.append(e)
+
+    threads = [threading.Thread(target=interpoler, args=(t,)) for t in range(6)]
+    intervalle = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Changements de thread fréquents : course sur le cache plus probable
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(intervalle)
+
+    assert not erreurs
+    assert len(capteur._operateurs) <= 2
+    for (_, k), data in resultats.items():
+        np.testing.assert_array_equal(data, references[k])
+
+
+def test_interpolation_cubique_minimum_4_points(lot, manager):
+    (nom_capteur, integtime), indices = next(iter(groupes(lot).items()))
+    capteur = manager.get_or_create_capteur(nom_capteur, int(integtime))
+    lambda_calib, data_calib = capteur.calibrate_batch(lot['data'][indices[:1]], lot['lambda'])
+    valides = np.flatnonzero((lambda_calib >= 400) & (lambda_calib <= 700))[::20]
+
+    data = np.full_like(data_calib, np.nan)
+    data[:, valides[:3]] = data_calib[:, valides[:3]]
+    with pytest.raises(ValueError):
+        capteur.interpolate_batch(lambda_calib, data)
+
+    data[:, valides[:4]] = data_calib[:, valides[:4]]
+    new_lam, new_data = capteur.interpolate_batch(lambda_calib, data)
+    attendu = interp1d(lambda_calib[valides[:4]], data_calib[0, valides[:4]], kind='cubic',
+                       bounds_error=False, fill_value=np.nan)(new_lam)
+    np.testing.assert_allclose(new_data[0], attendu, rtol=1e-10, equal_nan=True)
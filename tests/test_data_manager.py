@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture vectorisée des exports TRIOS (DataManager.parse_dat_arrays).
+"""
+
+import os
+import sys
+import gzip
+import zipfile
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+np = pytest.importorskip('numpy')
+import core.data_manager
+from core.data_manager import DataManager, SEPARATEUR_MEMBRE
+
+EXPORT = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'export_recife_2024.dat')
+
+
+@pytest.fixture(scope='module')
+def lot():
+    return DataManager.parse_dat_arrays(EXPORT)
+
+
+def assert_lots_egaux(lot, reference):
+    assert lot.keys() == reference.keys()
+    for cle in reference:
+        if cle == 'entete':
+            assert list(lot['entete']) == list(reference['entete'])
+            for champ, colonne in reference['entete'].items():
+                assert lot['entete'][champ].dtype == colonne.dtype, champ
+                np.testing.assert_array_equal(lot['entete'][champ], colonne, err_msg=champ)
+        else:
+            assert lot[cle].dtype == reference[cle].dtype, cle
+            np.testing.assert_array_equal(lot[cle], reference[cle], err_msg=cle)
+
+
+@pytest.mark.parametrize('taille_lot', [1024, 100])
+def test_export_compresse_identique(lot, tmp_path, monkeypatch, taille_lot):
+    monkeypatch.setattr(core.data_manager, 'TAILLE_LOT_COMPRESSE', taille_lot)
+    with open(EXPORT, 'rb') as f:
+        contenu = f.read()
+    path_gz = str(tmp_path / 'export.dat.gz')
+    with gzip.open(path_gz, 'wb') as f:
+        f.write(contenu)
+    path_zip = str(tmp_path / 'export.zip')
+    with zipfile.ZipFile(path_zip, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('recife/export.dat', contenu)
+
+    assert_lots_egaux(DataManager.parse_dat_arrays(path_gz), lot)
+    assert_lots_egaux(DataManager.parse_dat_arrays(path_zip + SEPARATEUR_MEMBRE + 'recife/export.dat'), lot)
+
+
+def blocs(n):
+    """
+    Les n premiers blocs [Spectrum] de l'export d'exemple (bytes).
+    """
+    with open(EXPORT, 'rb') as f:
+        contenu = f.read()
+    return [b'[Spectrum]' + bloc for bloc in contenu.split(b'[Spectrum]')[1:n + 1]]
+
+
+def test_identique_a_parse_dat_file(lot):
+    spectres = DataManager.parse_dat_file(EXPORT)
+    assert len(spectres) == len(lot['data']) == 828
+    np.testing.assert_array_equal(lot['data'], [spectre['data'] for spectre in spectres])
+    for spectre in spectres:
+        np.testing.assert_array_equal(lot['lambda'], spectre['lambda'])
+    assert lot['entete']['IDDevice'].tolist() == [spectre['entete']['device'] for spectre in spectres]
+    assert lot['entete']['IntegrationTime'].tolist() == [int(spectre['entete']['integration_time'])
+                                                         for spectre in spectres]
+    dates = [f"{spectre['entete']['date']}T{spectre['entete']['heure']}" for spectre in spectres]
+    np.testing.assert_array_equal(lot['entete']['DateTime'], np.array(dates, dtype='datetime64[s]'))
+
+
+def test_typage_entete(lot):
+    table = lot['entete']
+    assert table['DateTime'].dtype == np.dtype('datetime64[s]')
+    assert table['DateTime'][0] == np.datetime64('2024-11-13T12:15:13')
+    for champ in ('Pressure', 'PathLength', 'Temperature', 'InclX'):
+        assert table[champ].dtype == np.float64, champ
+    assert np.all(table['Pressure'] == np.inf)
+    assert np.all(np.isnan(table['Temperature']))
+    assert table['InclX'][0] == -1.25
+    assert table['IntegrationTime'].dtype == np.int64
+    assert table['IDDevice'].dtype.kind == 'U'
+    assert lot['data'].dtype == np.uint16 and lot['data'].shape == (828, 255)
+    assert 'nan' not in lot
+
+
+def test_comptes_nan(tmp_path):
+    bloc = blocs(1)[0]
+    lignes = bloc.split(b'\r\n')
+    debut = lignes.index(b'[DATA]') + 2  # Première ligne de [DATA] sautée
+    for k, valeur in ((0, b'NAN'), (10, b'-NAN'), (254, b'+NAN')):
+        colonnes = lignes[debut + k].split(b' ')
+        colonnes[2] = valeur
+        lignes[debut + k] = b' '.join(colonnes)
+    path_data = str(tmp_path / 'export.dat')
+    with open(path_data, 'wb') as f:
+        f.write(bloc + b'\r\n'.join(lignes))
+
+    lot = DataManager.parse_dat_arrays(path_data)
+    assert lot['data'].shape == (2, 255) and lot['data'].dtype == np.uint16
+    np.testing.assert_array_equal(np.flatnonzero(lot['nan'][1]), [0, 10, 254])
+    assert not lot['nan'][0].any()
+    assert np.all(lot['data'][1, [0, 10, 254]] == 0)
+    np.testing.assert_array_equal(lot['data'], [spectre['data'] for spectre in DataManager.parse_dat_file(path_data)])
+
+
+@pytest.mark.parametrize('coupe', ['tronque', 'incomplet', 'illisible'])
+def test_dernier_bloc_ignore(lot, tmp_path, caplog, coupe):
+    premiers = blocs(4)
+    dernier = premiers.pop()
+    fin_data = dernier.index(b'[END] of [DATA]')
+    if coupe == 'tronque':  # Fichier coupé au milieu de la section [DATA]
+        dernier = dernier[:fin_data - 2000]
+    elif coupe == 'incomplet':  # Section [DATA] terminée mais trop courte
+        dernier = dernier[:fin_data - 2000] + b'\r\n' + dernier[fin_data:]
+    else:
+        dernier = dernier[:fin_data - 20] + b' x 0 0\r\n' + dernier[fin_data:]
+    path_data = str(tmp_path / 'export.dat')
+    with open(path_data, 'wb') as f:
+        f.write(b''.join(premiers) + dernier)
+
+    lot_tronque = DataManager.parse_dat_arrays(path_data)
+    assert lot_tronque['data'].shape == (3, 255)
+    np.testing.assert_array_equal(lot_tronque['data'], lot['data'][:3])
+    assert lot_tronque['entete']['IDData'].tolist() == lot['entete']['IDData'][:3].tolist()
+    if coupe != 'tronque':
+        assert "1 spectre(s) sur 4 ignoré(s)" in caplog.text
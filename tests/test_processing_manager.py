@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Chaîne de filtres (ProcessingManager) : filtre de Savitzky-Golay comparé à
+scipy.signal.savgol_filter, y compris avec des bords NaN.
+"""
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+np = pytest.importorskip('numpy')
+signal = pytest.importorskip('scipy.signal')
+from core.processing_manager import ProcessingManager
+
+NEW_LAM = np.arange(310, 951, 1.0)
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(7)
+    return np.cumsum(rng.normal(size=(6, NEW_LAM.size)), axis=1)
+
+
+def filtrer(data, etape):
+    return ProcessingManager([etape]).appliquer(NEW_LAM, data.copy())
+
+
+@pytest.mark.parametrize('etape, fenetre, polynome, deriv', [
+    (('lissage', {}), 11, 2, 0),
+    (('lissage', {'fenetre': 15, 'polynome': 3}), 15, 3, 0),
+    (('lissage', {'fenetre': 3, 'polynome': 0}), 3, 0, 0),
+    (('derivee', {}), 11, 3, 1),
+    (('derivee', {'ordre': 2, 'fenetre': 9, 'polynome': 2}), 9, 2, 2),
+    (('derivee', {'ordre': 2, 'fenetre': 7, 'polynome': 1}), 7, 2, 2),  # Degré relevé à l'ordre
+])
+def test_savgol_identique_a_scipy(data, etape, fenetre, polynome, deriv):
+    attendu = signal.savgol_filter(data, fenetre, polynome, deriv=deriv, delta=1.0, axis=1, mode='interp')
+    np.testing.assert_allclose(filtrer(data, etape), attendu, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('etape, fenetre, polynome, deriv', [
+    (('lissage', {}), 11, 2, 0),
+    (('derivee', {'ordre': 1, 'fenetre': 7, 'polynome': 2}), 7, 2, 1),
+])
+def test_savgol_bords_nan(data, etape, fenetre, polynome, deriv):
+    # Comme après interpolation sur une grille plus large que le capteur : NaN aux bords
+    data = data.copy()
+    data[0, :3] = np.nan
+    data[1, -20:] = np.nan
+    data[2, :fenetre] = np.nan
+    data[3, 100] = np.nan
+    data[4, :] = np.nan
+    resultat = filtrer(data, etape)
+
+    h = fenetre // 2
+    nan = np.isnan(data)
+    fenetres = np.lib.stride_tricks.sliding_window_view(nan, fenetre, axis=1).any(axis=2)
+    attendu_nan = np.empty_like(nan)
+    attendu_nan[:, h:-h] = fenetres
+    attendu_nan[:, :h] = fenetres[:, :1]  # Bords : ajustement polynomial sur la première / dernière fenêtre
+    attendu_nan[:, -h:] = fenetres[:, -1:]
+    np.testing.assert_array_equal(np.isnan(resultat), attendu_nan)
+
+    # Ailleurs, même valeur que scipy sur le spectre dont les NaN sont remplacés
+    attendu = signal.savgol_filter(np.nan_to_num(data, nan=0.0), fenetre, polynome, deriv=deriv,
+                                   axis=1, mode='interp')
+    np.testing.assert_allclose(resultat[~attendu_nan], attendu[~attendu_nan], rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(resultat[5], signal.savgol_filter(data[5], fenetre, polynome, deriv=deriv,
+                                                                 mode='interp'), rtol=1e-9, atol=1e-9)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Contrôle qualité des spectres bruts (ControleQualite) : chaque drapeau QC_* est
+levé sur sa condition, et seulement sur elle.
+"""
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+np = pytest.importorskip('numpy')
+from core.data_manager import DataManager
+from core.qc import (ControleQualite, QC_SATURATION, QC_ERREUR, QC_STATUT, QC_INCLINAISON,
+                     QC_INCLINAISON_INVALIDE, QC_NAN, QC_PRESSION_INVALIDE)
+
+EXPORT = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'export_recife_2024.dat')
+
+# Un spectre par condition : (modification du spectre de base, drapeaux attendus)
+CAS = [
+    ({}, 0),
+    ({'sature': 1}, QC_SATURATION),
+    ({'sature': 2}, QC_SATURATION),
+    ({'erreur': 1}, QC_ERREUR),
+    ({'statut': 1}, QC_STATUT),
+    ({'InclV': 5.5}, QC_INCLINAISON),
+    ({'InclV': -5.5}, QC_INCLINAISON),
+    ({'InclV': np.nan, 'InclX': 4.0, 'InclY': 4.0}, QC_INCLINAISON),
+    ({'InclV': np.nan, 'InclX': 3.0, 'InclY': 4.0}, 0),
+    ({'InclValid': 0}, QC_INCLINAISON_INVALIDE),
+    ({'nan': 1}, QC_NAN),
+    ({'Pressure': 1.2, 'PressValid': 0}, QC_PRESSION_INVALIDE),  # Capteur de pression invalide
+    ({'Pressure': 1.2, 'PressValid': 1}, 0),
+    ({'Pressure': 0.0, 'PressValid': 0}, 0),  # Unités sans capteur de pression
+    ({'Pressure': np.nan, 'PressValid': 0}, 0),
+]
+
+
+def construire_lot(cas):
+    n = len(cas)
+    lot = {
+        'lambda': np.arange(1, 256),
+        'data': np.full((n, 255), 1000, dtype=np.uint16),
+        'erreur': np.zeros((n, 255), dtype=np.uint16),
+        'statut': np.zeros((n, 255), dtype=np.uint16),
+        'nan': np.zeros((n, 255), dtype=bool),
+        'entete': {
+            'IDData': np.array([f'ID{i}' for i in range(n)]),
+            'RAWDynamic': np.full(n, 65535),
+            'InclV': np.full(n, 1.0), 'InclX': np.full(n, 0.5), 'InclY': np.full(n, 0.5),
+            'InclValid': np.ones(n, dtype=np.int64),
+            'Pressure': np.full(n, np.inf), 'PressValid': np.zeros(n, dtype=np.int64),
+        },
+    }
+    for i, (modification, _) in enumerate(cas):
+        for cle, valeur in modification.items():
+            if cle == 'sature':
+                lot['data'][i, 100:100 + valeur] = 65535
+            elif cle in ('erreur', 'statut', 'nan'):
+                lot[cle][i, 7] = valeur
+            else:
+                lot['entete'][cle][i] = valeur
+    return lot
+
+
+def test_drapeaux_par_condition():
+    flags = ControleQualite().drapeaux(construire_lot(CAS))
+    assert flags.dtype == np.uint16
+    for (modification, attendu), flag in zip(CAS, flags):
+        assert flag == attendu, (modification, ControleQualite.decrire(flag))
+
+
+def test_seuils():
+    lot = construire_lot(CAS)
+    flags = ControleQualite(seuil_inclinaison=6.0, max_pixels_satures=2).drapeaux(lot)
+    attendus = [f & ~QC_INCLINAISON if 'InclV' in m else f for m, f in CAS]
+    attendus[1] = 0  # Un seul pixel saturé
+    np.testing.assert_array_equal(flags, attendus)
+
+    lot['entete']['RAWDynamic'][:] = 1000  # Dynamique atteinte par tous les pixels
+    assert np.all(ControleQualite().drapeaux(lot) & QC_SATURATION)
+
+
+def test_rejet():
+    lot = construire_lot(CAS)
+    qc = ControleQualite(action='rejeter')
+    lot_garde, n_rejetes = qc.appliquer(lot)
+    gardes = [i for i, (_, f) in enumerate(CAS) if not f & qc.rejet]
+    assert n_rejetes == len(CAS) - len(gardes)
+    assert lot_garde['entete']['IDData'].tolist() == [f'ID{i}' for i in gardes]
+    # Inclinomètre et pression invalides sont signalés sans rejet
+    assert set(lot_garde['entete']['QCFlags'].tolist()) == {0, QC_INCLINAISON_INVALIDE, QC_PRESSION_INVALIDE}
+
+    lot_signale, n_rejetes = ControleQualite().appliquer(lot)
+    assert n_rejetes == 0
+    np.testing.assert_array_equal(lot_signale['entete']['QCFlags'], [f for _, f in CAS])
+    assert 'QCFlags' not in lot['entete']
+
+
+def test_export_exemple_sans_capteur_de_pression():
+    # Pressure = +INF et PressValid = 0 pour toutes les unités de l'export
+    lot = DataManager.parse_dat_arrays(EXPORT)
+    assert np.all(lot['entete']['PressValid'] == 0)
+    flags = ControleQualite().drapeaux(lot)
+    assert not np.any(flags & QC_PRESSION_INVALIDE)
+    assert ControleQualite.decrire(QC_SATURATION | QC_PRESSION_INVALIDE) == ['saturation', 'pression_invalide']
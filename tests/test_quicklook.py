@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Quicklooks PNG (QuicklookPlotter) des spectres calibrés de l'export d'exemple.
+"""
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+from core.calibration_manager import CalibrationManager
+from core.data_manager import DataManager
+from core.quicklook import QuicklookPlotter  # Importable sans matplotlib ni Pillow
+
+CALIB_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'calibration', 'ALL_2023')
+EXPORT = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'export_recife_2024.dat')
+N_SPECTRES = 40
+
+
+def test_quicklooks_export_exemple(tmp_path):
+    pytest.importorskip('matplotlib')
+    pytest.importorskip('PIL')
+    manager = CalibrationManager(CALIB_DIR, cache_dir=str(tmp_path / 'cache'))
+    lot = DataManager.select_lot(DataManager.parse_dat_arrays(EXPORT), np.arange(N_SPECTRES))
+    table, new_lam, data, capteurs = manager.calibrer_lot(lot, 'UV_Vis')
+    spectres = {'lambda': new_lam, 'data': data, 'device': np.array([c.nom_capteur for c in capteurs]),
+                'datetime': table['DateTime'], 'id_data': table['IDData']}
+
+    output_dir = str(tmp_path / 'png_files')
+    chemins = QuicklookPlotter(output_dir, max_workers=1).run(spectres)
+    devices = set(spectres['device'].tolist())
+    assert len(chemins) == 2 * len(devices) + N_SPECTRES
+    for device in devices:
+        assert os.path.join(output_dir, f"{device}_superposition.png") in chemins
+        assert os.path.join(output_dir, f"{device}_carte.png") in chemins
+    for chemin in chemins:
+        with open(chemin, 'rb') as f:
+            assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+
+
+def test_dependance_absente(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'PIL', None)
+    with pytest.raises(ImportError, match='Les quicklooks nécessitent'):
+        QuicklookPlotter(str(tmp_path))
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Reprise du traitement incrémental après un arrêt brutal (run_incremental_pipeline) :
+les sorties ne doivent contenir chaque spectre qu'une fois.
+"""
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+from core.calibration_manager import CalibrationManager
+from core.run_manifest import RunManifest
+from core.spectrum_store import SpectrumStore
+from core.synthetic_export import SyntheticExportGenerator
+
+CALIB_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'calibration', 'ALL_2023')
+N_SPECTRES = 300
+TAILLE_LOT = 100
+
+
+class ArretBrutal(Exception):
+    pass
+
+
+@pytest.fixture
+def export(tmp_path):
+    path_data = str(tmp_path / 'export.dat')
+    SyntheticExportGenerator(seed=1).generer(path_data, N_SPECTRES)
+    return path_data
+
+
+def run(path_data, output_dir, format_export):
+    manager = CalibrationManager(CALIB_DIR, cache_dir=os.path.join(output_dir, '..', 'cache'))
+    return manager.run_incremental_pipeline(path_data, output_dir, taille_lot=TAILLE_LOT,
+                                            format_export=format_export)
+
+
+def run_interrompu(path_data, output_dir, format_export, monkeypatch, n_commits=1):
+    """
+    Run arrêté après n_commits points de contrôle, les sorties du lot suivant
+    étant déjà vidées sur disque.
+    """
+    commit = RunManifest.commit
+    appels = []
+
+    def commit_interrompu(self, *args, **kwargs):
+        appels.append(1)
+        if len(appels) > n_commits:
+            raise ArretBrutal()
+        return commit(self, *args, **kwargs)
+
+    with monkeypatch.context() as m:
+        m.setattr(RunManifest, 'commit', commit_interrompu)
+        with pytest.raises(ArretBrutal):
+            run(path_data, output_dir, format_export)
+
+
+def lire_netcdf(output_dir):
+    netCDF4 = pytest.importorskip('netCDF4')
+    with netCDF4.Dataset(os.path.join(output_dir, 'export.nc')) as ds:
+        return np.asarray(ds['id_data'][:]), np.asarray(ds['data'][:])
+
+
+def test_reprise_netcdf_sans_doublons(export, tmp_path, monkeypatch):
+    pytest.importorskip('netCDF4')
+    reference = str(tmp_path / 'reference')
+    assert run(export, reference, 'netcdf') == N_SPECTRES
+
+    output_dir = str(tmp_path / 'sortie')
+    run_interrompu(export, output_dir, 'netcdf', monkeypatch)
+    assert len(lire_netcdf(output_dir)[0]) == 2 * TAILLE_LOT  # Lot non validé déjà écrit
+    assert run(export, output_dir, 'netcdf') == N_SPECTRES - TAILLE_LOT
+
+    ids, data = lire_netcdf(output_dir)
+    ids_ref, data_ref = lire_netcdf(reference)
+    assert len(set(ids)) == len(ids) == N_SPECTRES
+    np.testing.assert_array_equal(ids, ids_ref)
+    np.testing.assert_allclose(data, data_ref, equal_nan=True)
+
+
+def test_fichier_source_modifie_recree_netcdf(export, tmp_path):
+    pytest.importorskip('netCDF4')
+    output_dir = str(tmp_path / 'sortie')
+    run(export, output_dir, 'netcdf')
+    with open(export, 'rb') as f:
+        contenu = f.read()
+    with open(export, 'wb') as f:
+        f.write(contenu.replace(b'Version            = 1', b'Version            = 2', 1))
+
+    assert run(export, output_dir, 'netcdf') == N_SPECTRES
+    ids, _ = lire_netcdf(output_dir)
+    assert len(set(ids)) == len(ids) == N_SPECTRES
+
+
+def test_reprise_store_sans_doublons(export, tmp_path, monkeypatch):
+    output_dir = str(tmp_path / 'sortie')
+    run_interrompu(export, output_dir, 'store', monkeypatch)
+    run(export, output_dir, 'store')
+
+    store = SpectrumStore(os.path.join(output_dir, 'export.store'))
+    assert len(store) == N_SPECTRES
+    assert len(set(store.id_data.tolist())) == N_SPECTRES
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Index SQLite des spectres exportés (SpectraIndex) : requêtes par capteur et par date.
+"""
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+np = pytest.importorskip('numpy')
+from core.spectra_index import SpectraIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    debut = np.datetime64('2024-03-01T00:00:00', 's')
+    datetimes = debut + np.arange(100) * np.timedelta64(60, 's')
+    devices = np.where(np.arange(100) % 2 == 0, 'SAM_8467', 'sam_85ae')
+    with SpectraIndex(str(tmp_path)) as index:
+        index.ajouter(devices[::-1], datetimes[::-1], [f'ID{i:03d}' for i in range(100)][::-1],
+                      ['export.nc'] * 100, np.arange(100)[::-1])
+        yield index
+
+
+def test_recherche_sans_capteur(index):
+    resultat = index.rechercher(debut='2024-03-01T00:10:00', fin='2024-03-01T00:19:00')
+    assert resultat['id_data'].tolist() == [f'ID{i:03d}' for i in range(10, 20)]
+    assert np.all(np.diff(resultat['datetime']) > np.timedelta64(0, 's'))
+    assert set(resultat['device'].tolist()) == {'SAM_8467', 'SAM_85AE'}
+    np.testing.assert_array_equal(resultat['ligne'], np.arange(10, 20))
+
+    plan = index.connexion.execute(
+        "EXPLAIN QUERY PLAN SELECT id_data FROM spectres WHERE datetime >= ? AND datetime <= ? "
+        "ORDER BY datetime, rowid", (0, 1)).fetchall()
+    assert any('idx_datetime' in ligne[-1] for ligne in plan)
+
+
+def test_recherche_par_capteur(index):
+    resultat = index.rechercher('sam_85AE', fin='2024-03-01T00:05:00')
+    assert resultat['id_data'].tolist() == ['ID001', 'ID003', 'ID005']
+    assert len(index.rechercher()['id_data']) == len(index) == 100
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Sélection des spectres d'un store (SpectrumStore) par capteur et par fenêtre de temps.
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+np = pytest.importorskip('numpy')
+from core.spectrum_store import SpectrumStore, SpectrumStoreWriter
+
+N_SPECTRES = 200
+DEBUT = np.datetime64('2024-11-13T12:00:00', 's')
+
+
+def ecrire_store(output_dir, secondes):
+    devices = np.where(np.arange(len(secondes)) % 3 == 0, 'SAM_8467', 'SAM_85AE')
+    table = {'DateTime': DEBUT + secondes.astype('timedelta64[s]'),
+             'IDData': np.array([f'ID{i:03d}' for i in range(len(secondes))])}
+    capteurs = [SimpleNamespace(nom_capteur=d) for d in devices]
+    data = np.arange(len(secondes) * 4, dtype=float).reshape(-1, 4)
+    with SpectrumStoreWriter(output_dir, 'export', index=False) as writer:
+        for i in range(0, len(secondes), 64):
+            writer.ecrire_lot({cle: col[i:i + 64] for cle, col in table.items()}, np.arange(4),
+                              data[i:i + 64], capteurs[i:i + 64])
+    return SpectrumStore(os.path.join(output_dir, 'export.store')), devices
+
+
+@pytest.mark.parametrize('ordre, sens', [('croissant', 1), ('decroissant', -1), ('melange', 0)])
+def test_selection(tmp_path, ordre, sens):
+    secondes = np.repeat(np.arange(N_SPECTRES // 2) * 10, 2)  # Deux spectres par date
+    if ordre == 'decroissant':
+        secondes = secondes[::-1].copy()
+    elif ordre == 'melange':
+        secondes = np.random.default_rng(0).permutation(secondes)
+    store, devices = ecrire_store(str(tmp_path), secondes)
+    assert store.sens_temps == sens
+
+    dates = DEBUT + secondes.astype('timedelta64[s]')
+    fenetres = [(None, None), (DEBUT + 105, None), (None, DEBUT + 300), (DEBUT + 300, DEBUT + 300),
+                (DEBUT + 301, DEBUT + 309), (DEBUT - 50, DEBUT + 5000), (DEBUT + 5000, None)]
+    for device in (None, 'SAM_8467', 'sam_85ae'):
+        for debut, fin in fenetres:
+            masque = np.ones(N_SPECTRES, dtype=bool)
+            if device is not None:
+                masque &= devices == device.upper()
+            if debut is not None:
+                masque &= dates >= debut
+            if fin is not None:
+                masque &= dates <= fin
+            rows = store.selection(device, debut, fin)
+            np.testing.assert_array_equal(rows, np.flatnonzero(masque), err_msg=f"{device} {debut} {fin}")
+    assert len(store.selection('SAM_0000')) == 0
+
+    lu = store.lire('SAM_85AE', DEBUT + 100, DEBUT + 190, lambda_min=1, lambda_max=2)
+    rows = np.flatnonzero((devices == 'SAM_85AE') & (dates >= DEBUT + 100) & (dates <= DEBUT + 190))
+    np.testing.assert_array_equal(lu['data'], np.arange(N_SPECTRES * 4).reshape(-1, 4)[rows, 1:3])
+    assert lu['id_data'].tolist() == [f'ID{i:03d}' for i in rows]